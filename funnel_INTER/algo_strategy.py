@@ -17,7 +17,6 @@ import random
 import math
 import warnings
 from sys import maxsize, stderr
-import json
 from collections import OrderedDict
 from heapq import heappush, heappop
 from attack_method import CornerPing, init_attack_method_globals
@@ -27,30 +26,45 @@ from attack_strat import AttackStrategy
 from BoundedBox import BoundedBox
 
 
+# Budget values are powers of two above these ranks, so every purchase outweighs all the purchases
+# ranked after it combined and the budget keeps the strategy's priority order. Each rank has room for 40.
+UPGRADE_RANK = 80
+SUPPORT_RANK = 40
+ENDGAME_SUPPORT_RANK = 0
+
+
+def ranked_value(rank, index, count):
+    """The budget value of the index-th of count purchases in priority order, at a rank."""
+    return 2 ** (rank + count - index)
+
+
 class AlgoStrategy(gamelib.AlgoCore):
     def __init__(self):
         super().__init__()
         seed = random.randrange(maxsize)
         random.seed(seed)
-        gamelib.debug_write('Random seed: {}'.format(seed))
+        gamelib.log.info('Random seed: {}', seed)
 
     def on_game_start(self, config):
         """ 
         Read in config and perform any initial setup here 
         """
-        gamelib.debug_write('Configuring your custom algo strategy...')
-        self.config = config
+        gamelib.log.info('Configuring your custom algo strategy...')
+        super().on_game_start(config)
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, MP, SP
-        WALL = config["unitInformation"][0]["shorthand"]
-        SUPPORT = config["unitInformation"][1]["shorthand"]
-        TURRET = config["unitInformation"][2]["shorthand"]
-        SCOUT = config["unitInformation"][3]["shorthand"]
-        DEMOLISHER = config["unitInformation"][4]["shorthand"]
-        INTERCEPTOR = config["unitInformation"][5]["shorthand"]
+        catalog = self.catalog
+        WALL = catalog.WALL
+        SUPPORT = catalog.SUPPORT
+        TURRET = catalog.TURRET
+        SCOUT = catalog.SCOUT
+        DEMOLISHER = catalog.DEMOLISHER
+        INTERCEPTOR = catalog.INTERCEPTOR
         MP = 1
         SP = 0
         # This is a good place to do initial setup
         self.scored_on_locations = set()
+        # Only breaches are needed from the action phase, so frames are never fully decoded
+        self.subscribe("breach", self.on_breach)
 
         # Accumulators for structures we should have at a given point
         self.P1_WALLS_EXPECTED = {}
@@ -67,7 +81,7 @@ class AlgoStrategy(gamelib.AlgoCore):
             "TURRET_2": {(1, 12), (21, 10), (22, 11), (24, 12)}}
 
         # Corner Ping config
-        init_attack_method_globals(config)
+        init_attack_method_globals(self.catalog)
         self.corner_ping_attack = CornerPing()
 
         
@@ -83,7 +97,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         holes = method.get_holes(game_state)
         for hole in holes:
             if game_state.contains_stationary_unit(hole):
-                gamelib.debug_write("Hole blocked!")
+                gamelib.log.info("Hole blocked!")
                 return None
             if hole in optional_walls:
                 min_bank -= game_state.type_cost(WALL)[game_state.SP]
@@ -92,14 +106,14 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         # method returns None if we cannot afford all new structures
         if new_structs is None:
-            gamelib.debug_write("Can't afford structures!")
+            gamelib.log.info("Can't afford structures!")
             return None
 
         spawns = method.get_spawns(game_state, self.total_support)
 
         # spawns is empty if we cannot afford a strong enough push
         if not spawns:
-            gamelib.debug_write("Can't afford push!")
+            gamelib.log.info("Can't afford push!")
             return None
 
         return spawns
@@ -117,8 +131,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         unit deployments, and transmitting your intended deployments to the
         game engine.
         """
-        game_state = gamelib.GameState(self.config, turn_state)
-        gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
+        game_state = self.create_game_state(turn_state)
+        gamelib.log.info('Performing turn {} of your custom algo strategy', game_state.turn_number)
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
 
         self.starter_strategy(game_state)
@@ -251,12 +265,17 @@ class AlgoStrategy(gamelib.AlgoCore):
                 game_state.attempt_spawn(INTERCEPTOR, (19, 15), 1)
 
 
-            self.build_defences(game_state, block_right=False, enforced_locs=enforced_locs)
+            # Upgrades and supports are bought together by one budget, once the required structures are placed
+            budget = gamelib.Budget(game_state)
+            self.build_defences(game_state, block_right=False, enforced_locs=enforced_locs, budget=budget)
+
+            # Lastly, if we have spare SP, let's build some supports, keeping what the optional walls need
+            self.create_endgame_supports(game_state, support_right, budget=budget, keep=self.optional_walls_cost(game_state, holes))
+            self.buy(budget)
+
+            # After buying, so walls upgraded this turn are kept
             self.remove_walls_lvl1(game_state)
             self.patch_optional_walls(game_state, holes)
-
-            # Lastly, if we have spare SP, let's build some supports
-            self.create_endgame_supports(game_state, support_right)
         else:
             defense = AltDefense(game_state, self.config)
             defense.build_defences()
@@ -264,11 +283,19 @@ class AlgoStrategy(gamelib.AlgoCore):
             attack = AttackStrategy(game_state, self.config)
             attack.attack()
 
+    def optional_walls_cost(self, game_state, holes):
+        """The SP patch_optional_walls will spend."""
+        walls = [wall for wall in self.P1_WALLS_OPTIONAL if wall not in holes]
+        if not walls:
+            return 0
+        return len(game_state.spawn_locations(WALL, walls)) * game_state.type_cost(WALL)[0]
+
     def patch_optional_walls(self, game_state, holes):
-        for wall in list(self.P1_WALLS_OPTIONAL.keys()):
-            if wall not in holes:
-                game_state.attempt_spawn(WALL, wall)
-                game_state.attempt_remove(wall)
+        with game_state.plan() as plan:
+            for wall in list(self.P1_WALLS_OPTIONAL.keys()):
+                if wall not in holes:
+                    plan.spawn(WALL, wall)
+                    plan.remove(wall)
 
     def repair_defences(self, game_state, ignore_locations=None):
         """
@@ -283,13 +310,9 @@ class AlgoStrategy(gamelib.AlgoCore):
         """
         broken_structures = []      # max-heap based on y
         to_replace = []
-        
-        current_SP = game_state.get_resources(0)[0]
-        total_cost = 0
 
         wall = WALL
         turret = TURRET
-        cost = {wall: game_state.type_cost(WALL), turret: game_state.type_cost(TURRET)}
 
         walls_to_check = list(self.P1_WALLS_EXPECTED.keys())
 
@@ -311,7 +334,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         for loc in turrets_to_check:
             unit = game_state.contains_stationary_unit(loc)
             if unit == False:       # If broken, add to list
-                if ignore_locations is not None and location in ignore_locations:
+                if ignore_locations is not None and loc in ignore_locations:
                     continue
                 heappush(broken_structures, (-loc[1], turret, loc))
             else:
@@ -319,20 +342,17 @@ class AlgoStrategy(gamelib.AlgoCore):
                     to_replace.append(loc)
 
         # ==REPAIR==:
-        # Spawn all broken walls and turrets
-        while len(broken_structures) > 0:
-            y, unit_type, location = heappop(broken_structures)
-            
-            # Calculate cost for early exit
-            total_cost += cost[unit_type][0]
-            if total_cost > current_SP:
-                break
-
-            game_state.attempt_spawn(unit_type, location)
-
-        # Remove damaged stuff
-        if len(to_replace) != 0:
-            game_state.attempt_remove(to_replace)
+        with game_state.plan() as plan:
+            # Spawn all broken walls and turrets, stopping at the first we can't afford
+            while len(broken_structures) > 0:
+                y, unit_type, location = heappop(broken_structures)
+                if plan.number_affordable(unit_type) == 0:
+                    break
+                plan.spawn(unit_type, location)
+
+            # Remove damaged stuff
+            if len(to_replace) != 0:
+                plan.remove(to_replace)
 
     def assign_upgraded(self, locations):
         """Update expected walls/turrets to be upgraded."""
@@ -342,9 +362,23 @@ class AlgoStrategy(gamelib.AlgoCore):
             else:
                 self.P1_TURRET_EXPECTED[loc] = 2
 
-    def build_defences(self, game_state, block_right=False, enforced_locs=None):
+    def buy(self, budget):
+        """Buys what the budget chose and counts the supports it built."""
+        chosen = budget.solve()
+        budget.apply()
+        for purchase in chosen:
+            # Candidates are only open locations, so a support standing there now was bought
+            if purchase.unit_type == SUPPORT and not purchase.upgrade and budget.game_state.contains_stationary_unit(purchase.location):
+                self.P1_SUPPORT_EXPECTED.add(purchase.location)
+                self.total_support += 1
+
+    def build_defences(self, game_state, block_right=False, enforced_locs=None, budget=None):
         """
         Build funnel defense.
+
+        Turrets and walls are placed right away. Upgrades and then supports are added to budget
+        in priority order, and bought when it is solved. If no budget is given, one is made and
+        bought here.
         """
         def formatter(unit_type, locations):
             return [(loc, unit_type) for loc in locations]
@@ -432,8 +466,8 @@ class AlgoStrategy(gamelib.AlgoCore):
                 (21, 10), (22, 10),                         # upgrade last 2 RHS turrets
                 (3, 10),     # upgrade last wall on the LHS for extra defense
             )
-            # TODO: Might need to edit attempt_upgrade to stop if it can't purchase the next one?
-            
+            # The budget skips an upgrade it can't afford and goes on with the next ones
+
             # TODO: Might need to decide between support vs buffing defense?
             to_upgrade.extend(upgrade_6)
             self.assign_upgraded(upgrade_6)
@@ -471,18 +505,23 @@ class AlgoStrategy(gamelib.AlgoCore):
             supports_loc = [s for s in supports_loc if s in enforced_locs]
 
         # Turn 1 Turrets & Walls
-        game_state.attempt_spawn(TURRET, turrets_loc)
-        game_state.attempt_spawn(WALL, walls_loc)
-        game_state.attempt_upgrade(to_upgrade)
-
-        # (Mid-to-End Game) Supports
-        before_SP = game_state.get_resource(0, 0)
-        game_state.attempt_spawn(SUPPORT, supports_loc)
-        if len(supports_loc) != 0:
-            game_state.attempt_upgrade(supports_loc)
-        
-        after_SP = game_state.get_resource(0, 0)
-        self.total_support += ((after_SP - before_SP) // game_state.type_cost(SUPPORT)[0])
+        with game_state.plan() as plan:
+            plan.spawn(TURRET, turrets_loc)
+            plan.spawn(WALL, walls_loc)
+
+        own_budget = budget is None
+        if own_budget:
+            budget = gamelib.Budget(game_state)
+        for index, loc in enumerate(to_upgrade):
+            budget.upgrade(loc, value=ranked_value(UPGRADE_RANK, index, len(to_upgrade)))
+
+        # (Mid-to-End Game) Supports, with what the upgrades leave, then their upgrades
+        for index, loc in enumerate(supports_loc):
+            budget.spawn(SUPPORT, loc, value=ranked_value(SUPPORT_RANK, index, 2 * len(supports_loc)))
+        for index, loc in enumerate(supports_loc):
+            budget.upgrade(loc, value=ranked_value(SUPPORT_RANK, len(supports_loc) + index, 2 * len(supports_loc)))
+        if own_budget:
+            self.buy(budget)
 
         # Keep the right 2 walls as optional
         # if not block_right:
@@ -556,7 +595,7 @@ class AlgoStrategy(gamelib.AlgoCore):
         
         # Remove locations that are blocked by our own structures 
         # since we can't deploy units there.
-        deploy_locations = self.filter_blocked_locations(friendly_edges, game_state)
+        deploy_locations = game_state.spawn_locations(INTERCEPTOR, friendly_edges)
         
         # While we have remaining MP to spend lets send out interceptors randomly.
         while game_state.get_resource(MP) >= game_state.type_cost(INTERCEPTOR)[MP] and len(deploy_locations) > 0:
@@ -638,7 +677,7 @@ class AlgoStrategy(gamelib.AlgoCore):
             damage = 0
             for path_location in path or []:
                 # Get number of enemy turrets that can attack each location and multiply by turret damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET, game_state.config).damage_i
+                damage += len(game_state.get_attackers(path_location, 0)) * game_state.catalog.unit_stats(TURRET).damage_i
             damages.append(damage)
         
         # Now just return the location that takes the least damage
@@ -653,37 +692,23 @@ class AlgoStrategy(gamelib.AlgoCore):
                         total_units += 1
         return total_units
         
-    def filter_blocked_locations(self, locations, game_state):
-        filtered = []
-        for location in locations:
-            if not game_state.contains_stationary_unit(location):
-                filtered.append(location)
-        return filtered
-
-    def on_action_frame(self, turn_string):
+    def on_breach(self, breaches):
         """
-        This is the action frame of the game. This function could be called 
-        hundreds of times per turn and could slow the algo down so avoid putting slow code here.
-        Processing the action frames is complicated so we only suggest it if you have time and experience.
-        Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
+        Called for every action frame with breaches, with the breaches of that frame as an EventBatch.
+        This could be called many times per turn, so avoid putting slow code here.
+        Owners use the StarterKit convention, 0 for yourself and 1 for the opponent.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
-        events = state["events"]
-        breaches = events["breach"]
-        for breach in breaches:
-            location = breach[0]
-            unit_owner_self = True if breach[4] == 1 else False
-            # When parsing the frame data directly, 
-            # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
-            if not unit_owner_self:
-                gamelib.debug_write("Got scored on at: {}".format(location))
+        for i in range(len(breaches)):
+            if breaches.owner[i] == 1:
+                location = breaches.location(i)
+                gamelib.log.info("Got scored on at: {}", location)
                 self.scored_on_locations.add(tuple(location))
-                gamelib.debug_write("All locations: {}".format(self.scored_on_locations))
+                gamelib.log.info("All locations: {}", set(self.scored_on_locations))
 
 
     # HELPER FUNCTIONS
-    def create_endgame_supports(self, game_state, support_right=True):
+    def create_endgame_supports(self, game_state, support_right=True, budget=None, keep=0):
         """
         If SP is greater than 15, attempt to use excess to create supports.
 
@@ -693,20 +718,23 @@ class AlgoStrategy(gamelib.AlgoCore):
             Current game state
         support_right: bool
             If true, final structure of supports tunnels rightwards.
+        budget: Budget
+            The turn's budget to add the supports to. If None, one is made and bought here.
+        keep: float
+            SP the turn still spends after the supports, kept on top of the usual 12.
         """
-        support_cost = game_state.type_cost(SUPPORT)[0]
-
         right_facing_supports = [(15, 1), (14, 1), (16, 2), (15, 2), (14, 2), (13, 2), (17, 3), (16, 3), (15, 3), (14, 3), (13, 3), (12, 3), (17, 5), (16, 5), (15, 5), (14, 5), (13, 5), (12, 5), (11, 5), (18, 6), (17, 6), (16, 6), (15, 6), (14, 6), (13, 6), (12, 6), (11, 6), (10, 6)]
         left_facing_supports = [(27 - loc[0], loc[1]) for loc in right_facing_supports]
         supports_loc = right_facing_supports if support_right else left_facing_supports
 
-        for loc in supports_loc:
-            if game_state.get_resource(0, 0) - support_cost < 12:
-                break
-            game_state.attempt_spawn(SUPPORT, loc)
-            
-            self.P1_SUPPORT_EXPECTED.add(loc)
-            self.total_support += 1
+        own_budget = budget is None
+        if own_budget:
+            budget = gamelib.Budget(game_state)
+        # Only bought in order with the SP left over above 12, after everything build_defences wants
+        for index, loc in enumerate(supports_loc):
+            budget.spawn(SUPPORT, loc, value=ranked_value(ENDGAME_SUPPORT_RANK, index, len(supports_loc)), floor=12 + keep)
+        if own_budget:
+            self.buy(budget)
             
     def remove_walls_lvl1(self, game_state):
         """Removes level 1 walls."""
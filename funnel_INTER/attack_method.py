@@ -1,21 +1,21 @@
 import math
 
-def init_attack_method_globals(config):
+def init_attack_method_globals(catalog):
     global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, PING_HEALTH, DEMO_HEALTH, PING_COST, DEMO_COST, INTERCEPTOR_COST, WALL_COST
-    WALL = config["unitInformation"][0]["shorthand"]
-    SUPPORT = config["unitInformation"][1]["shorthand"]
-    TURRET = config["unitInformation"][2]["shorthand"]
-    SCOUT = config["unitInformation"][3]["shorthand"]
-    DEMOLISHER = config["unitInformation"][4]["shorthand"]
-    INTERCEPTOR = config["unitInformation"][5]["shorthand"]
+    WALL = catalog.WALL
+    SUPPORT = catalog.SUPPORT
+    TURRET = catalog.TURRET
+    SCOUT = catalog.SCOUT
+    DEMOLISHER = catalog.DEMOLISHER
+    INTERCEPTOR = catalog.INTERCEPTOR
 
-    PING_HEALTH = config["unitInformation"][3]["startHealth"]
-    DEMO_HEALTH = config["unitInformation"][4]["startHealth"]
-    PING_COST = config["unitInformation"][3]["cost2"]
-    DEMO_COST = config["unitInformation"][4]["cost2"]
-    INTERCEPTOR_COST = config["unitInformation"][5]["cost2"]
+    PING_HEALTH = catalog.unit_stats(SCOUT).max_health
+    DEMO_HEALTH = catalog.unit_stats(DEMOLISHER).max_health
+    PING_COST = catalog.unit_stats(SCOUT).cost[1]
+    DEMO_COST = catalog.unit_stats(DEMOLISHER).cost[1]
+    INTERCEPTOR_COST = catalog.unit_stats(INTERCEPTOR).cost[1]
 
-    WALL_COST = config["unitInformation"][0]["cost1"]
+    WALL_COST = catalog.unit_stats(WALL).cost[0]
 
 class AttackMethod:
     def get_holes(self, game_state):
@@ -28,14 +28,15 @@ class AttackMethod:
         structs = self.get_new_structures(game_state, 0)
         if not structs:
             return None
-        for struct in structs:
-            game_state.attempt_spawn(struct[2], struct[:2])
-
-        instant_sells = self.get_instant_sells(game_state)
-        for sale in instant_sells:
-            existing_struct = game_state.contains_stationary_unit(sale)
-            if existing_struct and existing_struct.unit_type == WALL:
-                game_state.attempt_remove(sale)
+        with game_state.plan() as plan:
+            for struct in structs:
+                plan.spawn(struct[2], struct[:2])
+
+            instant_sells = self.get_instant_sells(game_state)
+            for sale in instant_sells:
+                existing_struct = plan.structure_at(sale)
+                if existing_struct and existing_struct[0] == WALL:
+                    plan.remove(sale)
 
     def get_new_structures(self, game_state, min_remaining):
         structures = self.get_required_structures(game_state)
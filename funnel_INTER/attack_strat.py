@@ -32,12 +32,13 @@ class AttackStrategy:
 
     def __init__(self, game_state: GameState, config):
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, MP, SP
-        WALL = config["unitInformation"][0]["shorthand"]
-        SUPPORT = config["unitInformation"][1]["shorthand"]
-        TURRET = config["unitInformation"][2]["shorthand"]
-        SCOUT = config["unitInformation"][3]["shorthand"]
-        DEMOLISHER = config["unitInformation"][4]["shorthand"]
-        INTERCEPTOR = config["unitInformation"][5]["shorthand"]
+        catalog = game_state.catalog
+        WALL = catalog.WALL
+        SUPPORT = catalog.SUPPORT
+        TURRET = catalog.TURRET
+        SCOUT = catalog.SCOUT
+        DEMOLISHER = catalog.DEMOLISHER
+        INTERCEPTOR = catalog.INTERCEPTOR
         MP = 1
         SP = 0
 
@@ -94,8 +95,7 @@ class AttackStrategy:
             damage = 0
             for path_location in path or []:
                 # Get number of enemy turrets that can attack each location and multiply by turret damage
-                damage += len(game_state.get_attackers(path_location, 0)) * gamelib.GameUnit(TURRET,
-                                                                                             game_state.config).damage_i
+                damage += len(game_state.get_attackers(path_location, 0)) * game_state.catalog.unit_stats(TURRET).damage_i
             damages.append(damage)
 
         # Now just return the location that takes the least damage
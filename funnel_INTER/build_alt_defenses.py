@@ -8,12 +8,13 @@ class AltDefense:
 
     def __init__(self, game_state: GameState, config):
         global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, MP, SP
-        WALL = config["unitInformation"][0]["shorthand"]
-        SUPPORT = config["unitInformation"][1]["shorthand"]
-        TURRET = config["unitInformation"][2]["shorthand"]
-        SCOUT = config["unitInformation"][3]["shorthand"]
-        DEMOLISHER = config["unitInformation"][4]["shorthand"]
-        INTERCEPTOR = config["unitInformation"][5]["shorthand"]
+        catalog = game_state.catalog
+        WALL = catalog.WALL
+        SUPPORT = catalog.SUPPORT
+        TURRET = catalog.TURRET
+        SCOUT = catalog.SCOUT
+        DEMOLISHER = catalog.DEMOLISHER
+        INTERCEPTOR = catalog.INTERCEPTOR
         MP = 1
         SP = 0
 
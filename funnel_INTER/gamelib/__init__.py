@@ -16,14 +16,39 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+The UnitCatalog class in catalog.py holds the unit shorthands, stats and costs compiled from the config once per game.
+Every GameState and GameUnit built from the same config shares it. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
+plan.py contains the BuildPlan class returned by GameState.plan(), which stages a turn's spawns, upgrades and removals before committing them.
+shared_board.py publishes a GameState in shared memory once per turn for worker processes to evaluate moves against.
+simulator.py contains the Simulator, which plays out the action phase that follows a turn frame by frame.
+replay.py reads .replay files and checks the Simulator against the action phases they recorded.
+match.py contains LocalMatch, which plays a whole match between two algos in one process for self-play.
+search.py contains the LookaheadSearch, a time-budgeted beam search over the defenses and attacks of the next few turns.
+workers.py contains the WorkerPool started by AlgoCore.start_workers(), which runs those evaluations for the whole game.
+log.py queues leveled debug messages and writes them at turn boundaries, so logging does not slow down a turn.
 """
 
 from .algocore import AlgoCore
-from .util import debug_write
+from .async_algocore import AsyncAlgoCore
+from .util import debug_write, decode_state, EngineMessage
+from . import log
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
-
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+from .catalog import UnitCatalog, UnitStats
+from .unit_arrays import UnitArrays, StructureDiff
+from .events import EventBatch
+from .plan import BuildPlan
+from .economy import Economy, Projection
+from .budget import Budget, Purchase
+from .shared_board import SharedBoard, board_state
+from .workers import WorkerPool
+from .simulator import Simulator, SimulationFrame, SimulationResult
+from .replay import Replay, TurnCheck
+from .search import LookaheadSearch, Option, TurnChoice, SearchResult, apply_choice
+from .match import LocalMatch, MatchResult
+
+__all__ = ["algocore", "async_algocore", "background", "budget", "catalog", "economy", "events", "game_state", "game_map", "log", "match", "navigation", "plan", "replay", "search", "shared_board", "simulator", "unit", "unit_arrays", "util", "workers"]
  
\ No newline at end of file
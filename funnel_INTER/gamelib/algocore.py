@@ -1,7 +1,12 @@
 import json
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .catalog import UnitCatalog
+from .events import EVENT_KINDS, EventBatch, decode_event_list
+from .background import BackgroundRunner, IdleContext
+from .workers import WorkerPool
+from . import log
+from .util import get_command, debug_write, BANNER_TEXT, send_command, EngineMessage, read_turn_info, has_events
 
 class AlgoCore(object):
     """
@@ -10,18 +15,156 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * catalog (:obj: UnitCatalog): The unit types, stats and costs compiled from config at the start of the game
+        * previous_game_state (:obj: GameState): The last GameState built by create_game_state, None before the first turn
+        * frame_interval (int): If set by watch_frames, every frame whose number is a multiple of it is decoded
+        * frame_events (tuple): If set by watch_frames, every frame with one of these kinds of events is decoded
+        * background_results (dict): The results of the background tasks that finished during the last action phase, by task name
+        * workers (:obj: WorkerPool): The worker processes started by start_workers, None if there are none
 
     """
     def __init__(self):
         self.config = None
+        self.catalog = None
+        self.previous_game_state = None
+        self.frame_interval = None
+        self.frame_events = None
+        self._event_handlers = {}
+        self._background = BackgroundRunner()
+        self.background_results = {}
+        self.workers = None
 
     def on_game_start(self, config):
         """
         This function is called once at the start of the game. 
-        By default, it just initializes the config. \n
+        By default, it just initializes the config and compiles the unit catalog. \n
         You can override it it in algo_strategy.py to perform start of game setup
         """
         self.config = config
+        self.catalog = UnitCatalog.for_config(config)
+        self.previous_game_state = None
+
+    def start_workers(self, processes=None):
+        """
+        Starts a pool of worker processes that lasts for the rest of the game. Call it from on_game_start, 
+        after the config is loaded, as starting processes takes too long for a turn. The workers are stopped 
+        when the game ends or the engine goes away.
+
+        Args:
+            processes: The number of workers, one per CPU if None
+
+        Returns:
+            The WorkerPool, also kept in self.workers. See gamelib/workers.py
+        """
+        if self.workers is None:
+            self.workers = WorkerPool(self.config, processes)
+        return self.workers
+
+    def stop_workers(self):
+        """
+        Stops the worker processes, if they were started.
+        """
+        if self.workers is not None:
+            self.workers.close()
+            self.workers = None
+
+    def create_game_state(self, turn_state, lazy=True):
+        """
+        Builds the GameState for a turn on top of the previous turn's state. 
+        The new state's structure_diff lists the structures that changed since then, 
+        and paths found last turn are reused while the board is unchanged.
+
+        Args:
+            turn_state: The game state string passed to on_turn
+            lazy: If True, GameUnits are only created for the locations that are read
+
+        Returns:
+            The new GameState
+        """
+        game_state = GameState(self.config, turn_state, self.catalog, lazy=lazy, previous=self.previous_game_state)
+        self.previous_game_state = game_state
+        return game_state
+
+    def watch_frames(self, every=None, events=()):
+        """
+        Registers which action frames on_action_frame should see. Until this is called every frame is decoded 
+        and passed on. Afterwards, frames that match neither rule are skipped without being decoded.
+
+        Args:
+            every: Pass on every frame whose frame number is a multiple of this, or None
+            events: Event kinds, such as "breach" or "death". Pass on every frame with at least one of them
+        """
+        self.frame_interval = every
+        self.frame_events = tuple(events)
+
+    def add_background_task(self, name, task):
+        """
+        Registers a task to run on a worker thread while the engine plays out the action phase. 
+        Tasks start after on_turn returns, with an IdleContext holding the submitted state and the frames 
+        received so far. When the next turn arrives, unfinished tasks are cancelled and the results of the 
+        finished ones are in self.background_results for on_turn.
+
+        Args:
+            name: The key of the task's result in background_results
+            task: A function taking an IdleContext. It should return early once context.cancelled is True
+        """
+        self._background.register(name, task)
+
+    def subscribe(self, event_kind, handler):
+        """
+        Calls handler with an EventBatch for every action frame that has events of the given kind.
+        Only the event lists somebody subscribed to are decoded, and frames are not decoded any further 
+        unless on_action_frame also wants them.
+
+        Args:
+            event_kind: One of "breach", "damage", "death", "shield", "move", "spawn", "selfDestruct", "attack" or "melee"
+            handler: A function taking an EventBatch
+        """
+        if event_kind not in EVENT_KINDS:
+            debug_write("Can not subscribe to unknown event kind '{}'. Expected one of {}".format(event_kind, ", ".join(EVENT_KINDS)))
+            return
+        self._event_handlers.setdefault(event_kind, []).append(handler)
+
+    def dispatch_events(self, message, turn_info):
+        """
+        Sends the subscribed events of an action frame to their handlers.
+
+        Args:
+            message: The frame, as an EngineMessage or a raw line
+            turn_info: The [type, turn, frame] list of the frame
+        """
+        for event_kind, handlers in self._event_handlers.items():
+            if not isinstance(message, EngineMessage) and not has_events(message, event_kind):
+                continue
+            events = decode_event_list(message, event_kind)
+            if not events:
+                continue
+            batch = EventBatch(event_kind, int(turn_info[1]), int(turn_info[2]), events)
+            for handler in handlers:
+                handler(batch)
+
+    def wants_frame(self, line, turn_info):
+        """
+        Decides from the raw line whether an action frame should be decoded and passed to on_action_frame.
+        Frames are never decoded if on_action_frame is not overridden.
+
+        Args:
+            line: The raw frame line
+            turn_info: The [type, turn, frame] list read from the line
+
+        Returns:
+            True if the frame should be decoded
+        """
+        if type(self).on_action_frame is AlgoCore.on_action_frame:
+            return False
+        if self.frame_events is None:
+            return True
+        if self.frame_interval and int(turn_info[2]) % self.frame_interval == 0:
+            return True
+        for event_kind in self.frame_events:
+            if has_events(line, event_kind):
+                return True
+        return False
 
     def on_turn(self, game_state):
         """
@@ -52,44 +195,128 @@ class AlgoCore(object):
         The algo continues this loop until it recieves the "End" turn message from the game.
         """
         debug_write(BANNER_TEXT)
+        try:
+            self.__read_messages()
+        finally:
+            # Also reached when get_command exits on EOF
+            self.stop_workers()
 
+    def __read_messages(self):
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
             game_state_string = get_command()
-            if "replaySave" in game_state_string:
-                """
-                This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
-                """
-                parsed_config = json.loads(game_state_string)
-                self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
-                    """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents a single frame of an action phase
-                    """
-                    self.on_action_frame(game_state_string)
-                elif stateType == 2:
-                    """
-                    This is the end game message. This means the game is over so break and finish the program.
-                    """
-                    debug_write("Got end state, game over. Stopping algo.")
-                    break
-                else:
-                    """
-                    Something is wrong? Received an incorrect or improperly formatted string.
-                    """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
-            else:
-                """
-                Something is wrong? Received an incorrect or improperly formatted string.
-                """
-                debug_write("Got unexpected string : {}".format(game_state_string))
+            if not self.handle_message(game_state_string):
+                break
+
+    def handle_message(self, game_state_string):
+        """
+        Handles one line from the engine the way the parsing loop does, calling on_turn, on_action_frame or end_game.
+        A match runner that feeds lines directly, such as gamelib/match.py, calls it instead of start.
+
+        Args:
+            game_state_string: A raw line from the engine
+
+        Returns:
+            False once the end game message has been handled, True otherwise
+        """
+        received = self.receive_message(game_state_string)
+        if received is None:
+            return True
+        stateType, message = received
+        if stateType == 0:
+            """
+            This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+            deploy phase. Printing is handled by the provided functions.
+            """
+            self.begin_turn()
+            self.on_turn(message)
+            self.end_turn(message)
+        elif stateType == 1:
+            """
+            If stateType == 1, this game_state_string string represents a single frame of an action phase
+            """
+            self.on_action_frame(message)
+        elif stateType == 2:
+            """
+            This is the end game message. This means the game is over so break and finish the program.
+            """
+            self.end_game()
+            return False
+        return True
+
+    def receive_message(self, game_state_string):
+        """
+        Handles everything about an engine message that does not need the strategy: loading the config, 
+        skipping unwanted frames, dispatching subscribed events and feeding background tasks.
+
+        Args:
+            game_state_string: A raw line from the engine
+
+        Returns:
+            None if nothing else needs to happen, otherwise (stateType, message) where message is an EngineMessage 
+            for on_turn or on_action_frame
+        """
+        if "replaySave" in game_state_string:
+            """
+            This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
+            """
+            parsed_config = json.loads(game_state_string)
+            self.on_game_start(parsed_config)
+        elif "turnInfo" in game_state_string:
+            """
+            The frame type is read from the raw line, so action frames nobody asked for are never decoded.
+            Other messages are decoded once here. Handlers get them as an EngineMessage, which is still the 
+            raw string but carries the decoded object for GameState and decode_state to reuse.
+            """
+            turn_info = read_turn_info(game_state_string)
+            if turn_info is not None and int(turn_info[0]) == 1:
+                self._background.add_frame(game_state_string)
+                if not self.wants_frame(game_state_string, turn_info):
+                    if self._event_handlers:
+                        self.dispatch_events(game_state_string, turn_info)
+                    return None
+            state = json.loads(game_state_string)
+            message = EngineMessage(game_state_string, state)
+            stateType = int(state.get("turnInfo")[0])
+            if stateType == 1 and self._event_handlers:
+                self.dispatch_events(message, state["turnInfo"])
+            if stateType in (0, 1, 2):
+                return stateType, message
+            """
+            Something is wrong? Received an incorrect or improperly formatted string.
+            """
+            debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+        else:
+            """
+            Something is wrong? Received an incorrect or improperly formatted string.
+            """
+            debug_write("Got unexpected string : {}".format(game_state_string))
+        return None
+
+    def begin_turn(self):
+        """
+        Called right before on_turn. Writes the messages logged during the action phase, 
+        then cancels last action phase's background tasks and collects their results.
+        """
+        log.flush()
+        self.background_results = self._background.collect()
+
+    def end_turn(self, message):
+        """
+        Called right after on_turn. Writes the messages logged during the turn and starts the background tasks for the action phase.
+        """
+        log.flush()
+        if self._background.has_tasks():
+            game_state = self.previous_game_state
+            if game_state is not None and game_state.serialized_string is not message:
+                game_state = None
+            self._background.start(IdleContext(int(message.state["turnInfo"][1]), message, game_state))
+
+    def end_game(self):
+        """
+        Called when the end game message arrives.
+        """
+        debug_write("Got end state, game over. Stopping algo.")
+        self._background.collect()
+        self.stop_workers()
@@ -0,0 +1,192 @@
+import asyncio
+import inspect
+import sys
+import threading
+import traceback
+
+from .algocore import AlgoCore
+from .util import debug_write, BANNER_TEXT, add_command_listener, remove_command_listener
+
+
+class AsyncAlgoCore(AlgoCore):
+    """
+    A version of AlgoCore that reads engine messages from an asyncio stream instead of blocking on stdin. \n
+    on_turn and on_action_frame may be coroutines. on_turn runs as a task, so once it has submitted the turn it can
+    keep computing while the action frames of that turn are read and dispatched. A turn still running when
+    the next one arrives is cancelled. The messages read and the commands written are the same as AlgoCore's,
+    and like the engine, the loop does not read past a turn until on_turn has sent its two command lines.
+    If on_turn raises before sending them, the exception is raised out of start, as AlgoCore's would be.
+
+    Attributes :
+        * turn_time_budget (float): Seconds on_turn may use, read from the config's waitTimeBotSoft
+        * turn_deadline (float): Event loop time at which the current turn's budget runs out
+
+    """
+    STREAM_LIMIT = 2 ** 24
+
+    def __init__(self):
+        super().__init__()
+        self.turn_time_budget = 3.0
+        self.turn_deadline = None
+        self._turn_task = None
+        self._loop = None
+        self._commands_sent = 0
+        self._submitted = None
+
+    def on_game_start(self, config):
+        """
+        Initializes the config, unit catalog and turn time budget.
+        """
+        super().on_game_start(config)
+        self.turn_time_budget = config.get("timingAndReplay", {}).get("waitTimeBotSoft", self.turn_time_budget * 1000) / 1000
+
+    def time_left(self):
+        """
+        Returns:
+            The seconds left before the current turn's deadline, or None outside of a turn
+        """
+        if self.turn_deadline is None:
+            return None
+        return self.turn_deadline - self._loop.time()
+
+    async def checkpoint(self):
+        """
+        Lets the event loop read and dispatch waiting messages. Long computations in on_turn should await it regularly.
+
+        Returns:
+            True while the turn is within its deadline, False once the deadline has passed
+        """
+        await asyncio.sleep(0)
+        time_left = self.time_left()
+        return time_left is None or time_left > 0
+
+    async def within_deadline(self, awaitable, default=None):
+        """
+        Awaits something, giving up when the current turn's deadline passes.
+
+        Args:
+            awaitable: The coroutine or future to wait for
+            default: What to return if the deadline passes first
+
+        Returns:
+            The awaited result, or default
+        """
+        time_left = self.time_left()
+        try:
+            return await asyncio.wait_for(awaitable, None if time_left is None else max(time_left, 0))
+        except asyncio.TimeoutError:
+            return default
+
+    def start(self):
+        """
+        Start the parsing loop on stdin in a new event loop.
+        """
+        asyncio.run(self.start_async())
+
+    async def start_async(self, reader=None):
+        """
+        The parsing loop. It reads messages until the "End" turn message or the end of the stream.
+
+        Args:
+            reader: An asyncio.StreamReader of engine messages. Reads stdin if None
+        """
+        debug_write(BANNER_TEXT)
+        self._loop = asyncio.get_running_loop()
+        self._submitted = asyncio.Event()
+        if reader is None:
+            reader = await self.__stdin_reader()
+        add_command_listener(self.__command_sent)
+        try:
+            await self.__read_messages(reader)
+        finally:
+            remove_command_listener(self.__command_sent)
+            self.stop_workers()
+        await self.__finish_turn_task()
+
+    async def __read_messages(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                # Happens if parent game process dies, so exit for cleanup
+                debug_write("Got EOF, parent game process must have died, exiting for cleanup")
+                break
+            received = self.receive_message(line.decode())
+            if received is None:
+                continue
+            stateType, message = received
+            if stateType == 0:
+                await self.__finish_turn_task()
+                self.begin_turn()
+                self.turn_deadline = self._loop.time() + self.turn_time_budget
+                self._commands_sent = 0
+                self._submitted.clear()
+                self._turn_task = asyncio.ensure_future(self.__call(self.on_turn, message))
+                self._turn_task.add_done_callback(lambda task, message=message: self.__turn_done(task, message))
+                # The engine only continues once the turn is submitted, so neither do we
+                submitted = asyncio.ensure_future(self._submitted.wait())
+                await asyncio.wait([self._turn_task, submitted], return_when=asyncio.FIRST_COMPLETED)
+                submitted.cancel()
+                if not self._submitted.is_set() and self._turn_task.exception() is not None:
+                    # The engine would wait for commands that never come
+                    raise self._turn_task.exception()
+            elif stateType == 1:
+                await self.__call(self.on_action_frame, message)
+            elif stateType == 2:
+                await self.__finish_turn_task()
+                self.end_game()
+                break
+
+    def __command_sent(self, command):
+        self._commands_sent += 1
+        if self._commands_sent >= 2:
+            self._submitted.set()
+
+    async def __call(self, handler, message):
+        result = handler(message)
+        if inspect.isawaitable(result):
+            await result
+
+    def __turn_done(self, task, message):
+        """Starts the background tasks once on_turn is done, like AlgoCore does after on_turn returns"""
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            if not self._submitted.is_set():
+                # Raised out of the parsing loop instead
+                return
+            debug_write("on_turn failed:\n" + "".join(traceback.format_exception(type(task.exception()), task.exception(), task.exception().__traceback__)))
+            return
+        self.end_turn(message)
+
+    async def __finish_turn_task(self):
+        """Cancels the previous turn's on_turn if it is still running"""
+        task = self._turn_task
+        self._turn_task = None
+        self.turn_deadline = None
+        if task is None:
+            return
+        if not task.done():
+            task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Already reported when the task finished
+            pass
+
+    async def __stdin_reader(self):
+        reader = asyncio.StreamReader(limit=self.STREAM_LIMIT)
+        try:
+            await self._loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        except (ValueError, OSError):
+            # stdin is a regular file, for example a recorded game, which can not be watched by the event loop
+            loop = self._loop
+
+            def pump():
+                for line in iter(sys.stdin.buffer.readline, b""):
+                    loop.call_soon_threadsafe(reader.feed_data, line)
+                loop.call_soon_threadsafe(reader.feed_eof)
+
+            threading.Thread(target=pump, name="stdin-reader", daemon=True).start()
+        return reader
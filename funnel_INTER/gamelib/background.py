@@ -0,0 +1,125 @@
+import threading
+import traceback
+
+from .util import debug_write
+
+
+class IdleContext:
+    """What a background task works from while the engine plays out the action phase.
+
+    Attributes :
+        * turn_number (int): The turn that was just submitted
+        * turn_state (string): The game state string that on_turn received
+        * game_state (:obj: GameState): The state the turn was submitted from, including the units
+          placed during the turn, or None if on_turn did not build it with AlgoCore.create_game_state
+
+    """
+    def __init__(self, turn_number, turn_state, game_state):
+        self.turn_number = turn_number
+        self.turn_state = turn_state
+        self.game_state = game_state
+        self._frames = []
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        """True once the next turn has arrived. Long tasks should check it regularly and return early."""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def frames(self):
+        """Gets the raw action frame lines received so far this action phase"""
+        return list(self._frames)
+
+    def latest_frame(self):
+        """Gets the last raw action frame line received, or None if there has not been one yet"""
+        return self._frames[-1] if self._frames else None
+
+    def add_frame(self, line):
+        self._frames.append(line)
+
+
+class BackgroundRunner:
+    """Runs registered tasks on a worker thread between submitting a turn and receiving the next one.
+
+    Tasks run one after another, in the order they were registered. Each one is called with an
+    IdleContext and its return value becomes its result. When the next turn arrives the context is
+    cancelled, and only the results of tasks that finished in time are handed over.
+    """
+    def __init__(self):
+        self._tasks = []
+        self._context = None
+        self._results = {}
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def register(self, name, task):
+        """Adds a task
+
+        Args:
+            name: The key of the task's result
+            task: A function taking an IdleContext
+
+        """
+        self._tasks.append((name, task))
+
+    def has_tasks(self):
+        return len(self._tasks) > 0
+
+    def start(self, context):
+        """Starts running every task on a new worker thread
+
+        Args:
+            context: The IdleContext of the turn that was just submitted
+
+        """
+        self.collect()
+        with self._lock:
+            self._context = context
+            self._results = {}
+        self._worker = threading.Thread(target=self.__run, args=(context,), name="idle-turn-{}".format(context.turn_number), daemon=True)
+        self._worker.start()
+
+    def wait(self, timeout=None):
+        """Blocks until the tasks of the current turn are done, or timeout seconds have passed"""
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+
+    def add_frame(self, line):
+        """Passes an action frame line to the running tasks"""
+        context = self._context
+        if context is not None:
+            context.add_frame(line)
+
+    def collect(self):
+        """Cancels the running tasks and returns the results of the ones that finished
+
+        Returns:
+            A dict from task name to result
+
+        """
+        with self._lock:
+            context = self._context
+            results = self._results
+            self._context = None
+            self._results = {}
+        if context is not None:
+            context.cancel()
+        return results
+
+    def __run(self, context):
+        for name, task in self._tasks:
+            if context.cancelled:
+                return
+            try:
+                result = task(context)
+            except Exception:
+                debug_write("Background task {} failed:\n{}".format(name, traceback.format_exc()))
+                continue
+            with self._lock:
+                # A stale task may finish after the next turn started, its result is dropped
+                if self._context is context and not context.cancelled:
+                    self._results[name] = result
@@ -0,0 +1,559 @@
+"""
+Micro-benchmarks for the hot paths of gamelib.
+
+Each benchmark builds a representative board, times the current implementation and,
+where one exists, the implementation it replaced. Run them from the algo folder with:
+
+    python3 -m gamelib.benchmarks [benchmark names] [--config path/to/game-configs.json]
+
+"""
+import contextlib
+import copy
+import json
+import math
+import os
+import pickle
+import sys
+import timeit
+import tracemalloc
+
+from .algocore import AlgoCore
+from .game_state import GameState
+from .unit import GameUnit
+from .tests import CONFIG, TURN_0, ScoutRush
+from .util import EngineMessage, decode_state, read_turn_info, has_events, debug_write
+from . import log, shared_board, workers
+from .budget import Budget
+from .shared_board import SharedBoard, board_state
+from .workers import WorkerPool
+from .simulator import Simulator
+from .search import LookaheadSearch, Option
+from .match import LocalMatch
+
+
+def load_config(path=None):
+    """Loads a game config, falling back to the config used by the unit tests
+
+    Args:
+        path: Optional path to a game-configs.json file
+
+    Returns:
+        The parsed config
+
+    """
+    if path is None:
+        return json.loads(CONFIG)
+    with open(path) as config_file:
+        return json.load(config_file)
+
+
+def make_state(config, serialized_state=TURN_0):
+    """Builds a GameState with warnings suppressed"""
+    game_state = GameState(config, serialized_state)
+    game_state.suppress_warnings(True)
+    return game_state
+
+
+def populate_late_game_board(game_state):
+    """Fills the board with a dense late game layout of walls and turrets for both players"""
+    game_map = game_state.game_map
+    wall, turret = game_state.config["unitInformation"][0]["shorthand"], game_state.config["unitInformation"][2]["shorthand"]
+    for x in range(game_map.ARENA_SIZE):
+        for y, unit_type, player_index in [(13, wall, 0), (12, turret, 0), (14, wall, 1), (15, turret, 1), (16, turret, 1)]:
+            if game_map.in_arena_bounds([x, y]) and x % 3 != 1:
+                game_map.add_unit(unit_type, [x, y], player_index)
+    return game_state
+
+
+def serialize_units(game_state):
+    """Writes the units of a game state in the format the engine sends at the start of a turn"""
+    catalog = game_state.catalog
+    state = json.loads(game_state.serialized_string)
+    for player_index, key in ((0, "p1Units"), (1, "p2Units")):
+        units = [[] for _ in catalog.shorthands]
+        for location in game_state.game_map:
+            for unit in game_state.game_map[location]:
+                if unit.player_index == player_index:
+                    index = catalog.UNIT_TYPE_TO_INDEX[unit.unit_type]
+                    units[index].append([unit.x, unit.y, unit.health, str(len(units[index]))])
+        state[key] = units
+    return json.dumps(state)
+
+
+def time_call(function, number):
+    """Runs function number times and returns the best average time per call in microseconds"""
+    best = min(timeit.repeat(function, number=number, repeat=3))
+    return best / number * 1e6
+
+
+def report(name, timings):
+    """Prints one line per timing and the speedup of the first timing over the last"""
+    for label, micros in timings:
+        print("{:<28} {:<32} {:>10.1f} us".format(name, label, micros))
+    if len(timings) > 1:
+        print("{:<28} {:<32} {:>10.1f} x".format(name, "speedup", timings[-1][1] / timings[0][1]))
+
+
+def _legacy_get_attackers(game_state, location, player_index):
+    """get_attackers as it was written before the squared distance table"""
+    game_map = game_state.game_map
+    max_range = 0
+    for unit in game_state.config["unitInformation"]:
+        if unit.get('attackRange', 0) >= max_range:
+            max_range = unit.get('attackRange', 0)
+    x, y = location
+    possible_locations = []
+    getHitRadius = game_state.config["unitInformation"][0]['getHitRadius']
+    search_radius = math.ceil(max_range)
+    for i in range(int(x - search_radius), int(x + search_radius + 1)):
+        for j in range(int(y - search_radius), int(y + search_radius + 1)):
+            if game_map.in_arena_bounds([i, j]) and math.sqrt((x - i)**2 + (y - j)**2) < max_range + getHitRadius:
+                possible_locations.append([i, j])
+    attackers = []
+    for location_unit in possible_locations:
+        for unit in game_map[location_unit]:
+            distance = math.sqrt((x - location_unit[0])**2 + (y - location_unit[1])**2)
+            if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and distance <= unit.attackRange:
+                attackers.append(unit)
+    return attackers
+
+
+def bench_get_attackers(config):
+    """Calls get_attackers on every cell of our half of a crowded board, like a path damage estimate does"""
+    game_state = populate_late_game_board(make_state(config))
+    game_state.get_attackers([13, 13], 0)
+    locations = [location for location in game_state.game_map if location[1] < game_state.HALF_ARENA]
+
+    def current():
+        for location in locations:
+            game_state.get_attackers(location, 0)
+
+    def legacy():
+        for location in locations:
+            _legacy_get_attackers(game_state, location, 0)
+
+    report("get_attackers x{}".format(len(locations)), [("squared distance table", time_call(current, 20)), ("math.sqrt", time_call(legacy, 20))])
+
+
+def bench_unit_allocation(config):
+    """Creates the units of a crowded late game board and measures their time and memory cost"""
+    catalog = make_state(config).catalog
+    unit_types = [catalog.WALL, catalog.TURRET, catalog.SUPPORT, catalog.SCOUT] * 100
+
+    def create():
+        return [GameUnit(unit_type, config, 1, None, 13, 14, catalog) for unit_type in unit_types]
+
+    create()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    units = create()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del units
+    report("GameUnit x{}".format(len(unit_types)), [("create", time_call(create, 50))])
+    print("{:<28} {:<32} {:>10.1f} B".format("GameUnit x{}".format(len(unit_types)), "memory per unit", size / len(unit_types)))
+
+
+def bench_parse(config):
+    """Parses a crowded turn eagerly and lazily, then reads a handful of locations like a typical turn does"""
+    serialized_state = serialize_units(populate_late_game_board(make_state(config)))
+    catalog = make_state(config).catalog
+    probes = [[3, 12], [13, 12], [24, 12], [13, 13]]
+
+    def lazy():
+        game_state = GameState(config, serialized_state, catalog, lazy=True)
+        for location in probes:
+            game_state.game_map[location]
+
+    def eager():
+        game_state = GameState(config, serialized_state, catalog)
+        for location in probes:
+            game_state.game_map[location]
+
+    report("GameState parse", [("lazy", time_call(lazy, 200)), ("eager", time_call(eager, 200))])
+
+
+def bench_incremental_turn(config):
+    """Builds the next turn of an unchanged crowded board and paths from every one of our edge locations"""
+    serialized_state = serialize_units(populate_late_game_board(make_state(config)))
+    catalog = make_state(config).catalog
+    previous = GameState(config, serialized_state, catalog, lazy=True)
+    edges = [location for location in previous.game_map.get_edges()[2] + previous.game_map.get_edges()[3] if not previous.contains_stationary_unit(location)]
+    for location in edges:
+        previous.find_path_to_edge(location)
+
+    def next_turn(last):
+        game_state = GameState(config, serialized_state, catalog, lazy=True, previous=last)
+        for location in edges:
+            game_state.find_path_to_edge(location)
+
+    report("next turn, {} paths".format(len(edges)), [("from previous turn", time_call(lambda: next_turn(previous), 20)), ("from scratch", time_call(lambda: next_turn(None), 3))])
+
+
+def bench_frame_dispatch(config):
+    """Dispatches an action frame of a crowded board to a handler that reads its breaches"""
+    frame = serialize_units(populate_late_game_board(make_state(config)))
+
+    def decode_once():
+        message = EngineMessage(frame, json.loads(frame))
+        decode_state(message)["events"]["breach"]
+
+    def decode_twice():
+        json.loads(frame)["turnInfo"]
+        json.loads(frame)["events"]["breach"]
+
+    report("action frame dispatch", [("decoded once", time_call(decode_once, 500)), ("decoded twice", time_call(decode_twice, 500))])
+
+
+def bench_frame_skip(config):
+    """Decides whether to decode an action frame of a crowded board that has no breaches"""
+    frame = serialize_units(populate_late_game_board(make_state(config))).replace('"turnInfo": [0,', '"turnInfo": [1,')
+
+    def sniff():
+        turn_info = read_turn_info(frame)
+        return turn_info[0] == 1 and has_events(frame, "breach")
+
+    def decode():
+        state = json.loads(frame)
+        return state["turnInfo"][0] == 1 and len(state["events"]["breach"]) > 0
+
+    report("skipped action frame", [("read from the raw line", time_call(sniff, 2000)), ("json.loads", time_call(decode, 500))])
+
+
+def bench_event_dispatch(config):
+    """Delivers the breaches of a busy action frame to a subscriber"""
+    frame = serialize_units(populate_late_game_board(make_state(config))).replace('"turnInfo": [0,', '"turnInfo": [1,')
+    state = json.loads(frame)
+    state["events"]["breach"] = [[[3, 10], 1, 3, "12", 2]]
+    state["events"]["damage"] = [[[x, 13], 6.0, 0, str(x), 1] for x in range(28)]
+    state["events"]["move"] = [[[x, 12], [x, 13], [0, 0], 3, str(x), 2] for x in range(28)]
+    frame = json.dumps(state)
+    core = AlgoCore()
+    core.subscribe("breach", lambda batch: None)
+    turn_info = read_turn_info(frame)
+
+    def subscribed():
+        core.dispatch_events(frame, turn_info)
+
+    def decoded():
+        breaches = json.loads(frame)["events"]["breach"]
+        [(breach[0], breach[4]) for breach in breaches]
+
+    report("breach subscription", [("subscribed lists only", time_call(subscribed, 2000)), ("json.loads", time_call(decoded, 500))])
+
+
+def _legacy_attempt_spawn(game_state, unit_type, location, num):
+    """attempt_spawn as it was written before attempt_spawn_many, checking every unit separately"""
+    spawned_units = 0
+    for i in range(num):
+        if game_state.can_spawn(unit_type, location, 1):
+            costs = game_state.type_cost(unit_type)
+            resources = game_state._player_resources[0]
+            resources['SP'] -= costs[0]
+            resources['MP'] -= costs[1]
+            game_state.game_map.add_unit(unit_type, location, 0)
+            game_state._deploy_stack.append((unit_type, location[0], location[1]))
+            spawned_units += 1
+        else:
+            break
+    return spawned_units
+
+
+def bench_spawn_many(config):
+    """Spends a large MP bank on scouts at one location, as a final all in push does"""
+    game_state = make_state(config)
+    game_state.suppress_warnings(True)
+    location = [13, 0]
+
+    def reset():
+        game_state._deploy_stack.clear()
+        game_state._player_resources[0]['MP'] = 200
+        game_state.game_map[location].clear()
+
+    def current():
+        reset()
+        game_state.attempt_spawn(game_state.catalog.SCOUT, location, 1000)
+
+    def legacy():
+        reset()
+        _legacy_attempt_spawn(game_state, game_state.catalog.SCOUT, location, 1000)
+
+    report("attempt_spawn 200 scouts", [("single pass", time_call(current, 200)), ("can_spawn per unit", time_call(legacy, 20))])
+
+
+def bench_spawn_mask(config):
+    """Finds the open deploy edge cells and the open structure cells of a crowded board"""
+    game_state = populate_late_game_board(make_state(config))
+    game_state.suppress_warnings(True)
+    game_map = game_state.game_map
+    edges = game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+    own_half = [location for location in game_map if location[1] < game_state.HALF_ARENA]
+    catalog = game_state.catalog
+
+    def masks():
+        game_state.spawn_locations(catalog.SCOUT, edges)
+        game_state.spawn_locations(catalog.WALL, own_half)
+
+    def can_spawn():
+        [location for location in edges if game_state.can_spawn(catalog.SCOUT, location)]
+        [location for location in own_half if game_state.can_spawn(catalog.WALL, location)]
+
+    report("open spawn cells", [("spawn_locations", time_call(masks, 200)), ("can_spawn", time_call(can_spawn, 20))])
+
+
+def bench_fork(config):
+    """Forks a crowded state and tries a few spawns on the fork, as a lookahead does per candidate move"""
+    game_state = populate_late_game_board(make_state(config))
+    game_state.suppress_warnings(True)
+    catalog = game_state.catalog
+
+    def try_moves(state):
+        state.attempt_spawn(catalog.WALL, [[3, 12], [4, 12]])
+        state.attempt_spawn(catalog.SCOUT, [13, 0], 5)
+
+    def fork():
+        game_state.fork()
+
+    def deepcopy():
+        copy.deepcopy(game_state)
+
+    report("fork", [("fork", time_call(fork, 2000)), ("copy.deepcopy", time_call(deepcopy, 20))])
+    report("fork and spawn", [("fork", time_call(lambda: try_moves(game_state.fork()), 500)),
+                              ("copy.deepcopy", time_call(lambda: try_moves(copy.deepcopy(game_state)), 20))])
+
+
+def bench_economy(config):
+    """Projects 64 spending schedules 20 turns ahead, and finds when a 40 MP push is affordable"""
+    game_state = make_state(config)
+    economy = game_state.economy
+    schedules = [[[index % 8, index // 8]] * 5 for index in range(64)]
+
+    def projected():
+        economy.project_many(game_state.turn_number, 30.0, 5.0, 20, schedules)
+
+    def earliest():
+        economy.earliest_affordable(game_state.turn_number, 30.0, 5.0, [0, 40])
+
+    def stepped():
+        turns = 1
+        while game_state.project_future_MP(turns, 0, 5.0) < 40:
+            turns += 1
+
+    report("64 schedules x 20 turns", [("project_many", time_call(projected, 100))])
+    report("earliest 40 MP", [("earliest_affordable", time_call(earliest, 2000)), ("project_future_MP per turn", time_call(stepped, 200))])
+
+
+def bench_budget(config):
+    """Chooses between repairs, upgrades and endgame supports with 60 SP, as a late turn would"""
+    game_state = make_state(config)
+    game_state.suppress_warnings(True)
+    game_state._player_resources[0]['SP'] = 60.0
+    catalog = game_state.catalog
+    walls = [[x, 13] for x in range(28)] + [[x, 12] for x in range(1, 27)]
+    turrets = [[x, 11] for x in range(2, 26, 2)]
+    supports = [[x, 5] for x in range(9, 19)] + [[x, 6] for x in range(8, 20)]
+
+    def solve():
+        budget = Budget(game_state, reserve=2)
+        budget.spawn(catalog.TURRET, turrets, value=8)
+        budget.spawn(catalog.WALL, walls, value=3)
+        budget.upgrade(turrets, value=5)
+        budget.upgrade(walls[:20], value=2)
+        budget.spawn(catalog.SUPPORT, supports, value=6, floor=12)
+        budget.solve()
+
+    report("budget {} candidates".format(len(walls) + len(turrets) * 2 + 20 + len(supports)), [("knapsack", time_call(solve, 20))])
+
+
+def bench_bytes(config):
+    """Encodes a crowded turn with a few staged moves, then reads it back, against decoding the engine's json"""
+    serialized_state = serialize_units(populate_late_game_board(make_state(config)))
+    game_state = make_state(config, serialized_state)
+    catalog = game_state.catalog
+    game_state.attempt_spawn(catalog.SCOUT, [13, 0], 5)
+    data = game_state.to_bytes()
+    state = json.loads(serialized_state)
+
+    def decode_bytes():
+        GameState.from_bytes(config, data, catalog)
+
+    def decode_json():
+        json.loads(serialized_state)
+
+    def parse_json():
+        GameState(config, serialized_state, catalog, lazy=True)
+
+    report("encode crowded turn", [("to_bytes", time_call(game_state.to_bytes, 2000)), ("json.dumps", time_call(lambda: json.dumps(state), 500))])
+    report("decode crowded turn", [("GameState.from_bytes", time_call(decode_bytes, 2000)), ("json.loads", time_call(decode_json, 500))])
+    report("state from crowded turn", [("from_bytes", time_call(decode_bytes, 2000)), ("GameState from json", time_call(parse_json, 500))])
+    print("{:<28} {:<32} {:>10} bytes".format("crowded turn size", "to_bytes / json", "{} / {}".format(len(data), len(serialized_state))))
+
+
+def bench_shared_board(config):
+    """Hands a crowded turn to a task, by pickling the GameState or by publishing it once to a SharedBoard"""
+    game_state = make_state(config, serialize_units(populate_late_game_board(make_state(config))))
+    catalog = game_state.catalog
+    with SharedBoard() as board:
+        handle = board.publish(game_state)
+        board_state(config, handle, catalog)
+
+        def shared():
+            board_state(config, pickle.loads(pickle.dumps(handle)), catalog)
+
+        def pickled():
+            pickle.loads(pickle.dumps(game_state))
+
+        report("state per task", [("shared board", time_call(shared, 2000)), ("pickled GameState", time_call(pickled, 50))])
+        report("publish per turn", [("SharedBoard.publish", time_call(lambda: board.publish(game_state), 2000))])
+        print("{:<28} {:<32} {:>10} bytes".format("task payload", "shared board / pickled", "{} / {}".format(len(pickle.dumps(handle)), len(pickle.dumps(game_state)))))
+        shared_board.detach()
+
+
+def bench_workers(config):
+    """Finds the turret damage along the path from every spawn location of a crowded board, in this process and on a WorkerPool"""
+    game_state = make_state(config, serialize_units(populate_late_game_board(make_state(config))))
+    game_map = game_state.game_map
+    locations = [location for location in game_map.get_edges()[2] + game_map.get_edges()[3]
+                 if not game_state.contains_stationary_unit(location)]
+
+    def serial():
+        # A new state per run, so paths found in an earlier run are not reused
+        state = game_state.fork()
+        state._path_cache = {}
+        for location in locations:
+            workers.path_damage(state, location)
+
+    with WorkerPool(config, 2) as pool:
+        def pooled():
+            state = game_state.fork()
+            state._path_cache = {}
+            pool.publish(state)
+            pool.map(workers.path_damage, locations)
+
+        report("job round trip", [("WorkerPool", pool.overhead)])
+        report("{} path damages".format(len(locations)), [("2 workers", time_call(pooled, 5)), ("one process", time_call(serial, 5))])
+
+
+def bench_simulator(config):
+    """Simulates ten scouts against three demolishers on a crowded board, as an attack search does per candidate"""
+    game_state = make_state(config, serialize_units(populate_late_game_board(make_state(config))))
+    catalog = game_state.catalog
+    simulator = Simulator(game_state)
+    my_deploys = [(catalog.SCOUT, 13, 0)] * 10
+    enemy_deploys = [(catalog.DEMOLISHER, 14, 27)] * 3
+    frames = simulator.run(my_deploys, enemy_deploys).frame_count
+
+    report("simulated action phase", [("Simulator.run", time_call(lambda: simulator.run(my_deploys, enemy_deploys, record=False), 20)),
+                                      ("with frames recorded", time_call(lambda: simulator.run(my_deploys, enemy_deploys), 20))])
+    print("{:<28} {:<32} {:>10}".format("simulated action phase", "frames", frames))
+
+
+def bench_batch_simulator(config):
+    """Simulates every single-type attack from every edge location of yours on a crowded board, together and one at a time"""
+    game_state = make_state(config, serialize_units(populate_late_game_board(make_state(config))))
+    catalog = game_state.catalog
+    game_map = game_state.game_map
+    locations = [location for location in game_map.get_edges()[2] + game_map.get_edges()[3]
+                 if not game_state.contains_stationary_unit(location)]
+    scenarios = [([(unit_type, x, y)] * 5, []) for unit_type in (catalog.SCOUT, catalog.DEMOLISHER, catalog.INTERCEPTOR) for x, y in locations]
+    simulator = Simulator(game_state)
+    # Every path is cached before timing, as it would be after the first candidate of a search
+    frames = sum(result.frame_count for result in simulator.run_many(scenarios))
+
+    batch = time_call(lambda: simulator.run_many(scenarios), 3)
+    one_at_a_time = time_call(lambda: [simulator.run(my_deploys, enemy_deploys, record=False) for my_deploys, enemy_deploys in scenarios], 3)
+    report("batch simulation", [("Simulator.run_many", batch), ("Simulator.run for each", one_at_a_time)])
+    print("{:<28} {:<32} {:>10}".format("batch simulation", "scenarios", len(scenarios)))
+    print("{:<28} {:<32} {:>10.0f}".format("batch simulation", "scenario-frames per second", frames / batch * 1e6))
+
+
+def bench_search(config):
+    """Searches three turns of six attacks and three defenses on a crowded board, with and without a time budget"""
+    game_state = make_state(config, serialize_units(populate_late_game_board(make_state(config))))
+    catalog = game_state.catalog
+    game_state._player_resources[0]['MP'] = 12.0
+    attacks = [Option("{} {}".format(unit_type, x), [(unit_type, x, 13 - x)] * count)
+               for unit_type, count in ((catalog.SCOUT, 8), (catalog.DEMOLISHER, 3)) for x in (3, 6, 9)]
+    defenses = [Option("support", [(catalog.SUPPORT, 13, 3)]), Option("turret", [(catalog.TURRET, 13, 5)]), Option("walls", [(catalog.WALL, 12, 6), (catalog.WALL, 14, 6)])]
+    search = LookaheadSearch(game_state, defenses, attacks, enemy_deploys=[(catalog.SCOUT, 14, 27)] * 6)
+    # The first search fills the path cache, as earlier turns of a game would
+    search.run()
+    for label, time_budget in (("unlimited", None), ("0.5 s budget", 0.5), ("0.1 s budget", 0.1)):
+        result = search.run(time_budget)
+        print("{:<28} {:<32} {:>10.1f} ms {} turns, {} states, {:.0f} states per second".format(
+            "lookahead search", label, result.seconds * 1e3, result.depth, result.nodes, result.nodes / result.seconds))
+
+
+def bench_match(config):
+    """Plays whole local matches between two scripted scout rushes, with and without sending action frames"""
+    for label, send_frames in (("frames sent", True), ("frames not sent", False)):
+        results = [LocalMatch(config, ScoutRush(3), ScoutRush(6), send_frames=send_frames).play() for _ in range(5)]
+        seconds = sum(result.seconds for result in results)
+        frames = sum(result.frames for result in results)
+        print("{:<28} {:<32} {:>10.1f} ms per match, {:.0f} matches per minute, {:.0f} frames per second".format(
+            "local match", label, seconds / len(results) * 1e3, 60 * len(results) / seconds, frames / seconds))
+
+
+def bench_logging(config):
+    """Logs one message per location of the board during a turn, as a chatty strategy would"""
+    game_state = populate_late_game_board(make_state(config))
+    locations = game_state.game_map.structure_locations()
+    with open(os.devnull, "w") as null:
+        disabled = log.Logger(level=log.WARNING, stream=null)
+        buffered = log.Logger(stream=null, max_repeats=len(locations), max_queued=len(locations) + 1)
+
+        def write_each():
+            with contextlib.redirect_stderr(null):
+                for location in locations:
+                    debug_write("Checking {}".format(location))
+
+        def queue_and_flush():
+            for location in locations:
+                buffered.info("Checking {}", location)
+            buffered.flush()
+
+        def below_level():
+            for location in locations:
+                disabled.debug("Checking {}", location)
+
+        report("logging", [("disabled level", time_call(below_level, 2000)), ("queued, flushed once", time_call(queue_and_flush, 500)),
+                           ("debug_write", time_call(write_each, 500))])
+
+
+BENCHMARKS = {
+    "get_attackers": bench_get_attackers,
+    "unit_allocation": bench_unit_allocation,
+    "parse": bench_parse,
+    "incremental_turn": bench_incremental_turn,
+    "frame_dispatch": bench_frame_dispatch,
+    "frame_skip": bench_frame_skip,
+    "event_dispatch": bench_event_dispatch,
+    "logging": bench_logging,
+    "spawn_many": bench_spawn_many,
+    "spawn_mask": bench_spawn_mask,
+    "fork": bench_fork,
+    "economy": bench_economy,
+    "budget": bench_budget,
+    "bytes": bench_bytes,
+    "shared_board": bench_shared_board,
+    "workers": bench_workers,
+    "simulator": bench_simulator,
+    "batch_simulator": bench_batch_simulator,
+    "search": bench_search,
+    "match": bench_match,
+}
+
+
+def main(args):
+    config_path = None
+    if "--config" in args:
+        index = args.index("--config")
+        config_path = args[index + 1]
+        args = args[:index] + args[index + 2:]
+    config = load_config(config_path)
+    for name in args or list(BENCHMARKS):
+        BENCHMARKS[name](config)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,245 @@
+from collections import namedtuple
+from math import gcd
+
+
+Purchase = namedtuple("Purchase", ["unit_type", "location", "upgrade", "cost", "value", "floor"])
+Purchase.__doc__ = """One candidate purchase of a Budget.
+
+    unit_type is the structure to spawn, or the structure being upgraded. upgrade is True for
+    upgrades. cost is in SP. floor is the SP that must be left after everything bought this turn
+    for this purchase to be worth making.
+    """
+
+# SP amounts are compared in tenths of a point, the precision the engine reports them with
+_SCALE = 10
+
+
+class Budget:
+    """Chooses the structures to buy and upgrade this turn, out of candidates from every part of the strategy.
+
+    Each candidate has a value. solve picks the set with the largest total value that fits the SP held,
+    keeping the budget's reserve and the floor of every chosen candidate, instead of buying greedily in
+    the order the candidates were thought of. Upgrading a structure that is itself a candidate is only
+    possible together with it. It is a multiple-choice knapsack over the SP cost, solved once per
+    floor used.
+
+        budget = Budget(game_state, reserve=2)
+        budget.spawn(TURRET, turret_locations, value=10)
+        budget.upgrade(turret_locations, value=4)
+        budget.spawn(SUPPORT, support_locations, value=3, floor=12)
+        budget.apply()
+
+    Candidates can be added by several stages of a turn and solved once at its end. Unless given
+    a fixed SP, the budget spends the SP the GameState holds when it is solved, after whatever the
+    stages in between bought directly.
+
+    Attributes :
+        * game_state (:obj: GameState): The state the candidates are checked against
+        * SP (float): The SP to spend from
+        * reserve (float): The SP that must be left over
+
+    """
+    def __init__(self, game_state, reserve=0, SP=None):
+        """Starts an empty budget
+
+        Args:
+            game_state: The current GameState
+            reserve: The SP to keep whatever is bought
+            SP: The SP to spend from. The SP held in game_state when solving if None
+
+        """
+        self.game_state = game_state
+        self.reserve = reserve
+        self._SP = SP
+        self._purchases = []
+        self._spawns = {}
+        self._solution = None
+        self._solved_SP = None
+
+    @property
+    def SP(self):
+        return self.game_state.get_resource(self.game_state.SP) if self._SP is None else self._SP
+
+    def spawn(self, unit_type, locations, value, floor=0):
+        """Adds candidate structures. Locations that are blocked or can not hold a structure are skipped.
+
+        Args:
+            unit_type: WALL, SUPPORT or TURRET
+            locations: A single location or list of locations
+            value: What one of them is worth, in any unit as long as every candidate uses the same one
+            floor: The SP that must be left after this turn's purchases for them to be bought
+
+        Returns:
+            The number of candidates added
+
+        """
+        game_state = self.game_state
+        if not game_state.catalog.is_stationary(unit_type):
+            game_state.warn("Budget only buys structures, not {}", unit_type)
+            return 0
+        if type(locations[0]) == int:
+            locations = [locations]
+        cost = game_state.catalog.type_cost(unit_type)[game_state.SP]
+        open_locations = game_state.spawn_locations(unit_type, locations)
+        added = 0
+        for location in open_locations:
+            key = (int(location[0]), int(location[1]))
+            if key in self._spawns:
+                continue
+            self._spawns[key] = len(self._purchases)
+            self._purchases.append(Purchase(unit_type, key, False, cost, value, floor))
+            added += 1
+        self._solution = None
+        return added
+
+    def upgrade(self, locations, value, floor=0):
+        """Adds candidate upgrades, of structures on the board or of structures added with spawn.
+        Like attempt_upgrade, structures below 80% health and structures already upgraded are skipped.
+
+        Args:
+            locations: A single location or list of locations
+            value: What one upgrade is worth
+            floor: The SP that must be left after this turn's purchases for them to be bought
+
+        Returns:
+            The number of candidates added
+
+        """
+        game_state = self.game_state
+        catalog = game_state.catalog
+        if type(locations[0]) == int:
+            locations = [locations]
+        added = 0
+        for location in locations:
+            key = (int(location[0]), int(location[1]))
+            index = self._spawns.get(key)
+            if index is not None:
+                unit_type = self._purchases[index].unit_type
+            else:
+                if location[1] >= game_state.HALF_ARENA:
+                    continue
+                unit = game_state.contains_stationary_unit(location)
+                if not unit or unit.upgraded or unit.player_index != 0 or (unit.health / unit.max_health) < 0.8:
+                    continue
+                unit_type = unit.unit_type
+            if not catalog.can_upgrade(unit_type) or any(purchase.upgrade and purchase.location == key for purchase in self._purchases):
+                continue
+            self._purchases.append(Purchase(unit_type, key, True, catalog.type_cost(unit_type, True)[game_state.SP], value, floor))
+            added += 1
+        self._solution = None
+        return added
+
+    def candidates(self):
+        """Gets every candidate Purchase, in the order they were added"""
+        return list(self._purchases)
+
+    def solve(self):
+        """Picks the purchases with the largest total value that the budget can pay for
+
+        Returns:
+            The chosen Purchases, in the order they were added
+
+        """
+        SP = self.SP
+        if self._solution is not None and SP == self._solved_SP:
+            return list(self._solution)
+        groups = self.__groups()
+        best_value = 0
+        best = []
+        for floor in sorted(set(option_floor for options in groups for _, _, _, option_floor in options)):
+            floor = max(floor, self.reserve)
+            capacity = int(round((SP - floor) * _SCALE))
+            if capacity < 0:
+                continue
+            value, chosen = self.__knapsack(groups, capacity, floor)
+            if value > best_value:
+                best_value, best = value, chosen
+        self._solution = [self._purchases[index] for index in sorted(best)]
+        self._solved_SP = SP
+        return list(self._solution)
+
+    def cost(self):
+        """Gets the SP the chosen purchases cost"""
+        return sum(purchase.cost for purchase in self.solve())
+
+    def apply(self):
+        """Buys the chosen purchases on the GameState, structures first and then upgrades
+
+        Returns:
+            The number of purchases made
+
+        """
+        chosen = self.solve()
+        bought = 0
+        with self.game_state.plan() as plan:
+            for purchase in chosen:
+                if not purchase.upgrade:
+                    bought += plan.spawn(purchase.unit_type, list(purchase.location))
+            for purchase in chosen:
+                if purchase.upgrade:
+                    bought += plan.upgrade(list(purchase.location))
+        return bought
+
+    def __groups(self):
+        """Splits the candidates into groups of which at most one option can be bought.
+        An option is (indices, cost, value, floor). A structure and its upgrade form one group."""
+        upgrades = {}
+        for index, purchase in enumerate(self._purchases):
+            if purchase.upgrade and purchase.location in self._spawns:
+                upgrades[purchase.location] = index
+        groups = []
+        for index, purchase in enumerate(self._purchases):
+            if purchase.upgrade and purchase.location in self._spawns:
+                continue
+            options = [((index,), purchase.cost, purchase.value, purchase.floor)]
+            upgrade_index = upgrades.get(purchase.location) if not purchase.upgrade else None
+            if upgrade_index is not None:
+                upgrade = self._purchases[upgrade_index]
+                options.append(((index, upgrade_index), purchase.cost + upgrade.cost, purchase.value + upgrade.value, max(purchase.floor, upgrade.floor)))
+            groups.append(options)
+        return groups
+
+    def __knapsack(self, groups, capacity, floor):
+        """Solves the multiple-choice knapsack over the options whose floor is at most floor
+
+        Returns:
+            (total value, indices of the chosen purchases)
+
+        """
+        weighted = []
+        for options in groups:
+            usable = [(indices, int(round(cost * _SCALE)), value) for indices, cost, value, option_floor in options if option_floor <= floor and value > 0]
+            usable = [option for option in usable if option[1] <= capacity]
+            if usable:
+                weighted.append(usable)
+        divisor = capacity
+        for options in weighted:
+            for _, weight, _ in options:
+                divisor = gcd(divisor, weight)
+        if divisor > 1:
+            capacity //= divisor
+            weighted = [[(indices, weight // divisor, value) for indices, weight, value in options] for options in weighted]
+
+        best = [0] * (capacity + 1)
+        picks = []
+        for options in weighted:
+            previous = best
+            best = list(previous)
+            pick = [-1] * (capacity + 1)
+            for option_index, (indices, weight, value) in enumerate(options):
+                for room in range(capacity, weight - 1, -1):
+                    candidate = previous[room - weight] + value
+                    if candidate > best[room]:
+                        best[room] = candidate
+                        pick[room] = option_index
+            picks.append(pick)
+
+        chosen = []
+        room = capacity
+        for group_index in range(len(weighted) - 1, -1, -1):
+            option_index = picks[group_index][room]
+            if option_index >= 0:
+                indices, weight, _ = weighted[group_index][option_index]
+                chosen.extend(indices)
+                room -= weight
+        return best[capacity], chosen
@@ -0,0 +1,176 @@
+from collections import namedtuple
+
+
+UnitStats = namedtuple("UnitStats", [
+    "unit_type", "index", "upgraded", "stationary", "speed", "damage_f", "damage_i", "attackRange",
+    "shieldRange", "max_health", "shieldPerUnit", "shieldBonusPerY", "cost", "catalog"])
+UnitStats.__doc__ = """The immutable stats shared by every unit of one type and upgrade level.
+
+    Field names match the GameUnit attributes they back. cost is a (SP, MP) tuple holding
+    the total paid for a unit at this level, including the upgrade. catalog is the UnitCatalog
+    the record belongs to.
+    """
+
+_current_catalog = None
+
+
+class UnitCatalog:
+    """Everything about the unit types that can be derived from the config, compiled once per game.
+
+    A catalog is immutable. Use UnitCatalog.for_config(config) to get the catalog shared by
+    every GameState, GameUnit and strategy module built from the same config object.
+
+    Attributes :
+        * config (JSON): The config the catalog was compiled from
+        * WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE (str): Unit shorthands
+        * UNIT_TYPE_TO_INDEX (dict): Maps a shorthand to its index in the config's unitInformation
+        * STRUCTURE_TYPES (tuple): The shorthands of the structure units
+        * ALL_UNITS (tuple): The shorthands of every unit that can be spawned
+        * stats_by_index (tuple): The base UnitStats of each unitInformation index, None for REMOVE and UPGRADE
+        * max_attack_range (float): The largest attack range of any unit, upgraded or not
+        * get_hit_radius (float): How far past a unit's range it can still hit a location
+
+    """
+
+    def __init__(self, config):
+        """Compiles a catalog
+
+        Args:
+            config (JSON): A json object containing information about the game
+
+        """
+        set_field = super().__setattr__
+        unit_information = config["unitInformation"]
+        shorthands = tuple(unit["shorthand"] for unit in unit_information)
+        WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE = shorthands[:8]
+
+        set_field("config", config)
+        set_field("shorthands", shorthands)
+        set_field("UNIT_TYPE_TO_INDEX", {shorthand: index for index, shorthand in enumerate(shorthands)})
+        set_field("WALL", WALL)
+        set_field("SUPPORT", SUPPORT)
+        set_field("TURRET", TURRET)
+        set_field("SCOUT", SCOUT)
+        set_field("DEMOLISHER", DEMOLISHER)
+        set_field("INTERCEPTOR", INTERCEPTOR)
+        set_field("REMOVE", REMOVE)
+        set_field("UPGRADE", UPGRADE)
+        set_field("STRUCTURE_TYPES", (WALL, SUPPORT, TURRET))
+        set_field("ALL_UNITS", (SCOUT, DEMOLISHER, INTERCEPTOR, WALL, SUPPORT, TURRET))
+        set_field("get_hit_radius", unit_information[0].get("getHitRadius", 0))
+
+        stats = {}
+        costs = {}
+        for index, type_config in enumerate(unit_information):
+            unit_type = shorthands[index]
+            upgrade_config = type_config.get("upgrade", {})
+            cost_base = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+            costs[(unit_type, False)] = cost_base
+            costs[(unit_type, True)] = [upgrade_config.get("cost1", cost_base[0]), upgrade_config.get("cost2", cost_base[1])]
+            if "unitCategory" in type_config:
+                base = self.__compile_stats(index, type_config)
+                stats[(unit_type, False)] = base
+                stats[(unit_type, True)] = self.__compile_upgrade(base, upgrade_config)
+        set_field("stats_by_index", tuple(stats.get((unit_type, False)) for unit_type in shorthands))
+        set_field("_upgradable", frozenset(unit_type for index, unit_type in enumerate(shorthands) if unit_information[index].get("upgrade", None) is not None))
+        set_field("_stats", stats)
+        set_field("_costs", costs)
+        set_field("max_attack_range", max([unit.attackRange for unit in stats.values()] or [0]))
+
+    def __compile_stats(self, index, type_config):
+        return UnitStats(
+            unit_type=self.shorthands[index],
+            index=index,
+            upgraded=False,
+            stationary=type_config["unitCategory"] == 0,
+            speed=type_config.get("speed", 0),
+            damage_f=type_config.get("attackDamageTower", 0),
+            damage_i=type_config.get("attackDamageWalker", 0),
+            attackRange=type_config.get("attackRange", 0),
+            shieldRange=type_config.get("shieldRange", 0),
+            max_health=type_config.get("startHealth", 0),
+            shieldPerUnit=type_config.get("shieldPerUnit", 0),
+            shieldBonusPerY=type_config.get("shieldBonusPerY", 0),
+            cost=(type_config.get("cost1", 0), type_config.get("cost2", 0)),
+            catalog=self)
+
+    def __compile_upgrade(self, base, upgrade_config):
+        return base._replace(
+            upgraded=True,
+            speed=upgrade_config.get("speed", base.speed),
+            damage_f=upgrade_config.get("attackDamageTower", base.damage_f),
+            damage_i=upgrade_config.get("attackDamageWalker", base.damage_i),
+            attackRange=upgrade_config.get("attackRange", base.attackRange),
+            shieldRange=upgrade_config.get("shieldRange", base.shieldRange),
+            max_health=upgrade_config.get("startHealth", base.max_health),
+            shieldPerUnit=upgrade_config.get("shieldPerUnit", base.shieldPerUnit),
+            shieldBonusPerY=upgrade_config.get("shieldBonusPerY", base.shieldBonusPerY),
+            cost=(base.cost[0] + upgrade_config.get("cost1", 0), base.cost[1] + upgrade_config.get("cost2", 0)))
+
+    @classmethod
+    def for_config(cls, config):
+        """Gets the catalog for a config, compiling it only if the config changed since the last call
+
+        Args:
+            config (JSON): A json object containing information about the game
+
+        Returns:
+            The UnitCatalog compiled from config
+
+        """
+        global _current_catalog
+        catalog = _current_catalog
+        if catalog is None or catalog.config is not config:
+            catalog = cls(config)
+            _current_catalog = catalog
+        return catalog
+
+    def unit_stats(self, unit_type, upgraded=False):
+        """Gets the shared stats of a unit type
+
+        Args:
+            unit_type: A unit shorthand, WALL, SCOUT, etc.
+            upgraded: If True, get the stats of an upgraded unit
+
+        Returns:
+            The UnitStats record, or None if unit_type is not a unit that can be on the board
+
+        """
+        return self._stats.get((unit_type, upgraded))
+
+    def type_cost(self, unit_type, upgrade=False):
+        """Gets the cost of a unit, or of upgrading it
+
+        Args:
+            unit_type: A unit shorthand
+            upgrade: If True, get the cost of the upgrade instead
+
+        Returns:
+            A new [SP, MP] list, or None if unit_type can not be bought
+
+        """
+        cost = self._costs.get((unit_type, upgrade))
+        return list(cost) if cost is not None else None
+
+    def can_upgrade(self, unit_type):
+        """True if the config defines an upgrade for unit_type"""
+        return unit_type in self._upgradable
+
+    def is_stationary(self, unit_type):
+        """True if unit_type is a structure"""
+        return unit_type in self.STRUCTURE_TYPES
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UnitCatalog is immutable")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (UnitCatalog, (self.config,))
+
+    def __repr__(self):
+        return "UnitCatalog({})".format(", ".join(self.shorthands))
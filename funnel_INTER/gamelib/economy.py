@@ -0,0 +1,210 @@
+from bisect import bisect_left
+from collections import namedtuple
+
+
+Projection = namedtuple("Projection", ["SP", "MP", "feasible"])
+Projection.__doc__ = """The resources a player holds over the coming turns under one spending schedule.
+
+    SP[k] and MP[k] are held at the start of the k-th turn from now, before that turn's spending,
+    so SP[0] and MP[0] are the current resources. feasible is False if the schedule spends more than
+    was held on some turn.
+    """
+
+_current_economy = None
+
+
+class Economy:
+    """Per-turn income tables compiled from the resources block of a config, shared like UnitCatalog.
+
+    MP decays by bitDecayPerRound every turn, then gains bitsPerRound plus bitGrowthRate for every
+    turnIntervalForBitSchedule turns played, rounded to one decimal like project_future_MP, and is
+    capped at maxBits. The cap grows by bitRampBitCapGrowthRate every turnIntervalForBitCapSchedule
+    turns from roundStartBitRamp on. SP gains coresPerRound every turn, and coresForPlayerDamage for
+    every point of damage dealt to the enemy when an expected damage is given.
+
+    Attributes :
+        * config (JSON): The config the tables were compiled from
+        * MP_decay (float): The share of MP lost every turn
+        * SP_for_damage (float): The SP gained per point of damage dealt
+        * SP_income, MP_income, MP_cap (tuple): The SP and MP gained at the start of each turn, and the MP cap of each turn,
+          indexed by turn number up to MAX_TURNS. Later turns use the last entry
+
+    """
+    MAX_TURNS = 100
+
+    def __init__(self, config):
+        """Compiles the tables
+
+        Args:
+            config (JSON): A json object containing information about the game
+
+        """
+        resources = config["resources"]
+        turns = range(self.MAX_TURNS + 1)
+        bit_interval = resources.get("turnIntervalForBitSchedule", 1) or 1
+        cap_interval = resources.get("turnIntervalForBitCapSchedule", bit_interval) or 1
+        ramp_start = resources.get("roundStartBitRamp", 0)
+        max_bits = resources.get("maxBits", float("inf"))
+        cap_growth = resources.get("bitRampBitCapGrowthRate", 0)
+
+        self.config = config
+        self.MP_decay = resources.get("bitDecayPerRound", 0)
+        self.SP_for_damage = resources.get("coresForPlayerDamage", 0)
+        self.SP_income = tuple(float(resources.get("coresPerRound", 0)) for turn in turns)
+        self.MP_income = tuple(resources.get("bitsPerRound", 0) + resources.get("bitGrowthRate", 0) * (turn // bit_interval) for turn in turns)
+        self.MP_cap = tuple(max_bits + cap_growth * (max(0, turn - ramp_start) // cap_interval) for turn in turns)
+        prefix = [0.0]
+        for income in self.SP_income:
+            prefix.append(prefix[-1] + income)
+        # _SP_prefix[t] is the SP gained over turns 0 to t - 1
+        self._SP_prefix = tuple(prefix)
+
+    @classmethod
+    def for_config(cls, config):
+        """Gets the tables for a config, compiling them only if the config changed since the last call
+
+        Args:
+            config (JSON): A json object containing information about the game
+
+        Returns:
+            The Economy compiled from config
+
+        """
+        global _current_economy
+        economy = _current_economy
+        if economy is None or economy.config is not config:
+            economy = cls(config)
+            _current_economy = economy
+        return economy
+
+    def next_MP(self, MP, turn):
+        """Gets the MP held at the start of a turn
+
+        Args:
+            MP: The MP left at the end of the previous turn
+            turn: The turn number
+
+        Returns:
+            The MP after decay, income and the cap
+
+        """
+        turn = min(turn, self.MAX_TURNS)
+        return min(self.MP_cap[turn], round(MP * (1 - self.MP_decay) + self.MP_income[turn], 1))
+
+    def project(self, turn, SP, MP, turns, schedule=(), damage=0):
+        """Projects one player's resources
+
+        Args:
+            turn: The current turn number
+            SP, MP: The resources held now
+            turns: How many turns ahead to project
+            schedule: [SP, MP] spent on each turn, starting with the current one. Turns past its end spend nothing
+            damage: The damage expected to be dealt to the enemy every turn
+
+        Returns:
+            A Projection with turns + 1 entries
+
+        """
+        return self.project_many(turn, SP, MP, turns, [schedule], damage)[0]
+
+    def project_many(self, turn, SP, MP, turns, schedules, damage=0):
+        """Projects one player's resources under several spending schedules at once
+
+        The schedules are stepped together, one turn at a time, sharing the income looked up for each turn.
+
+        Args:
+            turn: The current turn number
+            SP, MP: The resources held now
+            turns: How many turns ahead to project
+            schedules: A list of schedules, each a list of [SP, MP] spent on each turn starting with the current one
+            damage: The damage expected to be dealt to the enemy every turn
+
+        Returns:
+            A list with a Projection for each schedule
+
+        """
+        count = len(schedules)
+        SP_rows = [[SP] for _ in range(count)]
+        MP_rows = [[MP] for _ in range(count)]
+        feasible = [True] * count
+        SP_damage = damage * self.SP_for_damage
+        MP_kept = 1 - self.MP_decay
+        for step in range(turns):
+            next_turn = min(turn + step + 1, self.MAX_TURNS)
+            SP_gain = self.SP_income[next_turn] + SP_damage
+            MP_gain = self.MP_income[next_turn]
+            MP_cap = self.MP_cap[next_turn]
+            for index in range(count):
+                schedule = schedules[index]
+                SP_spent, MP_spent = schedule[step] if step < len(schedule) else (0, 0)
+                SP_left = SP_rows[index][step] - SP_spent
+                MP_left = MP_rows[index][step] - MP_spent
+                if SP_left < 0 or MP_left < 0:
+                    feasible[index] = False
+                SP_rows[index].append(SP_left + SP_gain)
+                # Same as next_MP
+                MP_rows[index].append(min(MP_cap, round(MP_left * MP_kept + MP_gain, 1)))
+        for index in range(count):
+            schedule = schedules[index]
+            if len(schedule) > turns:
+                SP_spent, MP_spent = schedule[turns]
+                if SP_rows[index][turns] < SP_spent or MP_rows[index][turns] < MP_spent:
+                    feasible[index] = False
+        return [Projection(SP_rows[index], MP_rows[index], feasible[index]) for index in range(count)]
+
+    def project_players(self, game_state, turns, schedules=((), ())):
+        """Projects the resources of both players of a GameState
+
+        Args:
+            game_state: The current GameState
+            turns: How many turns ahead to project
+            schedules: The spending schedule of each player, see project
+
+        Returns:
+            [your Projection, the enemy's Projection]
+
+        """
+        projections = []
+        for player_index in (0, 1):
+            SP, MP = game_state.get_resources(player_index)
+            projections.append(self.project(game_state.turn_number, SP, MP, turns, schedules[player_index]))
+        return projections
+
+    def earliest_affordable(self, turn, SP, MP, cost, reserve=(0, 0), horizon=None):
+        """Finds how many turns it takes, without spending anything else, to afford a cost and still keep a reserve
+
+        The SP turn is looked up in a table of summed income. MP is then stepped forward from that turn.
+
+        Args:
+            turn: The current turn number
+            SP, MP: The resources held now
+            cost: The [SP, MP] to pay
+            reserve: The [SP, MP] that must be left over after paying
+            horizon: The most turns to look ahead. Up to MAX_TURNS if None
+
+        Returns:
+            The number of turns from now, 0 if it can be afforded this turn, or None if it can not be afforded within the horizon
+
+        """
+        if horizon is None:
+            horizon = max(self.MAX_TURNS - turn, 0)
+        SP_needed = cost[0] + reserve[0]
+        MP_needed = cost[1] + reserve[1]
+        wait = 0
+        if SP < SP_needed:
+            prefix = self._SP_prefix
+            start = min(turn + 1, len(prefix) - 1)
+            found = bisect_left(prefix, prefix[start] + SP_needed - SP, start)
+            if found >= len(prefix):
+                return None
+            wait = found - start
+        if wait > horizon:
+            return None
+        for step in range(wait):
+            MP = self.next_MP(MP, turn + step + 1)
+        while MP < MP_needed:
+            wait += 1
+            if wait > horizon:
+                return None
+            MP = self.next_MP(MP, turn + wait)
+        return wait
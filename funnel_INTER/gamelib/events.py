@@ -0,0 +1,109 @@
+import json
+from array import array
+
+from .util import EngineMessage
+
+
+# Where each field sits in the engine's event lists, see json-docs.html in the root of the Starterkit.
+# (location, target location, amount, unit type, id, player). None means the event does not have that field.
+EVENT_LAYOUTS = {
+    "selfDestruct": (0, None, 2, 3, 4, 5),
+    "breach": (0, None, 1, 2, 3, 4),
+    "damage": (0, None, 1, 2, 3, 4),
+    "shield": (0, 1, 2, 3, 4, 6),
+    "move": (0, 1, None, 3, 4, 5),
+    "spawn": (0, None, None, 1, 2, 3),
+    "death": (0, None, None, 1, 2, 3),
+    "attack": (0, 1, 2, 3, 4, 6),
+    "melee": (0, 1, 2, 3, 4, 5),
+}
+EVENT_KINDS = tuple(EVENT_LAYOUTS)
+
+_decoder = json.JSONDecoder()
+
+
+class EventBatch:
+    """All the events of one kind in a single action frame, as parallel arrays.
+
+    Entry i of every array describes the same event. Owners use the same convention as the rest
+    of gamelib, 0 for you and 1 for your opponent, instead of the engine's 1 and 2.
+
+    Attributes :
+        * kind (str): The event kind, "breach", "damage", etc.
+        * turn (int): The turn the frame belongs to
+        * frame (int): The frame number
+        * x, y (array): Location of the unit the event is about. For shield and attack events, the giver or attacker
+        * target_x, target_y (array): Target location of shield, attack and melee events, or where a unit moved to. -1 if the kind has none
+        * amount (array): Damage, shield or breach amount. 0 if the kind has none
+        * unit_type (array): Unit type index, as in p1Units and p2Units
+        * owner (array): The player that owns the unit, 0 for you 1 for your opponent
+        * ids (list): The unit id strings
+
+    """
+    __slots__ = ("kind", "turn", "frame", "x", "y", "target_x", "target_y", "amount", "unit_type", "owner", "ids")
+
+    def __init__(self, kind, turn, frame, events):
+        """Packs a list of engine events
+
+        Args:
+            kind: The event kind
+            turn: The turn the frame belongs to
+            frame: The frame number
+            events: The decoded list of events of that kind
+
+        """
+        location, target, amount, unit_type, unit_id, player = EVENT_LAYOUTS[kind]
+        self.kind = kind
+        self.turn = turn
+        self.frame = frame
+        self.x = array('b', [int(event[location][0]) for event in events])
+        self.y = array('b', [int(event[location][1]) for event in events])
+        if target is None:
+            self.target_x = array('b', [-1]) * len(events)
+            self.target_y = array('b', [-1]) * len(events)
+        else:
+            self.target_x = array('b', [int(event[target][0]) for event in events])
+            self.target_y = array('b', [int(event[target][1]) for event in events])
+        if amount is None:
+            self.amount = array('d', [0.0]) * len(events)
+        else:
+            self.amount = array('d', [event[amount] for event in events])
+        self.unit_type = array('b', [int(event[unit_type]) for event in events])
+        self.owner = array('b', [int(event[player]) - 1 for event in events])
+        self.ids = [event[unit_id] for event in events]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def location(self, index):
+        """Gets the [x, y] location of one event"""
+        return [self.x[index], self.y[index]]
+
+    def __repr__(self):
+        return "EventBatch({}, turn {}, frame {}, {} events)".format(self.kind, self.turn, self.frame, len(self))
+
+
+def decode_event_list(message, event_kind):
+    """Decodes a single event list of an action frame
+
+    If the frame has already been decoded the list is taken from it, otherwise only the requested list
+    is parsed out of the raw line.
+
+    Args:
+        message: An EngineMessage or a raw frame line
+        event_kind: One of EVENT_KINDS
+
+    Returns:
+        The list of events, empty if there are none
+
+    """
+    if isinstance(message, EngineMessage):
+        return message.state["events"].get(event_kind, [])
+    index = message.find('"' + event_kind + '"')
+    if index < 0:
+        return []
+    index = message.find("[", index)
+    if index < 0:
+        return []
+    events, _ = _decoder.raw_decode(message, index)
+    return events
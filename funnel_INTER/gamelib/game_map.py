@@ -1,6 +1,83 @@
 import math
+from array import array
 from .unit import GameUnit
-from .util import debug_write
+from . import log
+
+
+ARENA_SIZE = 28
+HALF_ARENA = ARENA_SIZE // 2
+
+
+def _build_cell_index():
+    """Numbers every location inside the diamond shaped board, row by row from the bottom.
+
+    Returns:
+        A pair (cell_ids, cell_locations). cell_ids[x][y] is the packed id of [x, y], or -1 if it is
+        outside of the arena. cell_locations[cell_id] is the (x, y) tuple of a packed id.
+    """
+    cell_ids = [[-1] * ARENA_SIZE for _ in range(ARENA_SIZE)]
+    cell_locations = []
+    for y in range(ARENA_SIZE):
+        row_size = y + 1 if y < HALF_ARENA else ARENA_SIZE - y
+        for x in range(HALF_ARENA - row_size, HALF_ARENA + row_size):
+            cell_ids[x][y] = len(cell_locations)
+            cell_locations.append((x, y))
+    return cell_ids, cell_locations
+
+CELL_ID, CELL_LOCATIONS = _build_cell_index()
+NUM_CELLS = len(CELL_LOCATIONS)
+# The packed ids of your bottom left and bottom right edges, where mobile units are deployed
+DEPLOY_CELLS = frozenset([CELL_ID[HALF_ARENA - 1 - y][y] for y in range(HALF_ARENA)] + [CELL_ID[HALF_ARENA + y][y] for y in range(HALF_ARENA)])
+# The same cells and your half of the board as bitmasks, where bit n stands for packed cell n
+DEPLOY_MASK = sum(1 << cell for cell in DEPLOY_CELLS)
+FRIENDLY_HALF_MASK = sum(1 << cell for cell, (x, y) in enumerate(CELL_LOCATIONS) if y < HALF_ARENA)
+
+_squared_distances = None
+_range_limits = {}
+
+
+def squared_distance_table():
+    """Gets the table of squared distances between every pair of arena cells.
+
+    The table is built the first time it is requested and then shared by the whole process.
+    The squared distance between two cells with packed ids a and b is table[a * NUM_CELLS + b].
+
+    Returns:
+        An array of NUM_CELLS * NUM_CELLS unsigned shorts
+
+    """
+    global _squared_distances
+    if _squared_distances is None:
+        table = array('H')
+        for x1, y1 in CELL_LOCATIONS:
+            table.extend([(x1 - x2) * (x1 - x2) + (y1 - y2) * (y1 - y2) for x2, y2 in CELL_LOCATIONS])
+        _squared_distances = table
+    return _squared_distances
+
+
+def squared_range_limit(radius, inclusive=False):
+    """Converts a radius into the largest integer squared distance that is in range.
+
+    Args:
+        radius: The range to convert
+        inclusive: If True, locations exactly radius away are in range
+
+    Returns:
+        An integer d2 such that a squared distance is in range if and only if it is <= d2
+
+    """
+    key = (radius, inclusive)
+    limit = _range_limits.get(key)
+    if limit is None:
+        if radius < 0:
+            limit = -1
+        elif inclusive:
+            limit = math.floor(radius * radius)
+        else:
+            limit = math.ceil(radius * radius) - 1
+        _range_limits[key] = limit
+    return limit
+
 
 class GameMap:
     """Holds data about the current game map and provides functions
@@ -35,18 +112,35 @@ class GameMap:
         self.TOP_LEFT = 1
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
-        self.__map = self.__empty_grid()
+        self.__cells = [None] * NUM_CELLS
         self.__start = [13,0]
-    
+        self._unit_arrays = None
+        self._catalog = None
+        self._pending = None
+        self._blocked_mask = 0
+        self._occupied_mask = 0
+        self._shared = None
+
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
             x,y = location
-            return self.__map[x][y]
+            if self._shared is not None:
+                self.__unshare(CELL_ID[x][y])
+            if self._pending is not None:
+                self._materialize(CELL_ID[x][y])
+            return self.__units(CELL_ID[x][y])
         # self._invalid_coordinates(location)
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            cell = CELL_ID[location[0]][location[1]]
+            if self._pending is not None:
+                self._pending[cell] = 0
+            if self._shared is not None:
+                self._shared[cell] = 0
+            self.__set_blocked(cell, any(unit.stationary for unit in val))
+            self.__set_occupied(cell, len(val) > 0)
+            self.__cells[cell] = val
             return
         self._invalid_coordinates(location)
 
@@ -67,16 +161,110 @@ class GameMap:
         self.__start = new_location
         return location 
 
-    def __empty_grid(self):
-        grid = []
-        for x in range(0, self.ARENA_SIZE):
-            grid.append([])
-            for _ in range(0, self.ARENA_SIZE):
-                grid[x].append([])
-        return grid
+    def __units(self, cell):
+        """Gets the unit list of a packed cell, creating the empty list the first time the cell is used"""
+        units = self.__cells[cell]
+        if units is None:
+            units = self.__cells[cell] = []
+        return units
+
+    def load_unit_arrays(self, unit_arrays, catalog, lazy=True):
+        """Fills the map from the compact unit arrays of a parsed game state
+
+        Args:
+            unit_arrays (:obj: UnitArrays): The units to place on the map
+            catalog (:obj: UnitCatalog): The catalog the unit type indices refer to
+            lazy: If True, the GameUnits of a cell are only created the first time the cell is read
+
+        """
+        self._unit_arrays = unit_arrays
+        self._catalog = catalog
+        self._pending = bytearray(b"\x01") * NUM_CELLS
+        self._blocked_mask = unit_arrays.blocked_mask()
+        self._occupied_mask = unit_arrays.occupied_mask()
+        if not lazy:
+            self.materialize_all()
+
+    def materialize_all(self):
+        """Creates the GameUnits of every cell that has not been read yet"""
+        if self._pending is None:
+            return
+        arrays = self._unit_arrays
+        for cell in arrays.structure_cells() + list(arrays.mobile_cell):
+            self._materialize(cell)
+        self._pending = None
+
+    def _materialize(self, cell):
+        """Creates the GameUnits of a cell from the unit arrays, the first time the cell is used"""
+        pending = self._pending
+        if not pending[cell]:
+            return
+        pending[cell] = 0
+        if self._shared is not None:
+            self.__unshare(cell)
+        self.__units(cell).extend(self._unit_arrays.create_units(cell, self._catalog))
+
+    def fork(self):
+        """Gets an independent copy of the map, for trying out moves.
+
+        The two maps share every cell until one of them reads the cell's unit list or changes it, at which
+        point that map makes its own copy of the list and of its GameUnits. Cells that were never
+        read are created from the unit arrays by each map separately. GameUnits taken from the map
+        before forking are shared, so do not change them afterwards.
+
+        Returns:
+            The new GameMap
+
+        """
+        other = GameMap.__new__(GameMap)
+        other.__dict__.update(self.__dict__)
+        other.__cells = self.__cells[:]
+        if self._pending is not None:
+            other._pending = bytearray(self._pending)
+        self._shared = bytearray(b"\x01") * NUM_CELLS
+        other._shared = bytearray(self._shared)
+        return other
+
+    def __unshare(self, cell):
+        """Gives this map its own copy of a cell it shares with a fork"""
+        shared = self._shared
+        if cell < 0 or not shared[cell]:
+            return
+        shared[cell] = 0
+        units = self.__cells[cell]
+        if units is not None:
+            self.__cells[cell] = [unit.copy() for unit in units]
+
+    @property
+    def blocked_mask(self):
+        """The locations holding a structure as a bitmask, where bit n is set if packed cell n is blocked.
+        It follows changes made through add_unit, remove_unit and game_map[x, y] = units.
+        """
+        return self._blocked_mask
+
+    @property
+    def occupied_mask(self):
+        """The locations holding any unit as a bitmask, like blocked_mask. Structures can only be placed on cells that are not set."""
+        return self._occupied_mask
+
+    def __set_occupied(self, cell, occupied):
+        if cell < 0:
+            return
+        if occupied:
+            self._occupied_mask |= 1 << cell
+        else:
+            self._occupied_mask &= ~(1 << cell)
+
+    def __set_blocked(self, cell, blocked):
+        if cell < 0:
+            return
+        if blocked:
+            self._blocked_mask |= 1 << cell
+        else:
+            self._blocked_mask &= ~(1 << cell)
 
     def _invalid_coordinates(self, location):
-        self.warn("{} is out of bounds.".format(str(location)))
+        self.warn("{} is out of bounds.", str(location))
 
     def in_arena_bounds(self, location):
         """Checks if the given location is inside the diamond shaped game board.
@@ -114,7 +302,7 @@ class GameMap:
 
         """
         if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
-            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
+            self.warn("Passed invalid quadrant_description '{}'. See the documentation for valid inputs for get_edge_locations.", quadrant_description)
             return
 
         edges = self.get_edges()
@@ -164,14 +352,23 @@ class GameMap:
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
         if player_index < 0 or player_index > 1:
-            self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
+            self.warn("Player index {} is invalid. Player index should be 0 or 1.", player_index)
 
         x, y = location
+        cell = CELL_ID[x][y]
+        if cell < 0:
+            return
+        if self._shared is not None:
+            self.__unshare(cell)
+        if self._pending is not None:
+            self._materialize(cell)
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            self.__units(cell).append(new_unit)
         else:
-            self.__map[x][y] = [new_unit]
+            self.__cells[cell] = [new_unit]
+            self.__set_blocked(cell, True)
+        self.__set_occupied(cell, True)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -186,7 +383,16 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
-        self.__map[x][y] = []
+        cell = CELL_ID[x][y]
+        if cell < 0:
+            return
+        if self._pending is not None:
+            self._pending[cell] = 0
+        if self._shared is not None:
+            self._shared[cell] = 0
+        self.__set_blocked(cell, False)
+        self.__set_occupied(cell, False)
+        self.__cells[cell] = []
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -200,7 +406,7 @@ class GameMap:
 
         """
         if radius < 0 or radius > self.ARENA_SIZE:
-            self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}".format(radius, self.ARENA_SIZE))
+            self.warn("Radius {} was passed to get_locations_in_range. Expected integer between 0 and {}", radius, self.ARENA_SIZE)
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
 
@@ -208,13 +414,129 @@ class GameMap:
         locations = []
         search_radius = math.ceil(radius)
         getHitRadius = self.config["unitInformation"][0]['getHitRadius']
-        for i in range(int(x - search_radius), int(x + search_radius + 1)):
-            for j in range(int(y - search_radius), int(y + search_radius + 1)):
-                new_location = [i, j]
-                # A unit with a given range affects all locations who's centers are within that range + get hit radius
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + getHitRadius:
-                    locations.append(new_location)
-        return locations
+        center = self.cell_id(location)
+        if center < 0:
+            for i in range(int(x - search_radius), int(x + search_radius + 1)):
+                for j in range(int(y - search_radius), int(y + search_radius + 1)):
+                    new_location = [i, j]
+                    # A unit with a given range affects all locations who's centers are within that range + get hit radius
+                    if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + getHitRadius:
+                        locations.append(new_location)
+            return locations
+
+        return [list(CELL_LOCATIONS[cell]) for cell in self.cells_in_range(center, radius + getHitRadius)]
+
+    def cells_in_range(self, center, radius):
+        """Gets the packed ids of the cells whose centers are strictly closer than radius to a cell
+
+        Args:
+            center: The packed id of the center of our search area
+            radius: The radius of our search area, including any get hit radius
+
+        Returns:
+            A list of packed cell ids
+
+        """
+        x, y = CELL_LOCATIONS[center]
+        distances = squared_distance_table()
+        row = center * NUM_CELLS
+        limit = squared_range_limit(radius)
+        search_radius = math.ceil(radius)
+        cells = []
+        for i in range(max(0, x - search_radius), min(self.ARENA_SIZE - 1, x + search_radius) + 1):
+            column = CELL_ID[i]
+            for j in range(max(0, y - search_radius), min(self.ARENA_SIZE - 1, y + search_radius) + 1):
+                cell = column[j]
+                if cell >= 0 and distances[row + cell] <= limit:
+                    cells.append(cell)
+        return cells
+
+    def units_in_cell(self, cell):
+        """Gets the list of units at a packed cell id, without any bounds checking
+
+        Args:
+            cell: A packed cell id
+
+        Returns:
+            The list of GameUnits at that cell
+
+        """
+        if self._shared is not None:
+            self.__unshare(cell)
+        if self._pending is not None:
+            self._materialize(cell)
+        return self.__units(cell)
+
+    def has_structure(self, location):
+        """Checks if a structure stands on an in bounds location, without creating any GameUnits
+
+        Args:
+            location: A location inside the arena
+
+        Returns:
+            True if a structure is at the location, False otherwise
+
+        """
+        x, y = location
+        cell = CELL_ID[x][y]
+        if self._pending is not None and self._pending[cell]:
+            return self._unit_arrays.structure_type[cell] >= 0
+        for unit in self.__cells[cell] or ():
+            if unit.stationary:
+                return True
+        return False
+
+    def count_units(self, unit_type=None, player_index=None):
+        """Counts the units on the map. Cells that have not been read yet are counted from the unit arrays.
+
+        Args:
+            unit_type: Only count units of this type
+            player_index: Only count units controlled by this player, 0 for you 1 for the enemy
+
+        Returns:
+            The number of matching units
+
+        """
+        return len(self.__matching_units(unit_type, player_index, False))
+
+    def structure_locations(self, unit_type=None, player_index=None):
+        """Gets the locations of the structures on the map, without creating any GameUnits
+
+        Args:
+            unit_type: Only include structures of this type
+            player_index: Only include structures controlled by this player, 0 for you 1 for the enemy
+
+        Returns:
+            A list of [x, y] locations
+
+        """
+        return [list(CELL_LOCATIONS[cell]) for cell in self.__matching_units(unit_type, player_index, True)]
+
+    def __matching_units(self, unit_type, player_index, structures_only):
+        """Lists the cell of every matching unit, once per unit"""
+        pending = self._pending
+        arrays = self._unit_arrays
+        if pending is not None:
+            catalog = self._catalog
+            shorthands = catalog.shorthands
+            structure_type = arrays.structure_type
+            structure_owner = arrays.structure_owner
+        cells = []
+        for cell in range(NUM_CELLS):
+            if pending is not None and pending[cell]:
+                type_index = structure_type[cell]
+                if type_index >= 0 and (unit_type is None or shorthands[type_index] == unit_type) and (player_index is None or structure_owner[cell] == player_index):
+                    cells.append(cell)
+                if not structures_only:
+                    for index in arrays.mobiles_in_cell(cell):
+                        if (unit_type is None or shorthands[arrays.mobile_type[index]] == unit_type) and (player_index is None or arrays.mobile_owner[index] == player_index):
+                            cells.append(cell)
+                continue
+            for unit in self.__cells[cell] or ():
+                if (structures_only and not unit.stationary) or (unit_type is not None and unit.unit_type != unit_type) or (player_index is not None and unit.player_index != player_index):
+                    continue
+                cells.append(cell)
+        return cells
 
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
@@ -232,9 +554,43 @@ class GameMap:
 
         return math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
 
-    def warn(self, message):
+    def squared_distance_between_locations(self, location_1, location_2):
+        """Squared euclidean distance, read from the precomputed table when both locations are in the arena
+
+        Args:
+            location_1: An arbitrary location, [x, y]
+            location_2: An arbitrary location, [x, y]
+
+        Returns:
+            The squared euclidean distance between the two locations
+
+        """
+        cell_1 = self.cell_id(location_1)
+        cell_2 = self.cell_id(location_2)
+        if cell_1 >= 0 and cell_2 >= 0:
+            return squared_distance_table()[cell_1 * NUM_CELLS + cell_2]
+        x1, y1 = location_1
+        x2, y2 = location_2
+        return (x1 - x2)**2 + (y1 - y2)**2
+
+    def cell_id(self, location):
+        """Gets the packed id of a location
+
+        Args:
+            location: An arbitrary location, [x, y]
+
+        Returns:
+            An integer between 0 and NUM_CELLS - 1, or -1 if the location is not on the board
+
+        """
+        x, y = location
+        if 0 <= x < self.ARENA_SIZE and 0 <= y < self.ARENA_SIZE and x == int(x) and y == int(y):
+            return CELL_ID[int(x)][int(y)]
+        return -1
+
+    def warn(self, message, *args):
         """
-        Used internally by game_map to print out default messaging
+        Used internally by game_map to print out default messaging. The message is formatted with args when the log is flushed
         """
         if(self.enable_warnings):
-            debug_write(message)
+            log.warning(message, *args)
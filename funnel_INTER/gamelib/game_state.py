@@ -1,11 +1,48 @@
 import math
 import json
+import struct
 import sys
 
 from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
+from .util import send_command, decode_state
+from . import log
 from .unit import GameUnit
-from .game_map import GameMap
+from .game_map import GameMap, CELL_ID, CELL_LOCATIONS, NUM_CELLS, DEPLOY_MASK, FRIENDLY_HALF_MASK, squared_distance_table, squared_range_limit
+from .catalog import UnitCatalog
+from .unit_arrays import UnitArrays
+from .plan import BuildPlan
+from .economy import Economy
+
+_published_catalog = None
+
+
+# Fixed header of GameState.to_bytes: magic, version, turn number, my health, my time, enemy health,
+# enemy time, my SP and MP, the enemy's SP and MP, and the lengths of the build and deploy stacks
+_BYTES_HEADER = struct.Struct("<4sHi8dII")
+_BYTES_MAGIC = b"C1GS"
+_BYTES_VERSION = 3
+
+
+def _publish_catalog(catalog):
+    """Points the module level unit constants at a catalog. They only change when a new config is loaded.
+    """
+    global _published_catalog, WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX, MP, SP
+    if catalog is _published_catalog:
+        return
+    _published_catalog = catalog
+    WALL = catalog.WALL
+    SUPPORT = catalog.SUPPORT
+    TURRET = catalog.TURRET
+    SCOUT = catalog.SCOUT
+    DEMOLISHER = catalog.DEMOLISHER
+    INTERCEPTOR = catalog.INTERCEPTOR
+    REMOVE = catalog.REMOVE
+    UPGRADE = catalog.UPGRADE
+    UNIT_TYPE_TO_INDEX = catalog.UNIT_TYPE_TO_INDEX
+    ALL_UNITS = list(catalog.ALL_UNITS)
+    STRUCTURE_TYPES = list(catalog.STRUCTURE_TYPES)
+    MP = 1
+    SP = 0
 
 def is_stationary(unit_type):
     """
@@ -32,6 +69,11 @@ class GameState:
         * REMOVE (str): A constant representing removing your own unit
         * UPGRADE (str): A constant representing upgrading a unit
         * STRUCTURE_TYPES (list): A list of the structure units
+        * catalog (:obj: UnitCatalog): The unit types, stats and costs compiled from the config once per game
+        * economy (:obj: Economy): The per-turn SP and MP income compiled from the config once per game
+        * lazy (bool): Whether GameUnits are created on first access instead of while parsing
+        * unit_arrays (:obj: UnitArrays): The units of this turn as sent by the engine, in compact arrays
+        * structure_diff (:obj: StructureDiff): The structures added, removed, damaged and upgraded since the previous turn, None if it was not given
 
         * ARENA_SIZE (int): The size of the arena
         * HALF_ARENA (int): Half the size of the arena
@@ -47,47 +89,33 @@ class GameState:
 
     """
 
-    def __init__(self, config, serialized_string):
+    PATH_CACHE_SIZE = 4096
+
+    def __init__(self, config, serialized_string, catalog=None, lazy=False, previous=None):
         """ Setup a turns variables using arguments passed
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn.
+              An EngineMessage or an already decoded dict is used without decoding it again, and bytes are read as to_bytes wrote them
+            * catalog (:obj: UnitCatalog): The catalog compiled from config. Looked up with UnitCatalog.for_config if None
+            * lazy (bool): If True, the GameUnits of a location are only created the first time game_map[x, y] reads it
+            * previous (:obj: GameState): The state of the previous turn. If given, structure_diff is filled in and cached paths are kept
 
         """
         self.serialized_string = serialized_string
         self.config = config
         self.enable_warnings = True
 
-        global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
-        UNIT_TYPE_TO_INDEX = {}
-        WALL = config["unitInformation"][0]["shorthand"]
-        UNIT_TYPE_TO_INDEX[WALL] = 0
-        SUPPORT = config["unitInformation"][1]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SUPPORT] = 1
-        TURRET = config["unitInformation"][2]["shorthand"]
-        UNIT_TYPE_TO_INDEX[TURRET] = 2
-        SCOUT = config["unitInformation"][3]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SCOUT] = 3
-        DEMOLISHER = config["unitInformation"][4]["shorthand"]
-        UNIT_TYPE_TO_INDEX[DEMOLISHER] = 4
-        INTERCEPTOR = config["unitInformation"][5]["shorthand"]
-        UNIT_TYPE_TO_INDEX[INTERCEPTOR] = 5
-        REMOVE = config["unitInformation"][6]["shorthand"]
-        UNIT_TYPE_TO_INDEX[REMOVE] = 6
-        UPGRADE = config["unitInformation"][7]["shorthand"]
-        UNIT_TYPE_TO_INDEX[UPGRADE] = 7
-
-        ALL_UNITS = [SCOUT, DEMOLISHER, INTERCEPTOR, WALL, SUPPORT, TURRET]
-        STRUCTURE_TYPES = [WALL, SUPPORT, TURRET]
+        self.catalog = catalog if catalog is not None else UnitCatalog.for_config(config)
+        self.economy = Economy.for_config(config)
+        self.lazy = lazy
+        _publish_catalog(self.catalog)
 
         self.ARENA_SIZE = 28
         self.HALF_ARENA = int(self.ARENA_SIZE / 2)
         self.MP = 1
         self.SP = 0
-        global MP, SP
-        MP = self.MP
-        SP = self.SP
 
         self.game_map = GameMap(self.config)
         self._shortest_path_finder = ShortestPathFinder()
@@ -96,14 +124,21 @@ class GameState:
         self._player_resources = [
                 {'SP': 0, 'MP': 0},  # player 0, which is you
                 {'SP': 0, 'MP': 0}]  # player 1, which is the opponent
-        self.__parse_state(serialized_string)
+        if previous is not None and previous.catalog is not self.catalog:
+            previous = None
+        self.structure_diff = None
+        self._path_cache = previous._path_cache if previous is not None else {}
+        self.__parse_state(serialized_string, previous)
 
-    def __parse_state(self, state_line):
+    def __parse_state(self, state_line, previous=None):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        state_line is the game state as a json string, EngineMessage, decoded dict or to_bytes encoding. previous is the GameState of the last turn, if any.
         """
-        state = json.loads(state_line)
+        if isinstance(state_line, (bytes, bytearray, memoryview)):
+            self.__load_bytes(state_line, previous)
+            return
+        state = decode_state(state_line)
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -120,37 +155,85 @@ class GameState:
             {'SP': p1_SP, 'MP': p1_MP},
             {'SP': p2_SP, 'MP': p2_MP}]
 
-        p1units = state["p1Units"]
-        p2units = state["p2Units"]
-
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
-
-    def __create_parsed_units(self, units, player_number):
-        """
-        Helper function for __parse_state to add units to the map.
-        """
-        typedef = self.config.get("unitInformation")
-        for i, unit_types in enumerate(units):
-            for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
-                sx, sy, shp = uinfo[:3]
-                x, y = map(int, [sx, sy])
-                hp = float(shp)
-                # This depends on RM and UP always being the last types to be processed
-                if unit_type == REMOVE:
-                    # Quick fix will deploy engine fix soon
-                    if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].pending_removal = True
-                elif unit_type == UPGRADE:
-                    if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
-                else:
-                    unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+        self.unit_arrays = UnitArrays.from_state(state, self.catalog)
+        if previous is not None:
+            self.structure_diff = self.unit_arrays.diff(previous.unit_arrays)
+        self.game_map.load_unit_arrays(self.unit_arrays, self.catalog, self.lazy)
+
+    def __load_bytes(self, data, previous=None):
+        """Fills in the state from a to_bytes encoding"""
+        view = memoryview(data)
+        if len(view) < _BYTES_HEADER.size:
+            raise ValueError("Not a GameState encoding")
+        (magic, version, self.turn_number, self.my_health, self.my_time, self.enemy_health, self.enemy_time,
+         p1_SP, p1_MP, p2_SP, p2_MP, build_count, deploy_count) = _BYTES_HEADER.unpack_from(view, 0)
+        if magic != _BYTES_MAGIC or version != _BYTES_VERSION:
+            raise ValueError("Not a GameState encoding, or one of another version ({})".format(version))
+        self._player_resources = [
+            {'SP': p1_SP, 'MP': p1_MP},
+            {'SP': p2_SP, 'MP': p2_MP}]
+
+        self.unit_arrays, offset = UnitArrays.from_bytes(view, _BYTES_HEADER.size)
+        if previous is not None:
+            self.structure_diff = self.unit_arrays.diff(previous.unit_arrays)
+        self.game_map.load_unit_arrays(self.unit_arrays, self.catalog, self.lazy)
+
+        shorthands = self.catalog.shorthands
+        commands = view[offset:offset + 3 * (build_count + deploy_count)].tobytes()
+        self._build_stack = [(shorthands[commands[index]], commands[index + 1], commands[index + 2]) for index in range(0, 3 * build_count, 3)]
+        self._deploy_stack = [(shorthands[commands[index]], commands[index + 1], commands[index + 2]) for index in range(3 * build_count, len(commands), 3)]
+        # Put the units the stacks spawned and upgraded back on the map. The resources stored were already paid for them
+        for unit_type, x, y in self._build_stack:
+            if unit_type == self.catalog.UPGRADE:
+                for unit in self.game_map[x, y]:
+                    if unit.stationary:
+                        unit.upgrade()
+            elif unit_type != self.catalog.REMOVE:
+                self.game_map.add_unit(unit_type, [x, y], 0)
+        for unit_type, x, y in self._deploy_stack:
+            self.game_map.add_unit(unit_type, [x, y], 0)
+
+    def to_bytes(self):
+        """Encodes this state in a binary layout, smaller and faster to read back than the engine's json.
+
+        The layout is a header holding the turn number, both players' health, time and resources and the
+        length of the build and deploy stacks, then the compressed unit arrays (see UnitArrays.to_bytes), then a
+        (unit type index, x, y) byte triple for each command in the stacks. Pass the bytes to from_bytes,
+        or to a worker process, to get the state back with the units staged by the attempt functions and
+        plans already on the map. Units added straight to game_map are not encoded, and neither is
+        structure_diff.
+
+        Returns:
+            The encoding as bytes
+
+        """
+        index = self.catalog.UNIT_TYPE_TO_INDEX
+        commands = bytearray()
+        for unit_type, x, y in self._build_stack + self._deploy_stack:
+            commands.extend((index[unit_type], x, y))
+        mine, theirs = self._player_resources
+        header = _BYTES_HEADER.pack(_BYTES_MAGIC, _BYTES_VERSION, self.turn_number, self.my_health, self.my_time,
+                                    self.enemy_health, self.enemy_time, mine['SP'], mine['MP'],
+                                    theirs['SP'], theirs['MP'], len(self._build_stack), len(self._deploy_stack))
+        return b"".join((header, self.unit_arrays.to_bytes(), bytes(commands)))
+
+    @classmethod
+    def from_bytes(cls, config, data, catalog=None, lazy=True, previous=None):
+        """Reads a state encoded by to_bytes
+
+        Args:
+            * config (JSON): The config the encoded state was played with
+            * data (bytes): The encoding
+            * catalog, lazy, previous: As for GameState()
+
+        Returns:
+            The new GameState
+
+        """
+        return cls(config, data, catalog, lazy, previous)
 
     def __resource_required(self, unit_type):
-        return self.SP if is_stationary(unit_type) else self.MP
+        return self.SP if self.catalog.is_stationary(unit_type) else self.MP
 
     def __set_resource(self, resource_type, amount, player_index=0):
         """
@@ -166,10 +249,10 @@ class GameState:
         self._player_resources[player_index][resource_key] = held_resource + amount
 
     def _invalid_player_index(self, index):
-        self.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)".format(index))
+        self.warn("Invalid player index {} passed, player index should always be 0 (yourself) or 1 (your opponent)", index)
     
     def _invalid_unit(self, unit):
-        self.warn("Invalid unit {}".format(unit))
+        self.warn("Invalid unit {}", unit)
 
     def submit_turn(self):
         """Submit and end your turn.
@@ -195,7 +278,7 @@ class GameState:
             self._invalid_player_index(player_index)
             return
         if not resource_type == self.MP and not resource_type == self.SP:
-            self.warn("Invalid resource_type '{}'. Please use MP (0) or SP (1)".format(resource_type))
+            self.warn("Invalid resource_type '{}'. Please use MP (0) or SP (1)", resource_type)
             return
 
         if resource_type == self.MP:
@@ -234,12 +317,13 @@ class GameState:
             The number of units affordable of the given unit_type.
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.catalog.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
 
         costs = self.type_cost(unit_type)
         player_held = self.get_resources()
+        MP, SP = self.MP, self.SP
         if costs[MP] > 0 and costs[SP] > 0:
             return min(math.floor(player_held[SP] / costs[SP]), math.floor(player_held[MP] / costs[MP]))
         elif costs[MP] > 0:
@@ -251,7 +335,8 @@ class GameState:
             return 0
 
     def project_future_MP(self, turns_in_future=1, player_index=0, current_MP=None):
-        """Predicts the number of MP we will have on a future turn
+        """Predicts the number of MP we will have on a future turn. 
+        See game_state.economy to project SP and MP together, with spending and the MP cap.
 
         Args:
             turns_in_future: The number of turns in the future we want to look forward to predict
@@ -264,11 +349,11 @@ class GameState:
         """
 
         if turns_in_future < 1 or turns_in_future > 99:
-            self.warn("Invalid turns in future used ({}). Turns in future should be between 1 and 99".format(turns_in_future))
+            self.warn("Invalid turns in future used ({}). Turns in future should be between 1 and 99", turns_in_future)
         if not player_index == 1 and not player_index == 0:
             self._invalid_player_index(player_index)
         if type(current_MP) == int and current_MP < 0:
-            self.warn("Invalid current MP ({}). Current MP cannot be negative.".format(current_MP))
+            self.warn("Invalid current MP ({}). Current MP cannot be negative.", current_MP)
 
         MP = self.get_resource(self.MP, player_index) if not current_MP else current_MP
         for increment in range(1, turns_in_future + 1):
@@ -292,16 +377,11 @@ class GameState:
             The units costs as a list [SP, MP]
 
         """
-        if unit_type == REMOVE:
+        if unit_type == self.catalog.REMOVE:
             self._invalid_unit(unit_type)
             return
-        
-        unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
-        cost_base = [unit_def.get('cost1', 0), unit_def.get('cost2', 0)]
-        if upgrade:
-            return [unit_def.get('upgrade', {}).get('cost1', cost_base[SP]), unit_def.get('upgrade', {}).get('cost2', cost_base[MP])]
 
-        return cost_base
+        return self.catalog.type_cost(unit_type, upgrade)
 
 
     def can_spawn(self, unit_type, location, num=1):
@@ -320,17 +400,17 @@ class GameState:
             True if we can spawn the unit(s)
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.catalog.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
         
         if not self.game_map.in_arena_bounds(location):
             if self.enable_warnings:
-                self.warn("Could not spawn {} at location {}. Location invalid.".format(unit_type, location))
+                self.warn("Could not spawn {} at location {}. Location invalid.", unit_type, location)
             return False
 
         affordable = self.number_affordable(unit_type) >= num
-        stationary = is_stationary(unit_type)
+        stationary = self.catalog.is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
         on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
@@ -346,12 +426,53 @@ class GameState:
             if not (stationary or on_edge):
                 fail_reason = fail_reason + " Information units must be deployed on the edge."
             if len(fail_reason) > 0:
-                self.warn("Could not spawn {} at location {}.{}".format(unit_type, location, fail_reason))
+                self.warn("Could not spawn {} at location {}.{}", unit_type, location, fail_reason)
 
         return (affordable and correct_territory and not blocked and
                 (stationary or on_edge) and
                 (not stationary or num == 1))
 
+    def spawn_mask(self, unit_type):
+        """Gets where a unit type could be spawned right now, as a bitmask where bit n stands for packed cell n.
+        Cells are set if they are on your half and hold no structure. For mobile units they must also be on one of
+        your edges, and for structures they must not hold any unit. Resources are not taken into account.
+        The mask is derived from game_map.blocked_mask and game_map.occupied_mask, so it follows every unit
+        added by attempt_spawn.
+
+        Args:
+            unit_type: The type of the unit
+
+        Returns:
+            The mask as an int
+
+        """
+        if self.catalog.is_stationary(unit_type):
+            return FRIENDLY_HALF_MASK & ~self.game_map.occupied_mask
+        return DEPLOY_MASK & ~self.game_map.blocked_mask
+
+    def spawn_locations(self, unit_type, locations=None):
+        """Gets the locations where a unit type could be spawned right now, without can_spawn's checks and warnings.
+        See spawn_mask.
+
+        Args:
+            unit_type: The type of the unit
+            locations: The locations to pick from. Every location on your half if None
+
+        Returns:
+            A list of [x, y] locations, in the order they were given
+
+        """
+        mask = self.spawn_mask(unit_type)
+        if locations is None:
+            return [list(CELL_LOCATIONS[cell]) for cell in range(NUM_CELLS) if mask >> cell & 1]
+        cell_id = self.game_map.cell_id
+        open_locations = []
+        for location in locations:
+            cell = cell_id(location)
+            if cell >= 0 and mask >> cell & 1:
+                open_locations.append(location)
+        return open_locations
+
     def attempt_spawn(self, unit_type, locations, num=1):
         """Attempts to spawn new units with the type given in the given locations.
 
@@ -364,32 +485,30 @@ class GameState:
             The number of units successfully spawned
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.catalog.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
         if num < 1 or not locations:
-            self.warn("Attempted to spawn fewer than one units! ({})".format(num))
+            self.warn("Attempted to spawn fewer than one units! ({})", num)
             return
-      
+
         if type(locations[0]) == int:
             locations = [locations]
-        spawned_units = 0
-        for location in locations:
-            for i in range(num):
-                if self.can_spawn(unit_type, location, 1):
-                    x, y = map(int, location)
-                    costs = self.type_cost(unit_type)
-                    self.__set_resource(SP, 0 - costs[SP])
-                    self.__set_resource(MP, 0 - costs[MP])
-                    self.game_map.add_unit(unit_type, location, 0)
-                    if is_stationary(unit_type):
-                        self._build_stack.append((unit_type, x, y))
-                    else:
-                        self._deploy_stack.append((unit_type, x, y))
-                    spawned_units += 1
-                else:
-                    break
-        return spawned_units
+        return sum(self.attempt_spawn_many([(unit_type, location, num) for location in locations]))
+
+    def attempt_spawn_many(self, orders):
+        """Attempts several spawns at once. Each location is checked once, the number of units 
+        affordable there is worked out in one step, and the resources are deducted together at the end.
+
+        Args:
+            orders: A list of (unit_type, location, num) entries, spawned in order
+
+        Returns:
+            A list with the number of units spawned for each entry
+
+        """
+        with self.plan() as plan:
+            return [plan.spawn(unit_type, location, num) for unit_type, location, num in orders]
 
     def attempt_remove(self, locations):
         """Attempts to remove existing friendly structures in the given locations.
@@ -407,10 +526,10 @@ class GameState:
         for location in locations:
             if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
                 x, y = map(int, location)
-                self._build_stack.append((REMOVE, x, y))
+                self._build_stack.append((self.catalog.REMOVE, x, y))
                 removed_units += 1
             else:
-                self.warn("Could not remove a unit from {}. Location has no structures or is enemy territory.".format(location))
+                self.warn("Could not remove a unit from {}. Location has no structures or is enemy territory.", location)
         return removed_units
 
     def attempt_upgrade(self, locations):
@@ -439,21 +558,55 @@ class GameState:
                     if unit.stationary:
                         existing_unit = unit
 
-                if not existing_unit.upgraded and self.config["unitInformation"][UNIT_TYPE_TO_INDEX[existing_unit.unit_type]].get("upgrade", None) is not None:
+                if not existing_unit.upgraded and self.catalog.can_upgrade(existing_unit.unit_type):
                     if (existing_unit.health / existing_unit.max_health) < 0.8:
                         continue
                     costs = self.type_cost(existing_unit.unit_type, True)
                     resources = self.get_resources()
-                    if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
-                        self.__set_resource(SP, 0 - costs[SP])
-                        self.__set_resource(MP, 0 - costs[MP])
+                    if resources[self.SP] >= costs[self.SP] and resources[self.MP] >= costs[self.MP]:
+                        self.__set_resource(self.SP, 0 - costs[self.SP])
+                        self.__set_resource(self.MP, 0 - costs[self.MP])
                         existing_unit.upgrade()
-                        self._build_stack.append((UPGRADE, x, y))
+                        self._build_stack.append((self.catalog.UPGRADE, x, y))
                         spawned_units += 1
             else:
-                self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.".format(location))
+                self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.", location)
         return spawned_units
 
+    def fork(self):
+        """Gets an independent copy of this state for trying out moves, much cheaper than copy.deepcopy.
+
+        The copy shares the config, catalog, unit arrays and path cache with this state. Its resources
+        and build and deploy stacks are copied, and its map shares each cell until either state reads or
+        changes it, see GameMap.fork.
+
+        Returns:
+            The new GameState
+
+        """
+        other = GameState.__new__(GameState)
+        other.__dict__.update(self.__dict__)
+        other.game_map = self.game_map.fork()
+        other._shortest_path_finder = ShortestPathFinder()
+        other._build_stack = list(self._build_stack)
+        other._deploy_stack = list(self._deploy_stack)
+        other._player_resources = [dict(resources) for resources in self._player_resources]
+        return other
+
+    def plan(self):
+        """Starts staging spawns, upgrades and removals that are only applied to this GameState if committed.
+
+            with game_state.plan() as plan:
+                plan.spawn(WALL, walls)
+                if plan.cost()[game_state.SP] > budget:
+                    plan.abort()
+
+        Returns:
+            A BuildPlan. See gamelib/plan.py
+
+        """
+        return BuildPlan(self)
+
     def get_target_edge(self, start_location):
         """Gets the target edge given a starting location
 
@@ -489,16 +642,27 @@ class GameState:
             A list of locations corresponding to the path the unit would take 
             to get from it's starting location to the best available end location
 
+        Paths are cached by the set of blocked locations, so they are reused within a turn and across turns
+        when the structures are the same. Change the map through game_map.add_unit and game_map.remove_unit
+        for the cache to see it.
+
         """
         if self.contains_stationary_unit(start_location):
-            self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
+            self.warn("Attempted to perform pathing from blocked starting location {}", start_location)
             return
 
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        key = (self.game_map.blocked_mask, start_location[0], start_location[1], target_edge)
+        path = self._path_cache.get(key)
+        if path is None:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            path = self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+            if len(self._path_cache) >= self.PATH_CACHE_SIZE:
+                self._path_cache.clear()
+            self._path_cache[key] = path
+        return [list(location) for location in path]
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
@@ -514,17 +678,51 @@ class GameState:
             self.warn('Checked for stationary unit outside of arena bounds')
             return False
         x, y = map(int, location)
+        if not self.game_map.has_structure([x, y]):
+            return False
         for unit in self.game_map[x,y]:
             if unit.stationary:
                 return unit
         return False
 
-    def warn(self, message):
-        """ Used internally by game_state to print warnings
+    def count_units(self, unit_type=None, player_index=None):
+        """Counts the units on the board without creating GameUnits for locations that have not been read
+
+        Args:
+            unit_type: Only count units of this type, SCOUT, WALL, etc.
+            player_index: Only count units controlled by this player, 0 for you 1 for the enemy
+
+        Returns:
+            The number of matching units
+
+        """
+        if player_index is not None and not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return 0
+        return self.game_map.count_units(unit_type, player_index)
+
+    def structure_locations(self, unit_type=None, player_index=None):
+        """Gets the locations of the structures on the board without creating GameUnits for locations that have not been read
+
+        Args:
+            unit_type: Only include structures of this type, WALL, TURRET or SUPPORT
+            player_index: Only include structures controlled by this player, 0 for you 1 for the enemy
+
+        Returns:
+            A list of [x, y] locations
+
+        """
+        if player_index is not None and not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return []
+        return self.game_map.structure_locations(unit_type, player_index)
+
+    def warn(self, message, *args):
+        """ Used internally by game_state to print warnings. The message is formatted with args when the log is flushed
         """
 
         if(self.enable_warnings):
-            debug_write(message)
+            log.warning(message, *args)
 
     def suppress_warnings(self, suppress):
         """Suppress all warnings
@@ -553,11 +751,14 @@ class GameState:
         """
 
         if not isinstance(attacking_unit, GameUnit):
-            self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
+            self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.", type(attacking_unit))
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
         possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.attackRange)
+        attacker_cell = self.game_map.cell_id(attacker_location)
+        distances = squared_distance_table()
+        row = attacker_cell * NUM_CELLS
         target = None
         target_stationary = True
         target_distance = sys.maxsize
@@ -567,12 +768,16 @@ class GameState:
 
         for location in possible_locations:
             for unit in self.game_map[location]:
-                if unit.player_index == attacking_unit.player_index or (attacking_unit.damage_f == 0 and is_stationary(unit.unit_type)) or (attacking_unit.damage_i == 0 and not(is_stationary(unit.unit_type))):
+                if unit.player_index == attacking_unit.player_index or (attacking_unit.damage_f == 0 and unit.stationary) or (attacking_unit.damage_i == 0 and not unit.stationary):
                     continue
 
                 new_target = False
                 unit_stationary = unit.stationary
-                unit_distance = self.game_map.distance_between_locations(location, [attacking_unit.x, attacking_unit.y])
+                # Squared distances rank targets the same way as distances do
+                if attacker_cell >= 0:
+                    unit_distance = distances[row + CELL_ID[location[0]][location[1]]]
+                else:
+                    unit_distance = self.game_map.squared_distance_between_locations(location, attacker_location)
                 unit_health = unit.health
                 unit_y = unit.y
                 unit_x_distance = abs(self.HALF_ARENA - 0.5 - unit.x)
@@ -631,19 +836,28 @@ class GameState:
         if not player_index == 0 and not player_index == 1:
             self._invalid_player_index(player_index)
         if not self.game_map.in_arena_bounds(location):
-            self.warn("Location {} is not in the arena bounds.".format(location))
+            self.warn("Location {} is not in the arena bounds.", location)
 
         attackers = []
         """
         Get locations in the range of TURRET units
         """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
-        for location_unit in possible_locations:
-            for unit in self.game_map[location_unit]:
-                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
+        max_range = self.catalog.max_attack_range
+        target_cell = self.game_map.cell_id(location)
+        if target_cell < 0:
+            possible_locations = self.game_map.get_locations_in_range(location, max_range)
+            for location_unit in possible_locations:
+                for unit in self.game_map[location_unit]:
+                    if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.squared_distance_between_locations(location, location_unit) <= squared_range_limit(unit.attackRange, True):
+                        attackers.append(unit)
+            return attackers
+
+        getHitRadius = self.catalog.get_hit_radius
+        distances = squared_distance_table()
+        row = target_cell * NUM_CELLS
+        units_in_cell = self.game_map.units_in_cell
+        for cell in self.game_map.cells_in_range(target_cell, max_range + getHitRadius):
+            for unit in units_in_cell(cell):
+                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and distances[row + cell] <= squared_range_limit(unit.attackRange, True):
                     attackers.append(unit)
         return attackers
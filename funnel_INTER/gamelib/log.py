@@ -0,0 +1,123 @@
+"""
+Buffered, leveled debug logging.
+
+Messages below the current level return before doing any work. The others are queued with their
+arguments unformatted, and are only formatted and written to stderr, in a single write, when the
+queue is flushed. AlgoCore flushes at the start and end of every turn and at the end of the game.
+A message whose text is written many times between two flushes, for example a warning inside a
+loop, is only written max_repeats times, followed by a count of the repeats that were dropped.
+Messages from the same template with different arguments are all written. Arguments are
+formatted when flushed, so pass values that will not change in the meantime.
+
+    from gamelib import log
+    log.info("Got scored on at: {}", location)
+    log.debug(lambda: "Expensive summary: {}".format(summarize(game_state)))
+
+"""
+import atexit
+import sys
+import threading
+
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+
+class Logger:
+    """A queue of log messages written to a stream when flushed
+
+    Attributes :
+        * level (int): Messages below this level are dropped
+        * max_repeats (int): How many times the same message may be written per flush
+        * max_queued (int): The queue is flushed early once it holds this many messages
+        * stream: Where messages are written, stderr if None
+
+    """
+    def __init__(self, level=INFO, max_repeats=5, max_queued=1000, stream=None):
+        self.level = level
+        self.max_repeats = max_repeats
+        self.max_queued = max_queued
+        self.stream = stream
+        self._queue = []
+        self._lock = threading.Lock()
+
+    def enabled(self, level):
+        """True if messages of this level are kept"""
+        return level >= self.level
+
+    def log(self, level, message, *args):
+        """Queues a message
+
+        Args:
+            level: DEBUG, INFO, WARNING or ERROR
+            message: A str.format template filled in with args when flushed, or a function returning the message
+            args: The values for the template
+
+        """
+        if level < self.level:
+            return
+        with self._lock:
+            self._queue.append((message, args))
+            full = len(self._queue) >= self.max_queued
+        if full:
+            self.flush()
+
+    def debug(self, message, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        self.log(ERROR, message, *args)
+
+    def flush(self):
+        """Formats every queued message and writes them to the stream"""
+        with self._lock:
+            queue = self._queue
+            self._queue = []
+        if not queue:
+            return
+        texts = []
+        for message, args in queue:
+            if callable(message):
+                message = message()
+            texts.append(str(message).format(*args).strip() if args else str(message).strip())
+        # Messages with the same text count as repeats
+        totals = {}
+        for text in texts:
+            totals[text] = totals.get(text, 0) + 1
+        lines = []
+        written = {}
+        for text in texts:
+            count = written.get(text, 0) + 1
+            written[text] = count
+            if count > self.max_repeats:
+                continue
+            lines.append(text)
+            if count == self.max_repeats and totals[text] > count:
+                lines.append("(last message repeated {} more times)".format(totals[text] - count))
+        stream = self.stream if self.stream is not None else sys.stderr
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+
+
+logger = Logger()
+atexit.register(logger.flush)
+
+debug = logger.debug
+info = logger.info
+warning = logger.warning
+error = logger.error
+flush = logger.flush
+
+
+def set_level(level):
+    """Sets the level of the shared logger. OFF drops every message."""
+    logger.level = level
@@ -0,0 +1,474 @@
+"""
+A headless match between two algos, played in one process.
+
+LocalMatch stands in for the engine. It sends both AlgoCore instances the lines the engine would:
+the config, a turn state every turn and the frames of every action phase, through
+AlgoCore.handle_message. It reads back the build and deploy lines each algo submits. Player 2
+sees the board flipped, as with the engine, so both algos play from the bottom half. Commands are
+checked with the GameState attempt functions, and the action phase is played by the Simulator,
+so a local match follows gamelib's rules rather than every detail of the engine's. The replay it
+writes has the same lines as the engine's, so gamelib.replay and the scripts in
+scripts/contributions read it. Checking the Simulator against engine replays with
+gamelib.replay tells how far local matches can be trusted.
+
+    from algo_strategy import AlgoStrategy
+    result = LocalMatch(config, AlgoStrategy(), AlgoStrategy(), replay="local.replay").play()
+
+From the algo folder:
+
+    python3 -m gamelib.match [--config path/to/game-configs.json] [--replay path] [--turns N] [--games N] [module.Class] [module.Class]
+
+"""
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+
+from .catalog import UnitCatalog
+from .economy import Economy
+from .events import EVENT_LAYOUTS, EVENT_KINDS
+from .game_map import ARENA_SIZE
+from .game_state import GameState
+from .simulator import Simulator
+
+
+MatchResult = namedtuple("MatchResult", ["winner", "turns", "frames", "health", "crashed", "seconds"])
+MatchResult.__doc__ = """The outcome of a LocalMatch.
+
+    winner is 0 if the first algo won and 1 if the second did. turns is the number of turns played
+    and frames the number of action frames. health and crashed are indexed by player. seconds is
+    the time the whole match took.
+    """
+
+
+def _flip(location):
+    return [ARENA_SIZE - 1 - location[0], ARENA_SIZE - 1 - location[1]]
+
+
+def flip_state(state):
+    """Gets a game state as player 2 sees it: the board turned around, and player 1 and 2 swapped
+
+    Args:
+        state: A decoded game state, as player 1 sees it
+
+    Returns:
+        A new decoded game state
+
+    """
+    flipped = dict(state)
+    flipped["p1Stats"], flipped["p2Stats"] = state["p2Stats"], state["p1Stats"]
+    for key, other in (("p1Units", "p2Units"), ("p2Units", "p1Units")):
+        flipped[key] = [[_flip(unit) + unit[2:] for unit in units] for units in state[other]]
+    events = {}
+    for kind, entries in state["events"].items():
+        location, target, _, _, _, player = EVENT_LAYOUTS.get(kind, (None, None, None, None, None, None))
+        flipped_entries = []
+        for event in entries:
+            event = list(event)
+            if location is not None:
+                event[location] = _flip(event[location])
+            if target is not None:
+                event[target] = _flip(event[target])
+            if player is not None:
+                event[player] = 3 - event[player]
+            flipped_entries.append(event)
+        events[kind] = flipped_entries
+    flipped["events"] = events
+    return flipped
+
+
+class _Structure:
+    __slots__ = ("unit_type", "owner", "health", "upgraded", "id", "removing")
+
+    def __init__(self, unit_type, owner, health, unit_id):
+        self.unit_type = unit_type
+        self.owner = owner
+        self.health = health
+        self.upgraded = False
+        self.id = unit_id
+        # Action phases left before a removal takes effect, None if the structure is not being removed
+        self.removing = None
+
+
+class LocalMatch:
+    """One match between two AlgoCore instances, without the engine
+
+    Attributes :
+        * config (JSON): The config of the game
+        * algos (list): The two AlgoCore instances, player 1 first
+        * names (list): The names written to the replay's end stats
+        * max_turns (int): The turn the game ends on if no player has lost
+        * send_frames (bool): If False, the algos only get the turn states, which is faster
+        * quiet (bool): If True, what the algos write to stderr is discarded
+        * health, SP, MP (list): Each player's health and resources, player 1 first
+
+    """
+    def __init__(self, config, first, second, replay=None, max_turns=100, send_frames=True, quiet=True, names=None):
+        """Sets up the board with the starting resources of the config
+
+        Args:
+            config (JSON): The config of the game
+            first, second: The AlgoCore instances playing as player 1 and player 2
+            replay: A path or open file to write the replay to, or None for no replay
+            max_turns: The turn the game ends on if no player has lost
+            send_frames: If False, the algos do not get the action frames
+            quiet: If True, discard what the algos write to stderr
+            names: The names of the two algos. Their class names if None
+
+        """
+        self.config = config
+        self.algos = [first, second]
+        self.names = list(names) if names is not None else [type(algo).__name__ for algo in self.algos]
+        self.max_turns = max_turns
+        self.send_frames = send_frames
+        self.quiet = quiet
+        self.catalog = UnitCatalog.for_config(config)
+        self._economy = Economy.for_config(config)
+        self._replay = replay
+        resources = config["resources"]
+        self.health = [float(resources.get("startingHP", 30))] * 2
+        self.SP = [float(resources.get("startingCores", 0))] * 2
+        self.MP = [float(resources.get("startingBits", 0))] * 2
+        self._time = [0, 0]
+        self._total_time = [0, 0]
+        self._spent = [[0.0, 0.0], [0.0, 0.0]]
+        self._scored = [0.0, 0.0]
+        self._crashed = [False, False]
+        self._structures = {}
+        self._next_id = 0
+        self._frames = 0
+        self._out = None
+
+        unit_information = config["unitInformation"]
+        index = self.catalog.UNIT_TYPE_TO_INDEX
+        self._breach_damage = {unit_type: unit_information[index[unit_type]].get("playerBreachDamage", 1) for unit_type in index}
+
+    def play(self):
+        """Plays the match to the end
+
+        Returns:
+            A MatchResult
+
+        """
+        start = time.perf_counter()
+        replay = self._replay
+        with contextlib.ExitStack() as stack:
+            if isinstance(replay, str):
+                replay = stack.enter_context(open(replay, "w"))
+            self._out = replay
+            if self.quiet:
+                stack.enter_context(contextlib.redirect_stderr(stack.enter_context(open(os.devnull, "w"))))
+            config_line = json.dumps(self.config)
+            self.__write(config_line)
+            for player_index in (0, 1):
+                self.__send(player_index, config_line)
+            turn = 0
+            frame = 0
+            while True:
+                frame = self.__play_turn(turn)
+                if any(self._crashed) or min(self.health) <= 0 or turn + 1 >= self.max_turns:
+                    break
+                turn += 1
+            winner = self.__finish(turn, frame, time.perf_counter() - start)
+        self._out = None
+        return MatchResult(winner, turn + 1, self._frames, list(self.health), list(self._crashed), time.perf_counter() - start)
+
+    def __new_id(self):
+        self._next_id += 1
+        return str(self._next_id)
+
+    def __write(self, line):
+        if self._out is not None:
+            self._out.write(line + "\n")
+
+    def __send(self, player_index, line, state=None):
+        """Hands a line to an algo the way the engine would
+
+        Args:
+            player_index: The player to send it to
+            line: The line as player 1 sees it
+            state: The decoded line, flipped for player 2 if given
+
+        Returns:
+            The lines the algo wrote to stdout
+
+        """
+        if self._crashed[player_index]:
+            return []
+        if player_index == 1 and state is not None:
+            line = json.dumps(flip_state(state))
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                self.algos[player_index].handle_message(line)
+        except Exception:
+            sys.stderr.write(traceback.format_exc())
+            self._crashed[player_index] = True
+        return output.getvalue().splitlines()
+
+    def __state(self, turn_info, mobiles=(), events=None):
+        """Builds a game state as player 1 sees it
+
+        Args:
+            turn_info: The [type, turn, frame] of the state
+            mobiles: (unit_type, player_index, x, y, health, id) of the mobile units on the board
+            events: The events of the frame, by kind
+
+        """
+        catalog = self.catalog
+        index = catalog.UNIT_TYPE_TO_INDEX
+        units = ([[] for _ in catalog.shorthands], [[] for _ in catalog.shorthands])
+        for (x, y), structure in sorted(self._structures.items()):
+            player_units = units[structure.owner]
+            player_units[index[structure.unit_type]].append([x, y, structure.health, structure.id])
+            if structure.removing is not None:
+                player_units[index[catalog.REMOVE]].append([x, y, 0.0, structure.id])
+            if structure.upgraded:
+                player_units[index[catalog.UPGRADE]].append([x, y, 0.0, structure.id])
+        for unit_type, player_index, x, y, health, unit_id in mobiles:
+            units[player_index][index[unit_type]].append([x, y, health, unit_id])
+        all_events = {kind: [] for kind in EVENT_KINDS}
+        if events:
+            all_events.update(events)
+        return {"p1Units": units[0], "p2Units": units[1], "turnInfo": turn_info, "events": all_events,
+                "p1Stats": [self.health[0], self.SP[0], self.MP[0], self._time[0]],
+                "p2Stats": [self.health[1], self.SP[1], self.MP[1], self._time[1]]}
+
+    def __publish(self, state):
+        """Writes a state to the replay and sends it to both algos"""
+        line = json.dumps(state)
+        self.__write(line)
+        outputs = []
+        for player_index in (0, 1):
+            outputs.append(self.__send(player_index, line, state))
+        return outputs
+
+    def __commands(self, player_index, state, output):
+        """Checks the commands an algo submitted against its view of the board
+
+        Returns:
+            (build stack, deploy stack) of the accepted commands, as player 1 sees them
+
+        """
+        if len(output) < 2:
+            if not self._crashed[player_index]:
+                sys.stderr.write("Player {} did not submit a turn\n".format(player_index + 1))
+            self._crashed[player_index] = True
+            return [], []
+        view = state if player_index == 0 else flip_state(state)
+        game_state = GameState(self.config, view, self.catalog)
+        game_state.suppress_warnings(True)
+        catalog = self.catalog
+        try:
+            builds, deploys = json.loads(output[-2]), json.loads(output[-1])
+        except ValueError:
+            builds, deploys = [], []
+        for command in builds + deploys:
+            if not isinstance(command, list) or len(command) != 3:
+                continue
+            unit_type, x, y = command
+            if unit_type == catalog.UPGRADE:
+                game_state.attempt_upgrade([x, y])
+            elif unit_type == catalog.REMOVE:
+                game_state.attempt_remove([x, y])
+            elif unit_type in catalog.ALL_UNITS:
+                game_state.attempt_spawn(unit_type, [x, y])
+        SP, MP = game_state.get_resources(0)
+        self._spent[player_index][0] += self.SP[player_index] - SP
+        self._spent[player_index][1] += self.MP[player_index] - MP
+        self.SP[player_index], self.MP[player_index] = SP, MP
+        if player_index == 1:
+            return ([(unit_type,) + tuple(_flip([x, y])) for unit_type, x, y in game_state._build_stack],
+                    [(unit_type,) + tuple(_flip([x, y])) for unit_type, x, y in game_state._deploy_stack])
+        return list(game_state._build_stack), list(game_state._deploy_stack)
+
+    def __build(self, player_index, builds, spawns):
+        """Puts accepted build commands on the board"""
+        catalog = self.catalog
+        index = catalog.UNIT_TYPE_TO_INDEX
+        unit_information = self.config["unitInformation"]
+        for unit_type, x, y in builds:
+            structure = self._structures.get((x, y))
+            if unit_type == catalog.UPGRADE:
+                base = catalog.unit_stats(structure.unit_type)
+                structure.upgraded = True
+                structure.health += catalog.unit_stats(structure.unit_type, True).max_health - base.max_health
+            elif unit_type == catalog.REMOVE:
+                type_config = unit_information[index[structure.unit_type]]
+                if structure.upgraded:
+                    type_config = dict(type_config, **type_config.get("upgrade", {}))
+                structure.removing = type_config.get("turnsRequiredToRemove", 1)
+            else:
+                structure = _Structure(unit_type, player_index, catalog.unit_stats(unit_type).max_health, self.__new_id())
+                self._structures[x, y] = structure
+            spawns.append([[x, y], index[unit_type], structure.id, player_index + 1])
+
+    def __play_turn(self, turn):
+        """Plays the deploy phase and the action phase of a turn
+
+        Returns:
+            The number of the last action frame
+
+        """
+        catalog = self.catalog
+        index = catalog.UNIT_TYPE_TO_INDEX
+        state = self.__state([0, turn, -1])
+        line = json.dumps(state)
+        self.__write(line)
+        outputs = []
+        for player_index in (0, 1):
+            started = time.perf_counter()
+            outputs.append(self.__send(player_index, line, state))
+            self._time[player_index] = int((time.perf_counter() - started) * 1000)
+            self._total_time[player_index] += self._time[player_index]
+        commands = [self.__commands(player_index, state, outputs[player_index]) for player_index in (0, 1)]
+        if any(self._crashed):
+            return 0
+
+        spawns = []
+        deploys = ([], [])
+        ids = []
+        mobiles = []
+        for player_index in (0, 1):
+            self.__build(player_index, commands[player_index][0], spawns)
+        for player_index in (0, 1):
+            for unit_type, x, y in commands[player_index][1]:
+                unit_id = self.__new_id()
+                deploys[player_index].append((unit_type, x, y))
+                ids.append(unit_id)
+                mobiles.append((unit_type, player_index, x, y, catalog.unit_stats(unit_type).max_health, unit_id))
+                spawns.append([[x, y], index[unit_type], unit_id, player_index + 1])
+
+        frame_zero = self.__state([1, turn, 0], mobiles, {"spawn": spawns})
+        game_state = GameState(self.config, frame_zero, catalog)
+        game_state.suppress_warnings(True)
+        result = Simulator(game_state).run(deploys[0], deploys[1])
+        self.__publish(frame_zero)
+
+        scored = [0.0, 0.0]
+        alive = set(range(len(ids)))
+        for simulated in result.frames:
+            events = {"breach": [], "death": []}
+            for unit_type, player_index, x, y, health in simulated.structures:
+                structure = self._structures[x, y]
+                structure.health = health
+                if health <= 0:
+                    events["death"].append([[x, y], index[unit_type], structure.id, player_index + 1, False])
+                    del self._structures[x, y]
+            survivors = set(simulated.units)
+            # The units that left this frame, by type and owner, to give each death and breach its id
+            gone = {}
+            for unit in alive - survivors:
+                unit_type, player_index = mobiles[unit][:2]
+                gone.setdefault((unit_type, player_index), []).append(ids[unit])
+            breaches = list(simulated.breaches)
+            for unit_type, player_index, x, y in simulated.deaths:
+                if catalog.is_stationary(unit_type):
+                    continue
+                left = gone.get((unit_type, player_index))
+                unit_id = left.pop(0) if left else ""
+                events["death"].append([[x, y], index[unit_type], unit_id, player_index + 1, False])
+                if (x, y, player_index) in breaches:
+                    breaches.remove((x, y, player_index))
+                    damage = self._breach_damage[unit_type]
+                    events["breach"].append([[x, y], damage, index[unit_type], unit_id, player_index + 1])
+                    self.health[1 - player_index] -= damage
+                    scored[player_index] += damage
+            alive = survivors
+            self._frames += 1
+            if self._out is not None or self.send_frames:
+                frame_mobiles = [(unit_type, player_index, x, y, health, ids[unit])
+                                 for (unit_type, player_index, x, y, health), unit in zip(simulated.mobiles, simulated.units)]
+                frame_state = self.__state([1, turn, simulated.frame], frame_mobiles, events)
+                if self.send_frames:
+                    self.__publish(frame_state)
+                else:
+                    self.__write(json.dumps(frame_state))
+        self.health = list(result.health)
+
+        # Removals take effect, with a refund for the health left, then both players earn their income
+        for location, structure in list(self._structures.items()):
+            if structure.removing is None:
+                continue
+            structure.removing -= 1
+            if structure.removing <= 0:
+                stats = catalog.unit_stats(structure.unit_type, structure.upgraded)
+                type_config = self.config["unitInformation"][index[structure.unit_type]]
+                if structure.upgraded:
+                    type_config = dict(type_config, **type_config.get("upgrade", {}))
+                cost = catalog.type_cost(structure.unit_type)[0] + (catalog.type_cost(structure.unit_type, True)[0] if structure.upgraded else 0)
+                self.SP[structure.owner] += round(cost * type_config.get("refundPercentage", 0) * max(0.0, structure.health) / stats.max_health, 1)
+                del self._structures[location]
+        economy = self._economy
+        next_turn = min(turn + 1, economy.MAX_TURNS)
+        for player_index in (0, 1):
+            self._scored[player_index] += scored[player_index]
+            self.SP[player_index] += economy.SP_income[next_turn] + economy.SP_for_damage * scored[player_index]
+            self.MP[player_index] = economy.next_MP(self.MP[player_index], next_turn)
+        return result.frame_count
+
+    def __finish(self, turn, frame, seconds):
+        """Works out the winner and sends the end game message
+
+        Returns:
+            The index of the winner
+
+        """
+        if self._crashed[0] != self._crashed[1]:
+            winner = 1 if self._crashed[0] else 0
+        elif self.health[0] != self.health[1]:
+            winner = 0 if self.health[0] > self.health[1] else 1
+        else:
+            winner = 1 if self._total_time[1] < self._total_time[0] else 0
+        state = self.__state([2, turn, frame])
+        state["endStats"] = {"winner": winner + 1, "turns": turn + 1, "frames": self._frames, "duration": int(seconds * 1000)}
+        for player_index in (0, 1):
+            state["endStats"]["player{}".format(player_index + 1)] = {
+                "name": self.names[player_index], "points_scored": self._scored[player_index], "crashed": self._crashed[player_index],
+                "total_computation_time": self._total_time[player_index], "stationary_resource_spent": round(self._spent[player_index][0], 1),
+                "dynamic_resource_spent": round(self._spent[player_index][1], 1)}
+        self.__publish(state)
+        return winner
+
+
+def _load_algo(spec):
+    """Creates an algo from a "module.Class" name, imported from the current folder"""
+    module_name, _, class_name = spec.rpartition(".")
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def main(args):
+    options = {"--config": None, "--replay": None, "--turns": "100", "--games": "1"}
+    for option in options:
+        if option in args:
+            index = args.index(option)
+            options[option] = args[index + 1]
+            args = args[:index] + args[index + 2:]
+    specs = (args + ["algo_strategy.AlgoStrategy"] * 2)[:2]
+    path = options["--config"] or os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "game-configs.json")
+    with open(path) as config_file:
+        config = json.load(config_file)
+    games = int(options["--games"])
+    started = time.perf_counter()
+    for game in range(games):
+        replay = options["--replay"]
+        if replay is not None and games > 1:
+            base, extension = os.path.splitext(replay)
+            replay = "{}-{}{}".format(base, game + 1, extension)
+        result = LocalMatch(config, _load_algo(specs[0]), _load_algo(specs[1]), replay, int(options["--turns"]), names=specs).play()
+        print("Game {}: player {} won after {} turns and {} frames, health {:.0f} to {:.0f}{}, {:.2f} s".format(
+            game + 1, result.winner + 1, result.turns, result.frames, result.health[0], result.health[1],
+            ", player {} crashed".format(result.crashed.index(True) + 1) if any(result.crashed) else "", result.seconds))
+    elapsed = time.perf_counter() - started
+    print("{} games in {:.1f} s, {:.1f} games per minute".format(games, elapsed, games * 60 / elapsed))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
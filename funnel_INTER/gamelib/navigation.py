@@ -3,6 +3,7 @@ import math
 import sys
 import queue
 from .util import debug_write
+from .game_map import CELL_LOCATIONS
 
 class Node:
     """A pathfinding node
@@ -71,9 +72,12 @@ class ShortestPathFinder:
         #Initialize map 
         self.initialize_map(game_state)
         #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        blocked = self.game_state.game_map.blocked_mask
+        while blocked:
+            lowest = blocked & -blocked
+            x, y = CELL_LOCATIONS[lowest.bit_length() - 1]
+            self.game_map[x][y].blocked = True
+            blocked ^= lowest
         #Do pathfinding
         ideal_endpoints = self._idealness_search(start_point, end_points)
         self._validate(ideal_endpoints, end_points)
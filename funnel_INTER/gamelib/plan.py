@@ -0,0 +1,314 @@
+from .game_map import CELL_ID, DEPLOY_CELLS, HALF_ARENA
+
+
+class BuildPlan:
+    """Spawns, upgrades and removals staged on top of a GameState without changing it.
+
+    Each action is checked against the board as the plan has left it and paid for from the
+    resources the plan has left, following the same rules as the GameState attempt functions.
+    Nothing reaches the GameState until commit, which adds the staged units to the map, deducts
+    what the plan spent and appends its commands to the build and deploy stacks. Used as a context
+    manager the plan commits when the block ends, unless it was aborted or an exception was raised:
+
+        with game_state.plan() as plan:
+            plan.spawn(WALL, walls)
+            plan.upgrade(walls)
+            if plan.SP < reserve:
+                plan.abort()
+
+    Do not change the GameState directly while a plan is open.
+
+    Attributes :
+        * game_state (:obj: GameState): The state the plan is staged on
+        * SP, MP (float): The resources left after the staged actions
+        * committed (bool): True once the plan has been committed
+        * aborted (bool): True once the plan has been aborted
+
+    """
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self.catalog = game_state.catalog
+        self.SP, self.MP = game_state.get_resources()
+        self.committed = False
+        self.aborted = False
+        self._spent = [0, 0]
+        self._structures = {}
+        self._upgrades = set()
+        self._removals = set()
+        self._mobiles = {}
+        self._build = []
+        self._deploy = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        elif not self.aborted and not self.committed:
+            self.commit()
+        return False
+
+    def cost(self):
+        """Gets what the staged actions cost
+
+        Returns:
+            [SP, MP] spent so far
+
+        """
+        return list(self._spent)
+
+    def build_stack(self):
+        """Gets the build commands commit would send, as (unit_type, x, y) tuples"""
+        return list(self._build)
+
+    def deploy_stack(self):
+        """Gets the deploy commands commit would send, as (unit_type, x, y) tuples"""
+        return list(self._deploy)
+
+    def number_affordable(self, unit_type, upgrade=False):
+        """The number of units of a given type, or upgrades of it, the plan can still afford
+
+        Args:
+            unit_type: A unit type, SCOUT, WALL, etc.
+            upgrade: If True, count upgrades instead
+
+        Returns:
+            The number affordable
+
+        """
+        SP_cost, MP_cost = self.catalog.type_cost(unit_type, upgrade)
+        affordable = []
+        if SP_cost > 0:
+            affordable.append(int(self.SP // SP_cost))
+        if MP_cost > 0:
+            affordable.append(int(self.MP // MP_cost))
+        return min(affordable) if affordable else 0
+
+    def structure_at(self, location):
+        """Gets the structure standing on a location once the staged actions are done
+
+        Args:
+            location: The location to check
+
+        Returns:
+            (unit_type, upgraded) of the structure, or None if there is none
+
+        """
+        cell = self.__cell(location)
+        if cell < 0:
+            return None
+        staged = self._structures.get(cell)
+        if staged is not None:
+            return staged, cell in self._upgrades
+        unit = self.__live_structure(location)
+        if not unit:
+            return None
+        return unit.unit_type, unit.upgraded or cell in self._upgrades
+
+    def can_spawn(self, unit_type, location, num=1):
+        """Check if the plan could still spawn units at a location, as GameState.can_spawn does for the live state
+
+        Args:
+            unit_type: The type of the unit
+            location: The location we want to spawn the unit
+            num: The number of units we want to spawn
+
+        Returns:
+            True if we can spawn the unit(s)
+
+        """
+        return self.__spawnable(unit_type, location, num) >= num
+
+    def spawn(self, unit_type, locations, num=1):
+        """Stages new units, like GameState.attempt_spawn
+
+        Args:
+            unit_type: The type of unit we want to spawn
+            locations: A single location or list of locations to spawn units at
+            num: The number of units of unit_type to deploy at the given location(s)
+
+        Returns:
+            The number of units staged
+
+        """
+        if not self.__open():
+            return 0
+        if unit_type not in self.catalog.ALL_UNITS:
+            self.game_state.warn("Invalid unit {}", unit_type)
+            return 0
+        if num < 1 or not locations:
+            self.game_state.warn("Attempted to spawn fewer than one units! ({})", num)
+            return 0
+        if type(locations[0]) == int:
+            locations = [locations]
+        stationary = self.catalog.is_stationary(unit_type)
+        SP_cost, MP_cost = self.catalog.type_cost(unit_type)
+        spawned_units = 0
+        for location in locations:
+            count = self.__spawnable(unit_type, location, num, warn=True)
+            if count == 0:
+                continue
+            x, y = int(location[0]), int(location[1])
+            cell = CELL_ID[x][y]
+            if stationary:
+                self._structures[cell] = unit_type
+                self._build.append((unit_type, x, y))
+            else:
+                self._mobiles[cell] = self._mobiles.get(cell, 0) + count
+                self._deploy.extend([(unit_type, x, y)] * count)
+            self.__pay(SP_cost * count, MP_cost * count)
+            spawned_units += count
+        return spawned_units
+
+    def upgrade(self, locations):
+        """Stages upgrades of structures, like GameState.attempt_upgrade
+
+        Args:
+            locations: A single location or list of locations to upgrade units at
+
+        Returns:
+            The number of upgrades staged
+
+        """
+        if not self.__open():
+            return 0
+        if not locations:
+            self.game_state.warn("Attempted to upgrade fewer than one units!")
+            return 0
+        if type(locations[0]) == int:
+            locations = [locations]
+        upgraded_units = 0
+        for location in locations:
+            cell = self.__cell(location)
+            structure = self.structure_at(location) if cell >= 0 and location[1] < HALF_ARENA else None
+            if structure is None:
+                self.game_state.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.", location)
+                continue
+            unit_type, upgraded = structure
+            if upgraded or not self.catalog.can_upgrade(unit_type):
+                continue
+            if cell not in self._structures:
+                unit = self.__live_structure(location)
+                if (unit.health / unit.max_health) < 0.8:
+                    continue
+            SP_cost, MP_cost = self.catalog.type_cost(unit_type, True)
+            if self.SP < SP_cost or self.MP < MP_cost:
+                continue
+            self._upgrades.add(cell)
+            self._build.append((self.catalog.UPGRADE, int(location[0]), int(location[1])))
+            self.__pay(SP_cost, MP_cost)
+            upgraded_units += 1
+        return upgraded_units
+
+    def remove(self, locations):
+        """Stages removals of your structures, like GameState.attempt_remove. A structure is only flagged once.
+
+        Args:
+            locations: A location or list of locations we want to remove structures from
+
+        Returns:
+            The number of structures flagged for removal
+
+        """
+        if not self.__open():
+            return 0
+        if type(locations[0]) == int:
+            locations = [locations]
+        removed_units = 0
+        for location in locations:
+            cell = self.__cell(location)
+            if cell < 0 or location[1] >= HALF_ARENA or self.structure_at(location) is None:
+                self.game_state.warn("Could not remove a unit from {}. Location has no structures or is enemy territory.", location)
+                continue
+            if cell not in self._removals:
+                self._removals.add(cell)
+                self._build.append((self.catalog.REMOVE, int(location[0]), int(location[1])))
+            removed_units += 1
+        return removed_units
+
+    def commit(self):
+        """Applies the plan to its GameState. The commands are sent with the rest of the turn by submit_turn."""
+        if not self.__open():
+            return
+        game_state = self.game_state
+        game_map = game_state.game_map
+        for unit_type, x, y in self._build:
+            if unit_type == self.catalog.UPGRADE:
+                for unit in game_map[x, y]:
+                    if unit.stationary:
+                        unit.upgrade()
+            elif unit_type != self.catalog.REMOVE:
+                game_map.add_unit(unit_type, [x, y], 0)
+        for unit_type, x, y in self._deploy:
+            game_map.add_unit(unit_type, [x, y], 0)
+        game_state._build_stack.extend(self._build)
+        game_state._deploy_stack.extend(self._deploy)
+        resources = game_state._player_resources[0]
+        resources['SP'] -= self._spent[0]
+        resources['MP'] -= self._spent[1]
+        self.committed = True
+
+    def abort(self):
+        """Drops every staged action. The GameState is left as it was."""
+        if self.committed:
+            self.game_state.warn("Can not abort a plan that was already committed")
+            return
+        self.aborted = True
+
+    def __open(self):
+        if self.committed or self.aborted:
+            self.game_state.warn("The plan was already {}", "committed" if self.committed else "aborted")
+            return False
+        return True
+
+    def __pay(self, SP, MP):
+        self.SP -= SP
+        self.MP -= MP
+        self._spent[0] += SP
+        self._spent[1] += MP
+
+    def __cell(self, location):
+        x, y = location
+        if not self.game_state.game_map.in_arena_bounds(location):
+            return -1
+        return CELL_ID[int(x)][int(y)]
+
+    def __live_structure(self, location):
+        x, y = int(location[0]), int(location[1])
+        if not self.game_state.game_map.has_structure([x, y]):
+            return False
+        for unit in self.game_state.game_map[x, y]:
+            if unit.stationary:
+                return unit
+        return False
+
+    def __spawnable(self, unit_type, location, num, warn=False):
+        """How many of num units could be staged at location"""
+        cell = self.__cell(location)
+        if cell < 0:
+            if warn:
+                self.game_state.warn("Could not spawn {} at location {}. Location invalid.", unit_type, location)
+            return 0
+        stationary = self.catalog.is_stationary(unit_type)
+        affordable = self.number_affordable(unit_type)
+        blocked = self.structure_at(location) is not None
+        if stationary and not blocked:
+            blocked = self._mobiles.get(cell, 0) > 0 or len(self.game_state.game_map[int(location[0]), int(location[1])]) > 0
+        correct_territory = location[1] < HALF_ARENA
+        # GameState.can_spawn looks locations up in lists of [x, y] lists, where a tuple is never found
+        on_edge = cell in DEPLOY_CELLS and not isinstance(location, tuple)
+        if warn and self.game_state.enable_warnings and (affordable == 0 or blocked or not correct_territory or not (stationary or on_edge)):
+            fail_reason = ""
+            if affordable == 0:
+                fail_reason = fail_reason + " Not enough resources."
+            if blocked:
+                fail_reason = fail_reason + " Location is blocked."
+            if not correct_territory:
+                fail_reason = fail_reason + " Location in enemy territory."
+            if not (stationary or on_edge):
+                fail_reason = fail_reason + " Information units must be deployed on the edge."
+            self.game_state.warn("Could not spawn {} at location {}.{}", unit_type, location, fail_reason)
+        if blocked or not correct_territory or not (stationary or on_edge):
+            return 0
+        return min(affordable, 1 if stationary else num)
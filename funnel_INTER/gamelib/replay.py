@@ -0,0 +1,205 @@
+"""
+Reading replay files and checking the Simulator against them.
+
+A .replay file holds one JSON object per line: the game config, then every frame of the match,
+the same lines scripts/contributions/get_results.py reads. For every turn, check_replay builds a
+GameState from frame 0 of the action phase, deploys the mobile units of that frame's spawn
+events, simulates the action phase and compares each predicted frame with the recorded one.
+Run it from the algo folder with:
+
+    python3 -m gamelib.replay path/to/match.replay [more.replay ...] [--config path/to/game-configs.json]
+
+"""
+import json
+import sys
+import time
+from collections import Counter, namedtuple
+
+from .catalog import UnitCatalog
+from .events import EventBatch
+from .game_state import GameState
+from .simulator import Simulator
+
+
+TurnCheck = namedtuple("TurnCheck", [
+    "turn", "frames", "predicted_frames", "position_errors", "health_error", "death_errors", "breach_errors", "first_divergence", "seconds"])
+TurnCheck.__doc__ = """How far the Simulator's action phase of one turn is from the recorded one.
+
+    frames and predicted_frames are the recorded and simulated frame counts, not counting frame 0.
+    position_errors counts the mobile units found in one of the two frames but not at the same place
+    in the other, summed over every frame. health_error sums the health differences of the units at
+    the same place. death_errors and breach_errors count the deaths and breaches found in one but not
+    the other. first_divergence is the first frame with any error, None if the turn matched. seconds
+    is the time spent building the Simulator and running it.
+    """
+
+
+class Replay:
+    """The frames of a recorded match, grouped by turn
+
+    Attributes :
+        * config (JSON): The config line of the replay, None if it has none
+        * turns (dict): The action phase of every turn, the decoded frames in order, by turn number
+
+    """
+    def __init__(self, lines):
+        """Reads replay lines
+
+        Args:
+            lines: The lines of a replay, such as an open .replay file
+
+        """
+        self.config = None
+        self.turns = {}
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            data = json.loads(line)
+            if "turnInfo" not in data:
+                self.config = data
+            elif data["turnInfo"][0] == 1:
+                self.turns.setdefault(int(data["turnInfo"][1]), []).append(data)
+        for frames in self.turns.values():
+            frames.sort(key=lambda frame: frame["turnInfo"][2])
+
+    @classmethod
+    def load(cls, path):
+        """Reads a .replay file"""
+        with open(path) as replay_file:
+            return cls(replay_file)
+
+
+def _mobiles(frame, catalog):
+    """Gets (unit_type, player_index, x, y) -> sorted healths of the mobile units of a recorded frame"""
+    units = {}
+    for player_index, key in ((0, "p1Units"), (1, "p2Units")):
+        for unit_type in (catalog.SCOUT, catalog.DEMOLISHER, catalog.INTERCEPTOR):
+            for entry in frame[key][catalog.UNIT_TYPE_TO_INDEX[unit_type]]:
+                units.setdefault((unit_type, player_index, int(entry[0]), int(entry[1])), []).append(float(entry[2]))
+    return units
+
+
+def _events(frame, kind, catalog):
+    """Gets the events of one kind as a Counter of (unit_type, player_index, x, y)"""
+    batch = EventBatch(kind, 0, 0, frame["events"].get(kind, []))
+    return Counter((catalog.shorthands[batch.unit_type[index]], batch.owner[index], batch.x[index], batch.y[index]) for index in range(len(batch)))
+
+
+def _difference(first, second):
+    """Counts the entries of two Counters found in only one of them"""
+    return sum((first - second).values()) + sum((second - first).values())
+
+
+def check_turn(config, frames, catalog=None):
+    """Simulates one recorded action phase and compares it with the recording
+
+    Args:
+        config (JSON): The config of the game
+        frames: The decoded frames of the turn's action phase, frame 0 first
+        catalog (:obj: UnitCatalog): The catalog compiled from config. Looked up with UnitCatalog.for_config if None
+
+    Returns:
+        A TurnCheck
+
+    """
+    catalog = catalog or UnitCatalog.for_config(config)
+    seed = frames[0]
+    spawns = _events(seed, "spawn", catalog)
+    deploys = ([], [])
+    for (unit_type, player_index, x, y), count in sorted(spawns.items()):
+        if unit_type in (catalog.SCOUT, catalog.DEMOLISHER, catalog.INTERCEPTOR):
+            deploys[player_index].extend([(unit_type, x, y)] * count)
+
+    start = time.perf_counter()
+    game_state = GameState(config, seed, catalog)
+    game_state.suppress_warnings(True)
+    result = Simulator(game_state).run(deploys[0], deploys[1])
+    seconds = time.perf_counter() - start
+
+    recorded = frames[1:]
+    position_errors = death_errors = breach_errors = 0
+    health_error = 0.0
+    first_divergence = None
+    for number in range(1, max(len(recorded), result.frame_count) + 1):
+        if number <= len(recorded):
+            frame = recorded[number - 1]
+            actual = _mobiles(frame, catalog)
+            actual_deaths = _events(frame, "death", catalog)
+            batch = EventBatch("breach", 0, 0, frame["events"].get("breach", []))
+            actual_breaches = Counter((batch.x[index], batch.y[index], batch.owner[index]) for index in range(len(batch)))
+        else:
+            actual, actual_deaths, actual_breaches = {}, Counter(), Counter()
+        predicted = {}
+        predicted_deaths, predicted_breaches = Counter(), Counter()
+        if number <= len(result.frames):
+            simulated = result.frames[number - 1]
+            for unit_type, player_index, x, y, health in simulated.mobiles:
+                predicted.setdefault((unit_type, player_index, x, y), []).append(health)
+            predicted_deaths = Counter(simulated.deaths)
+            predicted_breaches = Counter(simulated.breaches)
+
+        positions = _difference(Counter({key: len(healths) for key, healths in actual.items()}),
+                                Counter({key: len(healths) for key, healths in predicted.items()}))
+        health = 0.0
+        for key in actual.keys() & predicted.keys():
+            health += sum(abs(first - second) for first, second in zip(sorted(actual[key]), sorted(predicted[key])))
+        deaths = _difference(actual_deaths, predicted_deaths)
+        breaches = _difference(actual_breaches, predicted_breaches)
+        if first_divergence is None and (positions or deaths or breaches or health > 1e-6):
+            first_divergence = number
+        position_errors += positions
+        health_error += health
+        death_errors += deaths
+        breach_errors += breaches
+
+    return TurnCheck(int(seed["turnInfo"][1]), len(recorded), result.frame_count, position_errors, health_error,
+                     death_errors, breach_errors, first_divergence, seconds)
+
+
+def check_replay(replay, config=None):
+    """Checks every turn of a replay
+
+    Args:
+        replay: A Replay
+        config (JSON): The config of the game. The replay's own config if None
+
+    Returns:
+        A TurnCheck for every turn with a frame 0, in turn order
+
+    """
+    config = config or replay.config
+    if config is None:
+        raise ValueError("The replay has no config line, pass one")
+    catalog = UnitCatalog.for_config(config)
+    return [check_turn(config, replay.turns[turn], catalog) for turn in sorted(replay.turns) if replay.turns[turn][0]["turnInfo"][2] == 0]
+
+
+def report(name, checks):
+    """Prints a line per turn and the totals of a replay's checks"""
+    print(name)
+    print("{:>6} {:>8} {:>10} {:>10} {:>10} {:>8} {:>9} {:>10} {:>10}".format(
+        "turn", "frames", "predicted", "positions", "health", "deaths", "breaches", "diverges", "ms"))
+    for check in checks:
+        print("{:>6} {:>8} {:>10} {:>10} {:>10.1f} {:>8} {:>9} {:>10} {:>10.2f}".format(
+            check.turn, check.frames, check.predicted_frames, check.position_errors, check.health_error, check.death_errors,
+            check.breach_errors, "-" if check.first_divergence is None else check.first_divergence, check.seconds * 1e3))
+    frames = sum(check.predicted_frames for check in checks)
+    seconds = sum(check.seconds for check in checks)
+    print("{} of {} turns matched, {} frames simulated in {:.3f} s, {:.0f} frames per second".format(
+        sum(check.first_divergence is None for check in checks), len(checks), frames, seconds, frames / seconds if seconds else 0))
+
+
+def main(args):
+    config = None
+    if "--config" in args:
+        index = args.index("--config")
+        with open(args[index + 1]) as config_file:
+            config = json.load(config_file)
+        args = args[:index] + args[index + 2:]
+    for path in args:
+        report(path, check_replay(Replay.load(path), config))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
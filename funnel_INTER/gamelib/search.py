@@ -0,0 +1,263 @@
+"""
+A time-budgeted lookahead over the defenses and attacks of the next few turns.
+
+Every turn the search picks one defense option, structures to spawn, upgrade or remove, and one
+attack option, mobile units to deploy. It plays the turn out on a fork of the state: the defense
+is built, the action phase is simulated against the attack expected from the enemy, the
+structures that died are removed, and both players' resources are moved to the next turn with
+the Economy projector, including the SP earned for the damage dealt. Each resulting state is
+scored, and the best beam_width states of a turn are searched further.
+
+The search is anytime. It searches one turn deeper at a time and returns the best plan of the
+deepest turn it finished once its time runs out, so it can be given whatever is left of the turn:
+
+    search = LookaheadSearch(game_state, defenses, attacks, enemy_deploys=[(SCOUT, 14, 27)] * 5)
+    result = search.run(time_budget=1.0)
+    if result.plan:
+        apply_choice(game_state, result.plan[0])
+
+Options are tried in an order shuffled by a seeded random.Random, so a search that runs out of
+time has sampled every option evenly and a search with the same seed always gives the same plan.
+
+"""
+import random
+import time
+from collections import namedtuple
+
+from .economy import Economy
+from .simulator import Simulator
+
+
+Option = namedtuple("Option", ["name", "commands"])
+Option.__doc__ = """One choice the search can make on a turn.
+
+    commands are (unit_type, x, y) entries like the build and deploy stacks of a GameState. A
+    defense uses structure types, UPGRADE and REMOVE, an attack uses mobile unit types.
+    """
+
+TurnChoice = namedtuple("TurnChoice", ["defense", "attack"])
+TurnChoice.__doc__ = """The defense Option and attack Option chosen for one turn."""
+
+SearchResult = namedtuple("SearchResult", ["plan", "score", "depth", "nodes", "complete", "seconds"])
+SearchResult.__doc__ = """What a search found.
+
+    plan holds a TurnChoice for each turn from the current one, empty if no turn was searched in
+    time. score is the score of the state the plan ends in. depth is the number of turns searched
+    completely, 0 if the plan comes from a partly searched first turn. nodes counts the states
+    scored. complete is True if the search reached its full depth or every state it kept was over.
+    """
+
+HOLD = Option("hold", ())
+
+# The score of a state where one player has lost all their health
+_GAME_OVER = 1000.0
+
+_Node = namedtuple("_Node", ["state", "SP", "MP", "enemy_SP", "enemy_MP", "structure_value", "plan", "score"])
+
+
+def _build(game_state, commands):
+    """Stages the commands of an option on a state
+
+    Returns:
+        True if every command was accepted
+
+    """
+    catalog = game_state.catalog
+    for unit_type, x, y in commands:
+        if unit_type == catalog.UPGRADE:
+            placed = game_state.attempt_upgrade([x, y])
+        elif unit_type == catalog.REMOVE:
+            placed = game_state.attempt_remove([x, y])
+        else:
+            placed = game_state.attempt_spawn(unit_type, [x, y])
+        if not placed:
+            return False
+    return True
+
+
+def apply_choice(game_state, choice):
+    """Stages a TurnChoice on the real state of the turn, defense first
+
+    Args:
+        game_state: The GameState of the turn
+        choice: A TurnChoice, such as the first of a SearchResult's plan
+
+    Returns:
+        True if every command was accepted
+
+    """
+    return _build(game_state, choice.defense.commands) and _build(game_state, choice.attack.commands)
+
+
+class LookaheadSearch:
+    """A beam search over the defense and attack options of the coming turns
+
+    A state is scored by your health minus the enemy's, plus resource_weight for every SP and MP you
+    hold and structure_weight for every SP of structures you have gained over the enemy since the
+    search started, by building or by destroying theirs.
+
+    Attributes :
+        * game_state (:obj: GameState): The state the search starts from, left unchanged
+        * defenses, attacks (list): The Options tried every turn. HOLD, doing nothing, is always tried first
+        * enemy_deploys (list): The (unit_type, x, y) the enemy is expected to deploy every turn
+        * depth (int): The most turns to search
+        * beam_width (int): The states kept after each turn
+        * seed (int): The seed of the option order
+        * resource_weight, structure_weight (float): See above
+
+    """
+    def __init__(self, game_state, defenses, attacks, enemy_deploys=(), depth=3, beam_width=4, seed=0,
+                 resource_weight=0.1, structure_weight=0.2):
+        """Sets up a search. Nothing is simulated until run.
+
+        Args:
+            game_state: The GameState of the turn, with anything already staged this turn
+            defenses: The defense Options
+            attacks: The attack Options
+            enemy_deploys: The enemy's expected deploys, used on every turn searched
+            depth: The most turns to search
+            beam_width: The states kept after each turn
+            seed: The seed of the option order
+            resource_weight: The score of one SP or MP held
+            structure_weight: The score of one SP of structures gained over the enemy
+
+        """
+        self.game_state = game_state
+        self.defenses = [HOLD] + [option for option in defenses if option != HOLD]
+        self.attacks = [HOLD] + [option for option in attacks if option != HOLD]
+        self.enemy_deploys = list(enemy_deploys)
+        self.depth = depth
+        self.beam_width = beam_width
+        self.seed = seed
+        self.resource_weight = resource_weight
+        self.structure_weight = structure_weight
+        self._economy = Economy.for_config(game_state.config)
+        catalog = game_state.catalog
+        self._enemy_MP_cost = sum(catalog.type_cost(unit_type)[game_state.MP] for unit_type, _, _ in self.enemy_deploys)
+
+    def run(self, time_budget=None, should_stop=None):
+        """Searches until the full depth is reached or the time runs out
+
+        Args:
+            time_budget: The seconds the search may take. Unlimited if None
+            should_stop: A function checked between expansions, the search stops once it returns True.
+                         IdleContext's cancelled, for example, when searching during the action phase
+
+        Returns:
+            A SearchResult
+
+        """
+        start = time.perf_counter()
+        deadline = None if time_budget is None else start + time_budget
+        self._rng = random.Random(self.seed)
+        # The longest a single expansion has taken, the search stops when the next one might not fit
+        self._expansion = 0.0
+        self._nodes = 0
+        game_state = self.game_state
+        SP, MP = game_state.get_resources(0)
+        enemy_SP, enemy_MP = game_state.get_resources(1)
+        beam = [_Node(game_state, SP, MP, enemy_SP, enemy_MP, 0.0, (), self.__score(game_state.my_health, game_state.enemy_health, SP, MP, 0.0))]
+
+        best = None
+        depth = 0
+        complete = False
+        while not complete:
+            children, finished = self.__expand_all(beam, deadline, should_stop)
+            if not finished:
+                if best is None and children:
+                    best = max(children, key=lambda node: node.score)
+                break
+            if not children:
+                complete = True
+                break
+            children.sort(key=lambda node: node.score, reverse=True)
+            beam = children[:self.beam_width]
+            best = beam[0]
+            depth += 1
+            # Nothing is left to search once every state kept is over
+            complete = depth == self.depth or all(self.__over(node) for node in beam)
+
+        plan, score = (best.plan, best.score) if best is not None else ((), None)
+        return SearchResult(plan, score, depth, self._nodes, complete, time.perf_counter() - start)
+
+    def __expand_all(self, beam, deadline, should_stop):
+        """Expands every state of the beam that is not over
+
+        Returns:
+            (children, finished), finished being False if the time ran out first
+
+        """
+        children = []
+        for node in beam:
+            if self.__over(node):
+                continue
+            defenses = list(self.defenses)
+            self._rng.shuffle(defenses)
+            for defense in defenses:
+                if (deadline is not None and time.perf_counter() + self._expansion > deadline) or (should_stop is not None and should_stop()):
+                    return children, False
+                started = time.perf_counter()
+                children.extend(self.__expand(node, defense))
+                self._expansion = max(self._expansion, time.perf_counter() - started)
+        return children, True
+
+    def __expand(self, node, defense):
+        """Builds a defense on a state and plays out every affordable attack against it
+
+        Returns:
+            The resulting nodes, none if the defense could not be built
+
+        """
+        game_state = node.state.fork()
+        game_state.suppress_warnings(True)
+        resources = game_state._player_resources
+        resources[0]['SP'], resources[0]['MP'] = node.SP, node.MP
+        resources[1]['SP'], resources[1]['MP'] = node.enemy_SP, node.enemy_MP
+        game_state._build_stack = []
+        game_state._deploy_stack = []
+        if not _build(game_state, defense.commands):
+            return []
+        SP, MP = game_state.get_resources(0)
+        built = node.SP - SP
+
+        catalog = game_state.catalog
+        attacks = [attack for attack in self.attacks
+                   if sum(catalog.type_cost(unit_type)[game_state.MP] for unit_type, _, _ in attack.commands) <= MP
+                   and all(game_state.can_spawn(unit_type, [x, y]) for unit_type, x, y in attack.commands)]
+        self._rng.shuffle(attacks)
+        results = Simulator(game_state).run_many([(list(attack.commands), self.enemy_deploys) for attack in attacks], record=True)
+
+        nodes = []
+        economy = self._economy
+        turn = game_state.turn_number
+        enemy_MP = max(0.0, node.enemy_MP - self._enemy_MP_cost)
+        for attack, result in zip(attacks, results):
+            next_state = game_state.fork()
+            structure_value = node.structure_value + built
+            for frame in result.frames:
+                for unit_type, player_index, x, y in frame.deaths:
+                    if catalog.is_stationary(unit_type):
+                        next_state.game_map.remove_unit([x, y])
+                        cost = catalog.type_cost(unit_type)[game_state.SP]
+                        structure_value += cost if player_index == 1 else -cost
+            MP_left = MP - sum(catalog.type_cost(unit_type)[game_state.MP] for unit_type, _, _ in attack.commands)
+            mine = economy.project(turn, SP, MP_left, 1, damage=result.breaches[0])
+            theirs = economy.project(turn, node.enemy_SP, enemy_MP, 1, damage=result.breaches[1])
+            next_state.turn_number = turn + 1
+            next_state.my_health, next_state.enemy_health = result.health
+            self._nodes += 1
+            nodes.append(_Node(next_state, mine.SP[1], mine.MP[1], theirs.SP[1], theirs.MP[1], structure_value,
+                               node.plan + (TurnChoice(defense, attack),),
+                               self.__score(result.health[0], result.health[1], mine.SP[1], mine.MP[1], structure_value)))
+        return nodes
+
+    def __score(self, my_health, enemy_health, SP, MP, structure_value):
+        score = my_health - enemy_health + self.resource_weight * (SP + MP) + self.structure_weight * structure_value
+        if enemy_health <= 0:
+            score += _GAME_OVER
+        if my_health <= 0:
+            score -= _GAME_OVER
+        return score
+
+    def __over(self, node):
+        return node.state.my_health <= 0 or node.state.enemy_health <= 0
@@ -0,0 +1,171 @@
+"""
+Shared memory boards for evaluating moves in worker processes.
+
+The main process publishes the turn's GameState once, encoded with GameState.to_bytes, into a
+block of shared memory. A task sent to a worker then only carries the board's handle, a
+(name, generation) pair, instead of a pickled GameState. Each worker decodes a generation the
+first time one of its tasks asks for it and hands every task its own fork of that state, so tasks
+can spawn and remove units freely without touching the shared board or each other.
+
+    board = SharedBoard()
+    handle = board.publish(game_state)
+    results = pool.map(evaluate, [(handle, candidate) for candidate in candidates])
+
+    def evaluate(task):
+        handle, candidate = task
+        game_state = board_state(config, handle)
+        ...
+
+"""
+import struct
+from multiprocessing import shared_memory
+
+from .game_state import GameState
+from . import log
+
+
+# Generation of the board and length of its encoding, written before the encoding
+_HEADER = struct.Struct("<QI")
+
+
+class SharedBoard:
+    """A GameState published in shared memory, owned by the process that created it
+
+    Attributes :
+        * name (str): The name workers attach to
+        * generation (int): How many times a state was published, 0 before the first
+
+    """
+    DEFAULT_SIZE = 1 << 16
+
+    def __init__(self, size=DEFAULT_SIZE):
+        """Creates the shared memory block
+
+        Args:
+            size: The bytes to reserve. The block is replaced by a larger one if a state does not fit
+
+        """
+        self._memory = shared_memory.SharedMemory(create=True, size=size)
+        self.generation = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def handle(self):
+        """Gets what a task needs to find the last published state: (name, generation)"""
+        return self.name, self.generation
+
+    def publish(self, game_state):
+        """Writes a state to the block, replacing the one published before
+
+        Do not publish while workers may still be reading the previous generation.
+
+        Args:
+            game_state: The GameState to share, with the units it staged this turn
+
+        Returns:
+            The handle of the new generation. Its name changes when the block had to be replaced
+
+        """
+        data = game_state.to_bytes()
+        needed = _HEADER.size + len(data)
+        if needed > self._memory.size:
+            size = self._memory.size
+            while size < needed:
+                size *= 2
+            self.close()
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+        buffer = self._memory.buf
+        # Generation 0 marks the block as being written until the encoding is complete
+        _HEADER.pack_into(buffer, 0, 0, 0)
+        buffer[_HEADER.size:needed] = data
+        self.generation += 1
+        _HEADER.pack_into(buffer, 0, self.generation, len(data))
+        return self.handle()
+
+    def close(self):
+        """Frees the block. Workers still attached keep their mapping until they detach."""
+        self._memory.close()
+        self._memory.unlink()
+
+
+class BoardReader:
+    """A worker's read-only view of a SharedBoard. Use board_state instead of creating one directly."""
+    def __init__(self, name):
+        self.name = name
+        self.generation = None
+        self._memory = shared_memory.SharedMemory(name=name)
+        self._state = None
+
+    def state(self, config, generation, catalog=None):
+        """Gets a private copy of a published generation
+
+        Args:
+            config (JSON): The config of the game
+            generation: The generation from the task's handle
+            catalog (:obj: UnitCatalog): The catalog compiled from config. Looked up with UnitCatalog.for_config if None
+
+        Returns:
+            A fork of the published GameState, or None if the board holds another generation
+
+        """
+        if generation != self.generation:
+            buffer = self._memory.buf
+            published, length = _HEADER.unpack_from(buffer, 0)
+            data = bytes(buffer[_HEADER.size:_HEADER.size + length]) if published == generation else None
+            if data is None or _HEADER.unpack_from(buffer, 0)[0] != generation:
+                log.warning("Shared board {} holds generation {}, not {}", self.name, published, generation)
+                return None
+            self._state = GameState.from_bytes(config, data, catalog)
+            self.generation = generation
+        return self._state.fork()
+
+    def close(self):
+        self._state = None
+        self._memory.close()
+
+
+_reader = None
+
+
+def board_state(config, handle, catalog=None):
+    """Gets a GameState of a published board for one task, inside a worker process
+
+    The worker stays attached to one board at a time and decodes each generation once. Every call
+    returns a new fork of it, see GameState.fork.
+
+    Args:
+        config (JSON): The config of the game
+        handle: The (name, generation) from SharedBoard.publish
+        catalog (:obj: UnitCatalog): The catalog compiled from config. Looked up with UnitCatalog.for_config if None
+
+    Returns:
+        The GameState, or None if the board has moved on to another generation or was closed
+
+    """
+    global _reader
+    name, generation = handle
+    if _reader is None or _reader.name != name:
+        detach()
+        try:
+            _reader = BoardReader(name)
+        except FileNotFoundError:
+            log.warning("Shared board {} no longer exists", name)
+            return None
+    return _reader.state(config, generation, catalog)
+
+
+def detach():
+    """Closes the worker's view of the board it was attached to, if any"""
+    global _reader
+    if _reader is not None:
+        _reader.close()
+        _reader = None
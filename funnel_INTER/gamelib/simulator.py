@@ -0,0 +1,484 @@
+"""
+A frame by frame simulation of the action phase.
+
+Every frame runs the same steps as the engine, in the same order:
+
+    1. Supports shield the friendly mobile units in their range that they have not shielded yet,
+       by shieldPerUnit plus shieldBonusPerY for every row the support stands forward of its edge.
+    2. Mobile units move once every 1 / speed frames along the path to their target edge. A unit
+       that reaches its target edge breaches, and one that can go no further self destructs,
+       damaging the enemy units around it if it walked at least selfDestructStepsRequired steps.
+    3. Every unit attacks the target GameState.get_target would choose, dealing attackDamageWalker
+       to mobile units and attackDamageTower to structures.
+    4. Units without health are removed. Paths are found again once a structure is destroyed.
+
+Shields are added to health, as the engine does. Units removed in step 4 still attack in the frame
+they die in, but are never chosen as a target once their health is gone.
+
+    result = Simulator(game_state).run(enemy_deploys=[(SCOUT, 13, 27)] * 5)
+    if result.breaches[0] > result.breaches[1]:
+        ...
+
+"""
+from collections import namedtuple
+
+from .game_map import CELL_ID, CELL_LOCATIONS, NUM_CELLS, HALF_ARENA, ARENA_SIZE, squared_distance_table, squared_range_limit
+
+
+SimulationFrame = namedtuple("SimulationFrame", ["frame", "mobiles", "breaches", "deaths", "units", "structures"])
+SimulationFrame.__doc__ = """What happened during one frame of a simulation.
+
+    mobiles holds (unit_type, player_index, x, y, health) for every mobile unit left at the end of
+    the frame, and units holds the position of each of them in the deploys, yours first and then
+    the enemy's. structures holds (unit_type, player_index, x, y, health) for every structure that
+    took damage during the frame, with its health at the end of it. breaches holds (x, y, player_index) for every unit that scored, player_index being
+    its owner. deaths holds (unit_type, player_index, x, y) for every unit removed, including the
+    ones that self destructed.
+    """
+
+SimulationResult = namedtuple("SimulationResult", [
+    "frames", "frame_count", "breaches", "health", "structures_destroyed", "structure_damage", "mobiles_lost"])
+SimulationResult.__doc__ = """The outcome of a simulated action phase.
+
+    Every list is indexed by player, 0 for you and 1 for the enemy. breaches is the health damage
+    each player's units dealt by scoring, and health is each player's health at the end.
+    structures_destroyed and structure_damage count the structures each player lost and the damage
+    they took. mobiles_lost counts the mobile units each player lost without scoring. frames holds a
+    SimulationFrame per frame, or is empty if the simulation did not record them.
+    """
+
+# The cells in range of every cell as bitmasks, by squared range limit. Filled in as cells are used
+_reach_tables = {}
+
+
+def _reach_table(radius):
+    limit = squared_range_limit(radius)
+    table = _reach_tables.get(limit)
+    if table is None:
+        table = [None] * NUM_CELLS
+        _reach_tables[limit] = table
+    return table
+
+
+def _reach(game_map, table, cell, radius):
+    """Gets the cells in range of a cell as a bitmask, where bit n is set if packed cell n is in range"""
+    mask = table[cell]
+    if mask is None:
+        mask = 0
+        for other in game_map.cells_in_range(cell, radius):
+            mask |= 1 << other
+        table[cell] = mask
+    return mask
+
+
+def _cells(mask):
+    """Yields the cells of a bitmask, lowest first"""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def _edge_cells(game_map):
+    return [frozenset(CELL_ID[x][y] for x, y in edge) for edge in game_map.get_edges()]
+
+
+def _target_key(player_index, distance, health, x, y):
+    """Orders targets like GameState.get_target: nearest, then lowest health, then furthest back, then furthest from the middle"""
+    return distance, health, y if player_index == 0 else -y, -abs(HALF_ARENA - 0.5 - x)
+
+
+class Simulator:
+    """Simulates the action phase that follows a turn, from a GameState and the units both players deploy
+
+    A Simulator reads the board once and can then run many times, for example once per candidate attack,
+    every run starting from the same board. run_many steps a batch of such scenarios in lock step: their
+    state is kept in parallel lists, one entry per unit across every scenario, and whatever is the same
+    for all of them, such as which turrets have an enemy in range in any scenario, is worked out once per
+    frame instead of once per scenario. Paths are looked up in the GameState's path cache, so runs share them.
+
+    Attributes :
+        * game_state (:obj: GameState): The state the simulation starts from, left unchanged
+        * max_frames (int): The most frames a run may last
+
+    """
+    def __init__(self, game_state, max_frames=1000):
+        """Reads the structures and mobile units of a state
+
+        Args:
+            game_state: The GameState, including the structures and units staged this turn
+            max_frames: The most frames a run may last
+
+        """
+        self.game_state = game_state
+        self.max_frames = max_frames
+        catalog = game_state.catalog
+        game_map = game_state.game_map
+        self._catalog = catalog
+        self._hit_radius = catalog.get_hit_radius
+        self._distances = squared_distance_table()
+        self._edges = _edge_cells(game_map)
+
+        unit_information = game_state.config["unitInformation"]
+        # (steps required, damage to mobile units, damage to structures, range, breach damage) by unit type
+        self._mobile_rules = {}
+        for index, type_config in enumerate(unit_information):
+            if type_config.get("unitCategory") == 1:
+                self._mobile_rules[catalog.shorthands[index]] = (
+                    type_config.get("selfDestructStepsRequired", 0), type_config.get("selfDestructDamageWalker", 0),
+                    type_config.get("selfDestructDamageTower", 0), type_config.get("selfDestructRange", 0),
+                    type_config.get("playerBreachDamage", 1))
+
+        # The structures in packed cell order, in parallel lists
+        self._structure_stats = []
+        self._structure_owner = []
+        self._structure_cell = []
+        self._structure_health = []
+        self._structure_index = {}
+        self._structure_masks = [0, 0]
+        self._mobiles = []
+        occupied = game_map.occupied_mask
+        while occupied:
+            lowest = occupied & -occupied
+            cell = lowest.bit_length() - 1
+            occupied ^= lowest
+            x, y = CELL_LOCATIONS[cell]
+            for unit in game_map[x, y]:
+                if unit.stationary:
+                    self._structure_index[cell] = len(self._structure_stats)
+                    self._structure_stats.append(unit.stats)
+                    self._structure_owner.append(unit.player_index)
+                    self._structure_cell.append(cell)
+                    self._structure_health.append(unit.health)
+                    self._structure_masks[unit.player_index] |= 1 << cell
+                else:
+                    self._mobiles.append((unit.stats, unit.player_index, x, y, unit.health))
+
+        # (structure, cells in range) of the structures that attack, and (structure, cells in range, shield) of the supports
+        self._attackers = []
+        self._supports = []
+        for index, stats in enumerate(self._structure_stats):
+            cell = self._structure_cell[index]
+            if stats.damage_i > 0 or stats.damage_f > 0:
+                radius = stats.attackRange + self._hit_radius
+                self._attackers.append((index, _reach(game_map, _reach_table(radius), cell, radius)))
+            if stats.shieldPerUnit > 0 or stats.shieldBonusPerY > 0:
+                radius = stats.shieldRange + self._hit_radius
+                y = CELL_LOCATIONS[cell][1]
+                rows_forward = y if self._structure_owner[index] == 0 else ARENA_SIZE - 1 - y
+                self._supports.append((index, _reach(game_map, _reach_table(radius), cell, radius), stats.shieldPerUnit + stats.shieldBonusPerY * rows_forward))
+
+    def run(self, my_deploys=None, enemy_deploys=None, record=True):
+        """Simulates the action phase
+
+        Args:
+            my_deploys: Your (unit_type, x, y) deploys. Your mobile units on the map if None, which
+                        includes the ones spawned this turn through attempt_spawn
+            enemy_deploys: The enemy's (unit_type, x, y) deploys. The enemy mobile units on the map if None
+            record: If False, frames is left empty, which saves a little time
+
+        Returns:
+            A SimulationResult
+
+        """
+        return self.run_many([(my_deploys, enemy_deploys)], record)[0]
+
+    def run_many(self, scenarios, record=False):
+        """Simulates the action phase for many pairs of deploys at once. Each gets the result run would give it.
+
+        Args:
+            scenarios: A list of (my_deploys, enemy_deploys), see run
+            record: If True, the results hold every frame
+
+        Returns:
+            A SimulationResult for each scenario
+
+        """
+        batch = _Batch(self, scenarios, record)
+        while batch.active and batch.frame < self.max_frames:
+            batch.step()
+        return batch.results()
+
+
+class _Batch:
+    """The scenarios of one Simulator.run_many call. Mobile units are indexed across every scenario."""
+    def __init__(self, simulator, scenarios, record):
+        self.simulator = simulator
+        self.record = record
+        self.frame = 0
+        game_state = simulator.game_state
+        catalog = simulator._catalog
+        count = len(scenarios)
+
+        # By scenario
+        self.structure_health = [list(simulator._structure_health) for _ in range(count)]
+        self.standing = [list(simulator._structure_masks) for _ in range(count)]
+        self.states = [None] * count
+        self.health = [[float(game_state.my_health), float(game_state.enemy_health)] for _ in range(count)]
+        self.breaches = [[0, 0] for _ in range(count)]
+        self.structures_destroyed = [[0, 0] for _ in range(count)]
+        self.structure_damage = [[0.0, 0.0] for _ in range(count)]
+        self.mobiles_lost = [[0, 0] for _ in range(count)]
+        self.frames = [[] for _ in range(count)]
+        self.frame_count = [0] * count
+        self.live = []
+
+        # By mobile unit
+        self.stats, self.owner, self.x, self.y, self.cell, self.unit_health, self.edge = [], [], [], [], [], [], []
+        self.path, self.path_step, self.progress, self.moved, self.shielded, self.gone = [], [], [], [], [], []
+        # The index of the first mobile unit of each scenario
+        self.first = []
+        for my_deploys, enemy_deploys in scenarios:
+            self.first.append(len(self.stats))
+            indices = []
+            for player_index, deploys in ((0, my_deploys), (1, enemy_deploys)):
+                if deploys is None:
+                    units = [(stats, x, y, health) for stats, owner, x, y, health in simulator._mobiles if owner == player_index]
+                else:
+                    units = [(catalog.unit_stats(unit_type), int(x), int(y), None) for unit_type, x, y in deploys]
+                for stats, x, y, health in units:
+                    indices.append(len(self.stats))
+                    self.stats.append(stats)
+                    self.owner.append(player_index)
+                    self.x.append(x)
+                    self.y.append(y)
+                    self.cell.append(CELL_ID[x][y])
+                    self.unit_health.append(stats.max_health if health is None else health)
+                    self.edge.append(game_state.get_target_edge([x, y]))
+                    self.path.append(None)
+                    self.path_step.append(0)
+                    self.progress.append(0.0)
+                    self.moved.append(0)
+                    self.shielded.append(set())
+                    self.gone.append(False)
+            self.live.append(indices)
+        self.active = [scenario for scenario in range(count) if self.live[scenario]]
+
+    def results(self):
+        for scenario in self.active:
+            self.frame_count[scenario] = self.frame
+        return [SimulationResult(self.frames[scenario], self.frame_count[scenario], self.breaches[scenario], self.health[scenario],
+                                 self.structures_destroyed[scenario], self.structure_damage[scenario], self.mobiles_lost[scenario])
+                for scenario in range(len(self.frames))]
+
+    def step(self):
+        """Plays one frame of every scenario that still has mobile units"""
+        self.frame += 1
+        count = len(self.frames)
+        self.new_breaches = [None] * count
+        self.deaths = [None] * count
+        self.damaged = [None] * count
+        for scenario in self.active:
+            self.new_breaches[scenario] = []
+            self.deaths[scenario] = []
+            self.damaged[scenario] = []
+        self.__shield()
+        self.__move()
+        self.__attack()
+        self.__remove()
+
+    def __shield(self):
+        simulator = self.simulator
+        owner, cell, health, shielded = self.owner, self.cell, self.unit_health, self.shielded
+        for index, reach, amount in simulator._supports:
+            player_index = simulator._structure_owner[index]
+            support_cell = simulator._structure_cell[index]
+            for scenario in self.active:
+                if not self.standing[scenario][player_index] >> support_cell & 1 or self.structure_health[scenario][index] <= 0:
+                    continue
+                for unit in self.live[scenario]:
+                    if owner[unit] == player_index and reach >> cell[unit] & 1 and index not in shielded[unit]:
+                        shielded[unit].add(index)
+                        health[unit] += amount
+
+    def __move(self):
+        simulator = self.simulator
+        edges = simulator._edges
+        rules = simulator._mobile_rules
+        stats, owner, x, y, cell, health = self.stats, self.owner, self.x, self.y, self.cell, self.unit_health
+        path, path_step, progress, gone = self.path, self.path_step, self.progress, self.gone
+        for scenario in self.active:
+            for unit in self.live[scenario]:
+                if health[unit] <= 0:
+                    continue
+                progress[unit] += stats[unit].speed
+                if progress[unit] < 1 - 1e-9:
+                    continue
+                progress[unit] -= 1
+                if path[unit] is None:
+                    state = self.states[scenario] or simulator.game_state
+                    path[unit] = state.find_path_to_edge([x[unit], y[unit]], self.edge[unit]) or [[x[unit], y[unit]]]
+                    path_step[unit] = 0
+                unit_path = path[unit]
+                if path_step[unit] + 1 < len(unit_path):
+                    path_step[unit] += 1
+                    x[unit], y[unit] = unit_path[path_step[unit]]
+                    cell[unit] = CELL_ID[x[unit]][y[unit]]
+                    self.moved[unit] += 1
+                    if cell[unit] in edges[self.edge[unit]]:
+                        damage = rules[stats[unit].unit_type][4]
+                        self.health[scenario][1 - owner[unit]] -= damage
+                        self.breaches[scenario][owner[unit]] += damage
+                        self.new_breaches[scenario].append((x[unit], y[unit], owner[unit]))
+                        self.deaths[scenario].append((stats[unit].unit_type, owner[unit], x[unit], y[unit]))
+                        # Scored units are dropped without counting as lost
+                        gone[unit] = True
+                    continue
+                self.__self_destruct(scenario, unit)
+                self.mobiles_lost[scenario][owner[unit]] += 1
+                self.deaths[scenario].append((stats[unit].unit_type, owner[unit], x[unit], y[unit]))
+                gone[unit] = True
+
+    def __self_destruct(self, scenario, unit):
+        simulator = self.simulator
+        steps_required, damage_i, damage_f, radius, _ = simulator._mobile_rules[self.stats[unit].unit_type]
+        if self.moved[unit] < steps_required:
+            return
+        radius += simulator._hit_radius
+        in_range = _reach(simulator.game_state.game_map, _reach_table(radius), self.cell[unit], radius)
+        enemy = 1 - self.owner[unit]
+        structure_health = self.structure_health[scenario]
+        for cell in _cells(in_range & self.standing[scenario][enemy]):
+            index = simulator._structure_index[cell]
+            structure_health[index] -= damage_f
+            self.structure_damage[scenario][enemy] += damage_f
+            self.damaged[scenario].append(index)
+        owner, cell, health, gone = self.owner, self.cell, self.unit_health, self.gone
+        for target in self.live[scenario]:
+            if owner[target] == enemy and health[target] > 0 and not gone[target] and in_range >> cell[target] & 1:
+                health[target] -= damage_i
+
+    def __attack(self):
+        simulator = self.simulator
+        game_map = simulator.game_state.game_map
+        hit_radius = simulator._hit_radius
+        owner, cell, health, gone, stats = self.owner, self.cell, self.unit_health, self.gone, self.stats
+        active = self.active
+        # The cells of the live mobile units of each scenario by player, and of all scenarios together
+        mobile_masks = {}
+        any_mobiles = [0, 0]
+        for scenario in active:
+            masks = [0, 0]
+            for unit in self.live[scenario]:
+                if health[unit] > 0 and not gone[unit]:
+                    masks[owner[unit]] |= 1 << cell[unit]
+            mobile_masks[scenario] = masks
+            any_mobiles[0] |= masks[0]
+            any_mobiles[1] |= masks[1]
+        any_standing = [0, 0]
+        for scenario in active:
+            any_standing[0] |= self.standing[scenario][0]
+            any_standing[1] |= self.standing[scenario][1]
+
+        for index, reach in simulator._attackers:
+            structure_stats = simulator._structure_stats[index]
+            player_index = simulator._structure_owner[index]
+            enemy = 1 - player_index
+            attacks_mobiles = structure_stats.damage_i > 0 and reach & any_mobiles[enemy]
+            attacks_structures = structure_stats.damage_f > 0 and reach & any_standing[enemy]
+            if not attacks_mobiles and not attacks_structures:
+                continue
+            attacker_cell = simulator._structure_cell[index]
+            for scenario in active:
+                mobiles_in_range = attacks_mobiles and reach & mobile_masks[scenario][enemy]
+                if (mobiles_in_range or attacks_structures) and self.standing[scenario][player_index] >> attacker_cell & 1:
+                    self.__attack_from(scenario, player_index, attacker_cell, reach, structure_stats, mobiles_in_range)
+
+        tables = {}
+        for scenario in active:
+            masks = mobile_masks[scenario]
+            for unit in self.live[scenario]:
+                if gone[unit]:
+                    continue
+                unit_stats = stats[unit]
+                radius = unit_stats.attackRange + hit_radius
+                table = tables.get(radius)
+                if table is None:
+                    table = tables[radius] = _reach_table(radius)
+                reach = _reach(game_map, table, cell[unit], radius)
+                self.__attack_from(scenario, owner[unit], cell[unit], reach, unit_stats,
+                                   unit_stats.damage_i > 0 and reach & masks[1 - owner[unit]])
+
+    def __attack_from(self, scenario, player_index, attacker_cell, reach, attacker_stats, mobiles_in_range):
+        """Makes one unit of a scenario attack its target, if it has one"""
+        enemy = 1 - player_index
+        distances = self.simulator._distances
+        row = attacker_cell * NUM_CELLS
+        if mobiles_in_range:
+            owner, cell, health, gone, x, y = self.owner, self.cell, self.unit_health, self.gone, self.x, self.y
+            target = -1
+            target_key = None
+            for unit in self.live[scenario]:
+                if owner[unit] != enemy or health[unit] <= 0 or gone[unit] or not reach >> cell[unit] & 1:
+                    continue
+                key = _target_key(player_index, distances[row + cell[unit]], health[unit], x[unit], y[unit])
+                if target_key is None or key < target_key:
+                    target, target_key = unit, key
+            if target >= 0:
+                health[target] -= attacker_stats.damage_i
+                return
+        if attacker_stats.damage_f > 0 and reach & self.standing[scenario][enemy]:
+            structure_health = self.structure_health[scenario]
+            structure_index = self.simulator._structure_index
+            target = -1
+            target_key = None
+            for cell in _cells(reach & self.standing[scenario][enemy]):
+                index = structure_index[cell]
+                if structure_health[index] <= 0:
+                    continue
+                x, y = CELL_LOCATIONS[cell]
+                key = _target_key(player_index, distances[row + cell], structure_health[index], x, y)
+                if target_key is None or key < target_key:
+                    target, target_key = index, key
+            if target >= 0:
+                structure_health[target] -= attacker_stats.damage_f
+                self.structure_damage[scenario][enemy] += attacker_stats.damage_f
+                self.damaged[scenario].append(target)
+
+    def __remove(self):
+        simulator = self.simulator
+        stats, owner, x, y, health, gone, path = self.stats, self.owner, self.x, self.y, self.unit_health, self.gone, self.path
+        for scenario in self.active:
+            deaths = self.deaths[scenario]
+            damaged = sorted(set(self.damaged[scenario]))
+            changed = False
+            if damaged:
+                structure_health = self.structure_health[scenario]
+                standing = self.standing[scenario]
+                for index in damaged:
+                    structure_cell = simulator._structure_cell[index]
+                    player_index = simulator._structure_owner[index]
+                    if structure_health[index] > 0 or not standing[player_index] >> structure_cell & 1:
+                        continue
+                    standing[player_index] &= ~(1 << structure_cell)
+                    self.structures_destroyed[scenario][player_index] += 1
+                    structure_x, structure_y = CELL_LOCATIONS[structure_cell]
+                    deaths.append((simulator._structure_stats[index].unit_type, player_index, structure_x, structure_y))
+                    if self.states[scenario] is None:
+                        self.states[scenario] = simulator.game_state.fork()
+                    self.states[scenario].game_map.remove_unit([structure_x, structure_y])
+                    changed = True
+            alive = []
+            for unit in self.live[scenario]:
+                if gone[unit]:
+                    continue
+                if health[unit] > 0:
+                    alive.append(unit)
+                    if changed:
+                        path[unit] = None
+                else:
+                    self.mobiles_lost[scenario][owner[unit]] += 1
+                    deaths.append((stats[unit].unit_type, owner[unit], x[unit], y[unit]))
+            self.live[scenario] = alive
+            if self.record:
+                first = self.first[scenario]
+                structures = []
+                for index in damaged:
+                    structure_x, structure_y = CELL_LOCATIONS[simulator._structure_cell[index]]
+                    structures.append((simulator._structure_stats[index].unit_type, simulator._structure_owner[index], structure_x, structure_y,
+                                       self.structure_health[scenario][index]))
+                self.frames[scenario].append(SimulationFrame(self.frame, [(stats[unit].unit_type, owner[unit], x[unit], y[unit], health[unit]) for unit in alive],
+                                                             self.new_breaches[scenario], deaths, [unit - first for unit in alive], structures))
+            if not alive:
+                self.frame_count[scenario] = self.frame
+        self.active = [scenario for scenario in self.active if self.live[scenario]]
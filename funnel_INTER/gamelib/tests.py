@@ -1,7 +1,261 @@
 import unittest
+import asyncio
+import contextlib
+import io
 import json
+import multiprocessing
+import sys
+import threading
+import time
 from .game_state import GameState
 from .unit import GameUnit
+from .unit_arrays import UnitArrays
+from .catalog import UnitCatalog
+from .game_map import NUM_CELLS, squared_distance_table, squared_range_limit
+from .util import EngineMessage, decode_state, read_turn_info, has_events
+from .algocore import AlgoCore
+from .events import EventBatch, decode_event_list
+from .background import BackgroundRunner, IdleContext
+from .async_algocore import AsyncAlgoCore
+from . import log
+from .budget import Budget
+from . import shared_board
+from .shared_board import SharedBoard, board_state
+from . import workers
+from .workers import WorkerPool
+from .simulator import Simulator
+from .replay import Replay, check_replay
+from .search import LookaheadSearch, Option, apply_choice
+from .match import LocalMatch, flip_state
+
+CONFIG = """
+    {
+    "seasonCompatibilityModeP1": 5,
+    "seasonCompatibilityModeP2": 5,
+    "debug":{
+        "printMapString":false,
+        "printTStrings":false,
+        "printActStrings":false,
+        "printHitStrings":false,
+        "printPlayerInputStrings":false,
+        "printBotErrors":true,
+        "printPlayerGetHitStrings":false
+    },
+    "unitInformation": [
+        {
+        "icon": "S3_filter",
+        "iconxScale": 0.4,
+        "iconyScale": 0.4,
+        "cost1": 1.0,
+        "getHitRadius":0.01,
+        "display":"filter",
+        "shorthand":"FF",
+        "startHealth":75.0,
+        "unitCategory": 0,
+        "refundPercentage": 0.75,
+        "turnsRequiredToRemove": 1,
+        "upgrade": {
+            "startHealth": 150.0
+        }
+        },
+        {
+        "icon": "S3_encryptor",
+        "iconxScale": 0.5,
+        "iconyScale": 0.5,
+        "cost1":4.0,
+        "getHitRadius":0.01,
+        "display":"encryptor",
+        "shieldRange":0,
+        "shorthand":"EF",
+        "startHealth":30.0,
+        "unitCategory": 0,
+        "refundPercentage": 0.75,
+        "turnsRequiredToRemove": 1,
+        "generatesResource1": 1,
+        "upgrade": {
+            "generatesResource2": 1
+        }
+        },
+        {
+        "icon": "S3_destructor",
+        "iconxScale": 0.5,
+        "iconyScale": 0.5,
+        "attackDamageWalker":5.0,
+        "cost1":2.0,
+        "getHitRadius":0.01,
+        "display":"destructor",
+        "attackRange":2.5,
+        "shorthand":"DF",
+        "startHealth":90.0,
+        "unitCategory": 0,
+        "refundPercentage": 0.75,
+        "turnsRequiredToRemove": 1,
+        "upgrade": {
+            "cost1": 4.0,
+            "attackRange":3.5,
+            "attackDamageWalker":15.0
+        }
+        },
+        {
+        "icon": "S3_ping",
+        "iconxScale": 0.7,
+        "iconyScale": 0.7,
+        "attackDamageTower":2.0,
+        "attackDamageWalker":2.0,
+        "playerBreachDamage":1.0,
+        "cost2":1.0,
+        "getHitRadius":0.01,
+        "display":"ping",
+        "attackRange":3.5,
+        "shorthand":"PI",
+        "startHealth":15.0,
+        "speed":1,
+        "unitCategory": 1,
+        "selfDestructDamageWalker": 15.0,
+        "selfDestructDamageTower": 15.0,
+        "metalForBreach": 1.0,
+        "selfDestructRange": 1.5,
+        "selfDestructStepsRequired": 5
+        },
+        {
+        "icon": "S3_emp",
+        "iconxScale": 0.47,
+        "iconyScale": 0.47,
+        "attackDamageWalker":6.0,
+        "attackDamageTower":6.0,
+        "playerBreachDamage":1.0,
+        "cost2":3.0,
+        "getHitRadius":0.01,
+        "display":"emp",
+        "attackRange":4.5,
+        "shorthand":"EI",
+        "startHealth":5.0,
+        "speed":0.5,
+        "unitCategory": 1,
+        "selfDestructDamageWalker": 5.0,
+        "selfDestructDamageTower": 5.0,
+        "metalForBreach": 1.0,
+        "selfDestructRange": 1.5,
+        "selfDestructStepsRequired": 5
+        },
+        {
+        "icon": "S3_scrambler",
+        "iconxScale": 0.5,
+        "iconyScale": 0.5,
+        "attackDamageWalker":20.0,
+        "playerBreachDamage":1.0,
+        "cost2":1.0,
+        "getHitRadius":0.01,
+        "display":"scrambler",
+        "attackRange":4.5,
+        "shorthand":"SI",
+        "startHealth":40.0,
+        "speed":0.25,
+        "unitCategory": 1,
+        "selfDestructDamageWalker": 40.0,
+        "selfDestructDamageTower": 40.0,
+        "metalForBreach": 1.0,
+        "selfDestructRange": 1.5,
+        "selfDestructStepsRequired": 5
+        },
+        {
+        "display":"Remove",
+        "shorthand":"RM",
+        "icon": "S3_removal",
+        "iconxScale": 0.4,
+        "iconyScale": 0.4
+        },
+        {
+        "display":"Upgrade",
+        "shorthand":"UP",
+        "icon": "S3_upgrade",
+        "iconxScale": 0.4,
+        "iconyScale": 0.4
+        }
+    ],
+    "timingAndReplay":{
+        "waitTimeBotMax":35000,
+        "playWaitTimeBotMax":40000,
+        "waitTimeManual":1820000,
+        "waitForever":false,
+        "waitTimeBotSoft":5000,
+        "playWaitTimeBotSoft":10000,
+        "replaySave":1,
+        "playReplaySave":0,
+        "storeBotTimes":true,
+        "waitTimeStartGame":3000,
+        "waitTimeEndGame":3000
+    },
+    "resources":{
+        "turnIntervalForBitCapSchedule":10,
+        "turnIntervalForBitSchedule":10,
+        "bitRampBitCapGrowthRate":5.0,
+        "roundStartBitRamp":10,
+        "bitGrowthRate":1.0,
+        "startingHP":40.0,
+        "maxBits":150.0,
+        "bitsPerRound":5.0,
+        "coresPerRound":5.0,
+        "coresForPlayerDamage":1.0,
+        "startingBits":5.0,
+        "bitDecayPerRound":0.25,
+        "startingCores":20.0
+    },
+    "misc":{
+        "numBlockedLocations": 0,
+        "blockedLocations": [
+        ]
+    }
+}
+"""
+
+TURN_0 = """{"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,0,-1],"p1Stats":[30.0,25.0,5.0,0],"p1Units":[[],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0],"events":{"selfDestruct":[],"breach":[],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
+
+TURN_WITH_UNITS = """{"p2Units":[[[13,20,60.0,"7"]],[],[[14,18,75.0,"8"]],[],[],[],[],[[14,18,0.0,"9"]]],"turnInfo":[0,4,-1],"p1Stats":[28.0,9.0,6.0,1],"p1Units":[[[12,10,60.0,"1"],[13,10,30.0,"2"]],[],[[13,9,75.0,"3"]],[[14,0,15.0,"4"],[14,0,15.0,"5"]],[],[],[[12,10,0.0,"6"]],[]],"p2Stats":[25.0,3.0,8.0,1],"events":{"selfDestruct":[],"breach":[],"damage":[],"shield":[],"move":[],"spawn":[],"death":[],"attack":[],"melee":[]}}"""
+
+
+class SpawnScout:
+    def on_turn(self, turn_state):
+        game_state = self.create_game_state(turn_state)
+        game_state.suppress_warnings(True)
+        game_state.attempt_spawn("PI", [13, 0])
+        game_state.submit_turn()
+
+
+class SyncScoutAlgo(SpawnScout, AlgoCore):
+    pass
+
+
+class AsyncScoutAlgo(SpawnScout, AsyncAlgoCore):
+    async def on_turn(self, turn_state):
+        await self.checkpoint()
+        SpawnScout.on_turn(self, turn_state)
+        self.turns_left_over = await self.within_deadline(asyncio.sleep(0, result=self.time_left() > 0))
+
+
+class ScoutRush(AlgoCore):
+    """Builds three turrets and sends every scout it can afford from one spot each turn"""
+    def __init__(self, x):
+        super().__init__()
+        self.x = x
+        self.frames = 0
+
+    def on_turn(self, turn_state):
+        game_state = self.create_game_state(turn_state)
+        game_state.suppress_warnings(True)
+        game_state.attempt_spawn("DF", [[13, 11], [14, 11], [12, 11]])
+        game_state.attempt_spawn("PI", [self.x, 13 - self.x], 1000)
+        game_state.submit_turn()
+
+    def on_action_frame(self, turn_string):
+        self.frames += 1
+
+
+def recorded_stream():
+    frame = TURN_WITH_UNITS.replace('"turnInfo":[0,4,-1]', '"turnInfo":[1,4,6]')
+    end = TURN_0.replace('"turnInfo":[0,0,-1]', '"turnInfo":[2,5,-1]')
+    return "\n".join([json.dumps(json.loads(CONFIG)), TURN_0, frame, TURN_WITH_UNITS, end]) + "\n"
+
 
 class BasicTests(unittest.TestCase):
 
@@ -215,6 +469,296 @@ class BasicTests(unittest.TestCase):
         self.assertEqual([("DF", 13, 6)], game._build_stack, "Build queue is wrong!")
         self.assertEqual([("SI", 13, 0), ("SI", 13, 0), ("SI", 13, 0)], game._deploy_stack, "Deploy queue is wrong!")
 
+    def test_spawn_many(self):
+        game = GameState(json.loads(CONFIG), TURN_WITH_UNITS)
+        game.suppress_warnings(True)
+        report = game.attempt_spawn_many([("PI", [13, 0], 4), ("FF", [12, 10], 1), ("DF", [[11, 10], [11, 10]], 1), ("SI", [14, 0], 5)])
+        self.assertEqual([4, 0, 1, 2], report, "Each entry should report how many of its units were spawned")
+        self.assertEqual([("PI", 13, 0)] * 4 + [("SI", 14, 0)] * 2, game._deploy_stack)
+        self.assertEqual([("DF", 11, 10)], game._build_stack)
+        self.assertEqual(0, game.get_resource(game.MP), "The MP should be spent")
+        self.assertEqual(6, len(game.game_map[13, 0]) + len(game.game_map[14, 0]) - 2, "The new units should be on the map")
+
+    def test_spawn_masks(self):
+        game = GameState(json.loads(CONFIG), TURN_WITH_UNITS)
+        game.suppress_warnings(True)
+        own_half = [location for location in game.game_map if location[1] < game.HALF_ARENA]
+        edges = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT)
+        for unit_type, candidates in (("FF", own_half), ("PI", edges)):
+            self.assertEqual([location for location in candidates if game.can_spawn(unit_type, location)], game.spawn_locations(unit_type, candidates))
+        self.assertNotIn([14, 0], game.spawn_locations("FF"), "Cells holding mobile units should not take structures")
+        self.assertIn([14, 0], game.spawn_locations("PI"))
+        game.attempt_spawn("FF", [[13, 0], [11, 10]])
+        self.assertNotIn([13, 0], game.spawn_locations("PI"), "New structures should close the cell")
+        self.assertNotIn([11, 10], game.spawn_locations("DF"))
+        game.game_map.remove_unit([13, 9])
+        self.assertIn([13, 9], game.spawn_locations("DF"), "Removed units should open the cell")
+
+    def test_fork(self):
+        game = GameState(json.loads(CONFIG), TURN_WITH_UNITS, lazy=True)
+        game.suppress_warnings(True)
+        game.game_map[13, 9][0].health = 50
+        fork = game.fork()
+        fork.suppress_warnings(True)
+        fork.attempt_spawn("FF", [11, 10])
+        fork.attempt_upgrade([12, 10])
+        fork.game_map[13, 9][0].health = 10
+        fork.attempt_spawn("PI", [14, 0], 2)
+        self.assertFalse(game.contains_stationary_unit([11, 10]), "Spawning in a fork should not touch the original")
+        self.assertFalse(game.contains_stationary_unit([12, 10]).upgraded)
+        self.assertTrue(fork.contains_stationary_unit([12, 10]).upgraded)
+        self.assertEqual(50, game.game_map[13, 9][0].health)
+        self.assertEqual(2, len(game.game_map[14, 0]))
+        self.assertEqual(([], []), (game._build_stack, game._deploy_stack))
+        self.assertEqual([9.0, 6.0], game.get_resources())
+        self.assertNotEqual(game.game_map.blocked_mask, fork.game_map.blocked_mask)
+
+        game.game_map[12, 10][0].health = 1
+        game.attempt_spawn("PI", [13, 0])
+        self.assertEqual(60, fork.game_map[12, 10][0].health, "Changes to the original after forking should not show in the fork")
+        self.assertEqual(0, len(fork.game_map[13, 0]))
+        self.assertEqual(4, len(fork.game_map[14, 0]))
+        self.assertEqual(10, fork.fork().game_map[13, 9][0].health, "Forks of forks should keep the forked state")
+
+    def test_economy(self):
+        game = GameState(json.loads(CONFIG), TURN_WITH_UNITS)
+        economy = game.economy
+        self.assertIs(economy, GameState(game.config, TURN_0).economy, "The tables should be compiled once per config")
+        plain, spending = economy.project_many(game.turn_number, 9.0, 6.0, 12, [[], [[4, 6], [8, 0]]])
+        self.assertEqual([game.project_future_MP(turns) for turns in range(1, 13)], plain.MP[1:], "MP should match project_future_MP")
+        self.assertEqual([9.0 + 5 * turns for turns in range(13)], plain.SP)
+        self.assertEqual([9.0, 10.0, 7.0], spending.SP[:3])
+        self.assertEqual(5.0, spending.MP[1], "Only the income should be left after spending all MP")
+        self.assertTrue(spending.feasible)
+        self.assertFalse(economy.project(game.turn_number, 9.0, 6.0, 3, [[10, 0]]).feasible)
+        mine, enemy = economy.project_players(game, 2)
+        self.assertEqual(([9.0, 14.0, 19.0], [3.0, 8.0, 13.0]), (mine.SP, enemy.SP))
+
+        self.assertEqual(0, economy.earliest_affordable(4, 9.0, 6.0, [8, 0]))
+        self.assertEqual(2, economy.earliest_affordable(4, 9.0, 6.0, [8, 0], reserve=[10, 0]))
+        self.assertEqual(plain.MP.index(next(MP for MP in plain.MP if MP >= 15)), economy.earliest_affordable(4, 9.0, 6.0, [0, 15]))
+        self.assertIsNone(economy.earliest_affordable(4, 9.0, 6.0, [0, 500]), "MP can not grow past the cap")
+        self.assertEqual(150.0, economy.MP_cap[10])
+        self.assertEqual(155.0, economy.MP_cap[20])
+
+    def test_bytes_round_trip(self):
+        config = json.loads(CONFIG)
+        for serialized_state in (TURN_0, TURN_WITH_UNITS):
+            game = GameState(config, serialized_state)
+            game.suppress_warnings(True)
+            game.attempt_spawn("DF", [[11, 10], [3, 12]])
+            game.attempt_upgrade([12, 10])
+            game.attempt_remove([13, 10])
+            game.attempt_spawn("PI", [13, 0], 2)
+            copy = GameState.from_bytes(config, game.to_bytes())
+            self.assertEqual(copy.to_bytes(), game.to_bytes(), "Encoding a decoded state should give the same bytes")
+            for attribute in ("turn_number", "my_health", "my_time", "enemy_health", "enemy_time", "_player_resources", "_build_stack", "_deploy_stack"):
+                self.assertEqual(getattr(game, attribute), getattr(copy, attribute), attribute)
+            for array_name in UnitArrays.__slots__[:8]:
+                self.assertEqual(getattr(game.unit_arrays, array_name), getattr(copy.unit_arrays, array_name), array_name)
+            self.assertEqual(game.game_map.blocked_mask, copy.game_map.blocked_mask)
+            for location in game.game_map:
+                self.assertEqual([(unit.unit_type, unit.player_index, unit.health, unit.upgraded) for unit in game.game_map[location]],
+                                 [(unit.unit_type, unit.player_index, unit.health, unit.upgraded) for unit in copy.game_map[location]], location)
+        with self.assertRaises(ValueError):
+            GameState.from_bytes(config, TURN_0.encode())
+
+    def test_shared_board(self):
+        config = json.loads(CONFIG)
+        game = GameState(config, TURN_WITH_UNITS)
+        game.suppress_warnings(True)
+        game.attempt_spawn("DF", [11, 10])
+        with SharedBoard(size=64) as board:
+            handle = board.publish(game)
+            self.assertEqual(1, handle[1])
+            self.assertGreater(board._memory.size, 64, "The block should grow to fit the state")
+            first, second = board_state(config, handle), board_state(config, handle)
+            self.assertEqual(game.to_bytes(), first.to_bytes())
+            first.attempt_spawn("FF", [10, 10])
+            self.assertFalse(second.contains_stationary_unit([10, 10]), "Every task should get its own copy")
+
+            game.attempt_spawn("FF", [9, 10])
+            new_handle = board.publish(game)
+            self.assertIsNotNone(board_state(config, handle), "A generation already decoded should still be served")
+            shared_board.detach()
+            with contextlib.redirect_stderr(io.StringIO()):
+                self.assertIsNone(board_state(config, handle), "An old generation should not be read from the block")
+                log.flush()
+            self.assertTrue(board_state(config, new_handle).contains_stationary_unit([9, 10]))
+            shared_board.detach()
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertIsNone(board_state(config, new_handle), "A closed board should not be read")
+            log.flush()
+
+    def test_worker_pool(self):
+        config = json.loads(CONFIG)
+        game = GameState(config, TURN_WITH_UNITS)
+        game.suppress_warnings(True)
+        locations = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT)[:6]
+        with WorkerPool(config, 2, measure=False) as pool:
+            pool.publish(game)
+            self.assertEqual([workers.path_damage(game.fork(), location) for location in locations], pool.map(workers.path_damage, locations))
+            self.assertEqual(game.find_path_to_edge([13, 0]), pool.submit(workers.find_path, [13, 0]).get(10))
+            deploys = ([("PI", 13, 0)] * 3, [])
+            self.assertEqual(Simulator(game).run(*deploys, record=False), pool.map(workers.simulate, [deploys])[0])
+            self.assertGreater(pool.measure_overhead(5), 0)
+        self.assertEqual(0, len(multiprocessing.active_children()), "Closing the pool should stop every worker")
+
+    def test_simulator(self):
+        config = json.loads(CONFIG)
+        game = GameState(config, TURN_0)
+        path = game.find_path_to_edge([13, 0])
+        result = Simulator(game).run([("PI", 13, 0)], [])
+        self.assertEqual(len(path) - 1, result.frame_count, "A scout should take one step every frame")
+        self.assertEqual([tuple(location) for location in path[1:-1]], [frame.mobiles[0][2:4] for frame in result.frames[:-1]])
+        self.assertEqual([(path[-1][0], path[-1][1], 0)], result.frames[-1].breaches)
+        self.assertEqual(([1.0, 0], [30.0, 29.0], [0, 0]), (result.breaches, result.health, result.mobiles_lost))
+        demolisher = Simulator(game).run([("EI", 13, 0)], [], record=True)
+        self.assertEqual(2 * (len(path) - 1), demolisher.frame_count, "A demolisher should move every other frame")
+
+        game.game_map.add_unit("DF", [16, 6], 1)
+        result = Simulator(game).run([("PI", 13, 0)], [])
+        self.assertEqual(([0, 0], [1, 0], [0, 0]), (result.breaches, result.mobiles_lost, result.structures_destroyed))
+        self.assertEqual([15.0, 10.0, 5.0], [frame.mobiles[0][4] for frame in result.frames if frame.mobiles][-3:], "The turret should hit the scout every frame it is in range")
+        self.assertEqual(5 * 2.0, result.structure_damage[1], "The scout should shoot back from further away, including in the frame it dies")
+
+        game = GameState(config, TURN_0)
+        for x in range(28):
+            game.game_map.add_unit("FF", [x, 14], 1)
+        result = Simulator(game).run([("PI", 13, 0)], [])
+        self.assertEqual(([0, 0], [1, 0]), (result.breaches, result.mobiles_lost), "A blocked scout should self destruct")
+        self.assertEqual(("PI", 0), result.frames[-1].deaths[0][:2])
+        self.assertGreaterEqual(result.structure_damage[1], 15.0)
+
+        config = json.loads(CONFIG)
+        config["unitInformation"][1].update(shieldRange=3.5, shieldPerUnit=3.0, shieldBonusPerY=0.5)
+        game = GameState(config, TURN_0)
+        game.game_map.add_unit("EF", [13, 2], 0)
+        result = Simulator(game).run([("PI", 13, 0)], [])
+        self.assertEqual(15.0 + 3.0 + 0.5 * 2, result.frames[5].mobiles[0][4], "A support should shield a unit once, more the further forward it is")
+
+        game.game_map.add_unit("DF", [16, 6], 1)
+        simulator = Simulator(game)
+        scenarios = [([("PI", 13, 0)], []), ([("EI", 13, 0)] * 3, [("PI", 14, 27)]), ([], [("EI", 14, 27)]), ([("PI", 12, 1), ("EI", 15, 1)], None)]
+        self.assertEqual([simulator.run(*scenario) for scenario in scenarios], simulator.run_many(scenarios, record=True), "A batch should match running each scenario alone")
+
+    def test_replay_check(self):
+        config = json.loads(CONFIG)
+        seed = json.loads(TURN_0)
+        seed["turnInfo"] = [1, 0, 0]
+        seed["p2Units"][2] = [[16, 6, 75.0, "1"]]
+        seed["events"]["spawn"] = [[[13, 0], 3, "2", 1], [[16, 6], 2, "1", 2]]
+        game = GameState(config, seed)
+        result = Simulator(game).run([("PI", 13, 0)], [])
+        frames = [seed]
+        for simulated in result.frames:
+            frame = json.loads(TURN_0)
+            frame["turnInfo"] = [1, 0, simulated.frame]
+            frame["p2Units"][2] = seed["p2Units"][2]
+            for unit_type, player_index, x, y, health in simulated.mobiles:
+                frame["p{}Units".format(player_index + 1)][3].append([x, y, health, "2"])
+            frame["events"]["death"] = [[[x, y], 3, "2", player_index + 1, False] for _, player_index, x, y in simulated.deaths]
+            frames.append(frame)
+        lines = [json.dumps(config)] + [json.dumps(frame) for frame in reversed(frames)]
+
+        replay = Replay(lines)
+        self.assertEqual([0], list(replay.turns))
+        self.assertEqual(list(range(len(frames))), [frame["turnInfo"][2] for frame in replay.turns[0]], "Frames should be put back in order")
+        check = check_replay(replay)[0]
+        self.assertEqual((result.frame_count, result.frame_count, 0, 0.0, 0, None), (check.frames, check.predicted_frames, check.position_errors,
+                                                                                     check.health_error, check.death_errors, check.first_divergence))
+
+        frames[3]["p1Units"][3][0][2] -= 2.0
+        frames[4]["p1Units"][3][0][0] += 1
+        check = check_replay(Replay(json.dumps(frame) for frame in frames), config)[0]
+        self.assertEqual((3, 2, 2.0), (check.first_divergence, check.position_errors, check.health_error))
+
+    def test_local_match(self):
+        state = json.loads(TURN_WITH_UNITS)
+        self.assertEqual(state, flip_state(flip_state(state)), "Flipping twice should give the state back")
+        self.assertEqual([14, 7, 60.0, "7"], flip_state(state)["p1Units"][0][0])
+
+        replay = io.StringIO()
+        first, second = ScoutRush(3), ScoutRush(6)
+        result = LocalMatch(json.loads(CONFIG), first, second, replay=replay, max_turns=30).play()
+        self.assertIn(result.winner, (0, 1))
+        self.assertEqual((False, False), tuple(result.crashed))
+        self.assertTrue(result.frames > 0)
+        self.assertEqual(result.frames + result.turns, first.frames, "Each algo should get every frame, frame 0 of each turn included")
+        self.assertEqual(first.frames, second.frames)
+        checks = check_replay(Replay(replay.getvalue().splitlines()))
+        self.assertEqual(result.turns, len(checks))
+        self.assertTrue(all(check.first_divergence is None for check in checks), "The Simulator should replay a local match exactly")
+
+    def test_lookahead_search(self):
+        game = GameState(json.loads(CONFIG), TURN_0)
+        defenses = [Option("turret", [("DF", 13, 5)]), Option("upgrade", [("UP", 13, 5)])]
+        attacks = [Option("scouts", [("PI", 13, 0)] * 5), Option("demolisher", [("EI", 13, 0)])]
+        search = LookaheadSearch(game, defenses, attacks, enemy_deploys=[("PI", 14, 27)] * 5, depth=2)
+        result = search.run()
+        self.assertEqual((2, True), (result.depth, result.complete))
+        self.assertEqual("scouts", result.plan[0].attack.name, "Five scouts on an empty board should score the most")
+        self.assertEqual(["turret", "upgrade"], [choice.defense.name for choice in result.plan], "An upgrade needs its turret built first")
+        self.assertEqual(result[:4], search.run()[:4], "The same seed should give the same plan")
+        out_of_time = search.run(time_budget=0)
+        self.assertEqual(((), 0, False), (out_of_time.plan, out_of_time.depth, out_of_time.complete))
+        stopped = search.run(should_stop=lambda: search._nodes >= 3)
+        self.assertEqual((0, False, 1), (stopped.depth, stopped.complete, len(stopped.plan)), "A search stopped early should keep the best of the first turn")
+
+        self.assertEqual((25.0, 5.0), tuple(game.get_resources()), "The search should not change its state")
+        self.assertTrue(apply_choice(game, result.plan[0]))
+        self.assertEqual([("DF", 13, 5)], game._build_stack)
+        self.assertEqual(5, len(game._deploy_stack))
+
+    def test_budget(self):
+        game = GameState(json.loads(CONFIG), TURN_WITH_UNITS)
+        game.suppress_warnings(True)
+        budget = Budget(game)
+        self.assertEqual(2, budget.spawn("DF", [[11, 10], [12, 10], [10, 10]], value=5))
+        self.assertEqual(2, budget.upgrade([[11, 10], [12, 10], [13, 10]], value=4), "Blocked spawns and damaged structures should be skipped")
+        budget.spawn("FF", [[9, 10], [8, 10], [7, 10], [6, 10], [5, 10]], value=2)
+        chosen = budget.solve()
+        self.assertEqual(22, sum(purchase.value for purchase in chosen), "Buying in order would only be worth 18")
+        self.assertLessEqual(budget.cost(), 9)
+        for purchase in chosen:
+            if purchase.upgrade and purchase.location == (11, 10):
+                self.assertIn(("DF", (11, 10), False), [(p.unit_type, p.location, p.upgrade) for p in chosen], "An upgrade needs its structure")
+
+        budget = Budget(game, reserve=1)
+        budget.spawn("DF", [[11, 10], [10, 10]], value=5)
+        budget.spawn("EF", [9, 10], value=20, floor=6)
+        self.assertEqual([("DF", (11, 10)), ("DF", (10, 10))], [(p.unit_type, p.location) for p in budget.solve()], "Floors should be kept")
+        self.assertEqual(2, budget.apply())
+        self.assertEqual(5.0, game.get_resource(game.SP))
+        self.assertEqual([("DF", 11, 10), ("DF", 10, 10)], game._build_stack)
+
+        budget = Budget(game)
+        budget.spawn("FF", [[9, 10], [8, 10], [7, 10]], value=1)
+        self.assertEqual(3, len(budget.solve()))
+        game.attempt_spawn("DF", [[7, 11], [6, 11]])
+        self.assertEqual(1, len(budget.solve()), "The SP held when solving should be spent")
+
+    def test_strategy_budget_priority(self):
+        from algo_strategy import AlgoStrategy
+        config = json.loads(CONFIG)
+        with contextlib.redirect_stderr(io.StringIO()):
+            algo = AlgoStrategy()
+            algo.on_game_start(config)
+            log.flush()
+        game = GameState(config, TURN_0)
+        game.suppress_warnings(True)
+        game._player_resources[0]['SP'] = 1000
+        game.turn_number = 5
+        algo.build_defences(game)
+        for location in ([24, 13], [25, 13]):
+            game.game_map[location][0].upgrade()
+
+        game._player_resources[0]['SP'] = 4
+        game.turn_number = 6
+        budget = Budget(game)
+        algo.build_defences(game, budget=budget)
+        self.assertEqual([(22, 11)], [purchase.location for purchase in budget.solve()],
+                         "The turret ranked first should be upgraded rather than the cheaper walls after it")
     def test_trivial_functions(self):
         game = self.make_turn_0_map()
 
@@ -240,7 +784,277 @@ class BasicTests(unittest.TestCase):
         self.assertEqual(1, len(game.game_map.get_locations_in_range([13,13], 0)), "We should be in 0 range of ourself")
         self.assertEqual(37, len(game.game_map.get_locations_in_range([13,13], 3.5)), "Wrong number of tiles in range")
 
-    def _test_get_attackers(self):
+    def test_squared_distance_table(self):
+        game = self.make_turn_0_map()
+        game_map = game.game_map
+        table = squared_distance_table()
+        self.assertEqual(420, NUM_CELLS, "The arena should have 420 cells")
+        self.assertEqual(NUM_CELLS * NUM_CELLS, len(table), "The table should hold every pair of cells")
+        for a, b in [([13, 0], [14, 27]), ([0, 13], [27, 14]), ([5, 10], [9, 13]), ([13, 13], [13, 13])]:
+            expected = game_map.distance_between_locations(a, b) ** 2
+            self.assertAlmostEqual(expected, game_map.squared_distance_between_locations(a, b), 6, "Wrong squared distance between {} and {}".format(a, b))
+        self.assertEqual(12, squared_range_limit(3.5, True), "A 3.5 range should include squared distance 12")
+        self.assertEqual(8, squared_range_limit(3), "A strict range of 3 should stop below squared distance 9")
+
+    def test_unit_catalog(self):
+        game = self.make_turn_0_map()
+        catalog = game.catalog
+        self.assertIs(catalog, UnitCatalog.for_config(game.config), "GameStates built from one config should share a catalog")
+        self.assertEqual(("FF", "EF", "DF"), catalog.STRUCTURE_TYPES, "Wrong structure types")
+        self.assertEqual(2, catalog.UNIT_TYPE_TO_INDEX["DF"], "Wrong unit index")
+        self.assertEqual([4.0, 0], catalog.type_cost("DF", True), "Wrong upgrade cost")
+        self.assertEqual((6.0, 0), catalog.unit_stats("DF", True).cost, "Upgraded units should cost the base and the upgrade")
+        self.assertEqual(3.5, catalog.unit_stats("DF", True).attackRange, "Upgraded range is wrong")
+        self.assertEqual(4.5, catalog.max_attack_range, "Wrong max attack range")
+        with self.assertRaises(AttributeError):
+            catalog.WALL = "XX"
+
+    def test_units_share_stats(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 5], 0)
+        game.game_map.add_unit("DF", [14, 5], 0)
+        first, second = game.game_map[13, 5][0], game.game_map[14, 5][0]
+        self.assertFalse(hasattr(first, "__dict__"), "Units should not carry a __dict__")
+        self.assertIs(first.stats, second.stats, "Units of the same type and level should share their stats")
+        first.upgrade()
+        self.assertTrue(first.upgraded, "Upgrading should switch to the upgraded stats")
+        self.assertEqual(3.5, first.attackRange, "Upgraded range is wrong")
+        self.assertEqual(2.5, second.attackRange, "Upgrading one unit changed another")
+        self.assertEqual(90.0, first.health, "Upgrading should not change current health")
+        self.assertIs(game.config, first.config, "Units should still expose the config")
+        second.max_health = 200.0
+        second.cost = [5.0, 0]
+        self.assertEqual(200.0, second.max_health, "Unit stats should be settable")
+        self.assertEqual([5.0, 0], second.cost, "Costs should be set and read as [SP, MP] lists")
+        self.assertEqual(90.0, game.catalog.unit_stats("DF").max_health, "Setting a unit's stat changed the catalog")
+        self.assertEqual([2.0, 0], GameUnit("DF", game.config).cost, "Setting a unit's stat changed other units")
+
+    def test_lazy_parsing(self):
+        config = json.loads(CONFIG)
+        eager = GameState(config, TURN_WITH_UNITS)
+        lazy = GameState(config, TURN_WITH_UNITS, lazy=True)
+        self.assertEqual(3, lazy.count_units("FF"), "Walls should be counted without reading the map")
+        self.assertEqual(2, lazy.count_units("PI", 0), "Stacked scouts should be counted once each")
+        self.assertEqual([[14, 18]], lazy.structure_locations("DF", 1), "Wrong enemy turret locations")
+        self.assertTrue(lazy.contains_stationary_unit([13, 9]), "The turret should block its location")
+        self.assertFalse(lazy.contains_stationary_unit([14, 0]), "Scouts do not block a location")
+        for location in eager.game_map:
+            self.assertEqual(str(eager.game_map[location]), str(lazy.game_map[location]), "Lazy and eager maps differ at {}".format(location))
+        self.assertTrue(lazy.game_map[12, 10][0].pending_removal, "The removal flag was lost")
+        self.assertTrue(lazy.game_map[14, 18][0].upgraded, "The upgrade was lost")
+        lazy.game_map.remove_unit([13, 10])
+        lazy.game_map.add_unit("FF", [3, 10], 0)
+        self.assertEqual(3, lazy.count_units("FF"), "Counts should follow changes to the map")
+
+    def test_structure_diff(self):
+        config = json.loads(CONFIG)
+        first = GameState(config, TURN_WITH_UNITS, lazy=True)
+        state = json.loads(TURN_WITH_UNITS)
+        state["p1Units"][0] = [[12, 10, 60.0, "1"], [13, 10, 20.0, "2"], [4, 10, 60.0, "10"]]
+        state["p1Units"][6] = []
+        state["p2Units"][0] = []
+        state["p1Units"][7] = [[13, 9, 0.0, "3"]]
+        second = GameState(config, json.dumps(state), lazy=True, previous=first)
+        diff = second.structure_diff
+        self.assertIsNone(first.structure_diff, "The first turn has nothing to compare against")
+        self.assertEqual([[4, 10]], diff.added, "Wrong added structures")
+        self.assertEqual([[13, 20]], diff.removed, "Wrong removed structures")
+        self.assertEqual([[13, 10]], diff.damaged, "Wrong damaged structures")
+        self.assertEqual([[13, 9]], diff.upgraded, "Wrong upgraded structures")
+        self.assertEqual([], diff.for_player(0).removed, "The removed wall was the enemy's")
+        self.assertEqual(GameState(config, json.dumps(state)).game_map.blocked_mask, second.game_map.blocked_mask, "The patched blocked mask is wrong")
+
+        # An engine upgrade raises health, and a wall rebuilt on the same cell gets a new id
+        state["p1Units"][0] = [[12, 10, 200.0, "1"], [13, 10, 60.0, "11"], [4, 10, 60.0, "10"]]
+        state["p1Units"][7] = [[13, 9, 0.0, "3"], [12, 10, 0.0, "1"]]
+        third = GameState(config, json.dumps(state), lazy=True, previous=second).structure_diff
+        self.assertEqual(([[12, 10]], [[13, 10]], [[13, 10]], []), (third.upgraded, third.added, third.removed, third.damaged),
+                         "An upgrade should not look like a rebuilt structure")
+
+    def test_path_cache(self):
+        config = json.loads(CONFIG)
+        first = GameState(config, TURN_WITH_UNITS, lazy=True)
+        path = first.find_path_to_edge([13, 0])
+        second = GameState(config, TURN_WITH_UNITS, lazy=True, previous=first)
+        self.assertEqual(path, second.find_path_to_edge([13, 0]), "An unchanged board should give the same path")
+        self.assertIs(first._path_cache, second._path_cache, "Paths should be kept across turns")
+        second.game_map.add_unit("FF", path[3], 0)
+        self.assertNotIn(path[3], second.find_path_to_edge([13, 0]), "A new wall should change the path")
+        second.game_map.remove_unit(path[3])
+        self.assertEqual(path, second.find_path_to_edge([13, 0]), "Removing the wall should restore the path")
+
+    def test_decoded_state(self):
+        config = json.loads(CONFIG)
+        message = EngineMessage(TURN_WITH_UNITS, json.loads(TURN_WITH_UNITS))
+        self.assertEqual(TURN_WITH_UNITS, message, "An EngineMessage should still be the raw string")
+        self.assertIs(message.state, decode_state(message), "The decoded state should be reused")
+        for given in [TURN_WITH_UNITS, message, json.loads(TURN_WITH_UNITS)]:
+            game = GameState(config, given)
+            self.assertEqual(4, game.turn_number, "Wrong turn number from {}".format(type(given).__name__))
+            self.assertEqual(2, len(game.game_map[14, 0]), "Wrong units from {}".format(type(given).__name__))
+
+    def test_frame_classification(self):
+        frame = TURN_WITH_UNITS.replace('"turnInfo":[0,4,-1]', '"turnInfo":[1,4,6]').replace('"breach":[]', '"breach":[[[3,10],1,3,"12",2]]')
+        self.assertEqual([1, 4, 6], read_turn_info(frame), "Wrong turnInfo")
+        self.assertTrue(has_events(frame, "breach"), "The frame has a breach")
+        self.assertFalse(has_events(frame, "death"), "The frame has no deaths")
+
+        class FrameWatcher(AlgoCore):
+            def on_action_frame(self, turn_string):
+                pass
+
+        self.assertFalse(AlgoCore().wants_frame(frame, [1, 4, 6]), "Frames are useless without an on_action_frame")
+        watcher = FrameWatcher()
+        self.assertTrue(watcher.wants_frame(frame, [1, 4, 6]), "Every frame is wanted until interest is registered")
+        watcher.watch_frames(events=["death"])
+        self.assertFalse(watcher.wants_frame(frame, [1, 4, 6]), "The frame has no deaths")
+        watcher.watch_frames(every=3, events=["death"])
+        self.assertTrue(watcher.wants_frame(frame, [1, 4, 6]), "Every third frame was requested")
+        watcher.watch_frames(events=["breach"])
+        self.assertTrue(watcher.wants_frame(frame, [1, 4, 7]), "Frames with breaches were requested")
+
+    def test_event_subscriptions(self):
+        events = '"breach":[[[3,10],1,3,"12",2]],"damage":[[[13,9],4.0,2,"3",1],[[14,0],2.0,3,"4",1]]'
+        frame = TURN_WITH_UNITS.replace('"turnInfo":[0,4,-1]', '"turnInfo":[1,4,6]').replace('"breach":[],"damage":[]', events).replace('"attack":[]', '"attack":[[[14,18],[13,17],6.0,2,"8","14",2]]')
+        damage = decode_event_list(frame, "damage")
+        self.assertEqual(damage, decode_event_list(EngineMessage(frame, json.loads(frame)), "damage"), "Raw and decoded frames disagree")
+        batch = EventBatch("damage", 4, 6, damage)
+        self.assertEqual(2, len(batch), "Wrong number of damage events")
+        self.assertEqual([14, 0], batch.location(1), "Wrong damage location")
+        self.assertEqual([0, 0], list(batch.owner), "Engine player 1 should be owner 0")
+        attack = EventBatch("attack", 4, 6, decode_event_list(frame, "attack"))
+        self.assertEqual((13, 17, 6.0, "8", 1), (attack.target_x[0], attack.target_y[0], attack.amount[0], attack.ids[0], attack.owner[0]), "Wrong attack fields")
+
+        received = []
+        core = AlgoCore()
+        core.subscribe("breach", received.append)
+        core.subscribe("death", received.append)
+        core.dispatch_events(frame, [1, 4, 6])
+        self.assertEqual(["breach"], [batch.kind for batch in received], "Only frames with events should reach handlers")
+        self.assertEqual(1, received[0].owner[0], "The breach was the opponent's")
+
+    def test_background_tasks(self):
+        runner = BackgroundRunner()
+        game = GameState(json.loads(CONFIG), TURN_WITH_UNITS, lazy=True)
+        runner.register("path", lambda context: context.game_state.find_path_to_edge([13, 0]))
+        runner.register("frames", lambda context: len(context.frames()))
+        context = IdleContext(4, TURN_WITH_UNITS, game)
+        runner.start(context)
+        runner.wait(5)
+        self.assertEqual({"path": game.find_path_to_edge([13, 0]), "frames": 0}, runner.collect(), "Finished tasks should hand over their results")
+        self.assertTrue(context.cancelled, "Collecting should cancel the context")
+
+        runner = BackgroundRunner()
+        started = threading.Event()
+
+        def until_cancelled(context):
+            started.set()
+            while not context.cancelled:
+                time.sleep(0.001)
+            return "stale"
+
+        runner.register("slow", until_cancelled)
+        runner.start(IdleContext(5, TURN_WITH_UNITS, None))
+        started.wait(5)
+        runner.add_frame("frame")
+        self.assertEqual({}, runner.collect(), "Unfinished tasks have no result")
+        runner.wait(5)
+        self.assertEqual({}, runner.collect(), "A stale result should be dropped")
+
+    def test_async_algocore(self):
+        stream = recorded_stream()
+        sync_output = io.StringIO()
+        stdin = sys.stdin
+        try:
+            sys.stdin = io.StringIO(stream)
+            with contextlib.redirect_stdout(sync_output), contextlib.redirect_stderr(io.StringIO()):
+                SyncScoutAlgo().start()
+        finally:
+            sys.stdin = stdin
+
+        async def run_async(algo):
+            reader = asyncio.StreamReader()
+            reader.feed_data(stream.encode())
+            reader.feed_eof()
+            await algo.start_async(reader)
+
+        async_output = io.StringIO()
+        algo = AsyncScoutAlgo()
+        with contextlib.redirect_stdout(async_output), contextlib.redirect_stderr(io.StringIO()):
+            asyncio.run(run_async(algo))
+        self.assertEqual(sync_output.getvalue(), async_output.getvalue(), "Both cores should answer the same stream the same way")
+        self.assertEqual(4, sync_output.getvalue().count("\n"), "Two turns should give four command lines")
+        self.assertEqual(5.0, algo.turn_time_budget, "The budget should come from waitTimeBotSoft")
+        self.assertTrue(algo.turns_left_over, "A trivial turn should finish within its deadline")
+
+        class FailingTurn(AsyncAlgoCore):
+            async def on_turn(self, turn_state):
+                await self.checkpoint()
+                raise ValueError("on_turn failed")
+
+        with contextlib.redirect_stdout(io.StringIO()) as output, contextlib.redirect_stderr(io.StringIO()):
+            with self.assertRaises(ValueError, msg="A turn that fails before submitting should stop the algo, as AlgoCore does"):
+                asyncio.run(run_async(FailingTurn()))
+        self.assertEqual("", output.getvalue())
+
+    def test_build_plan(self):
+        def stage(game, spawn, upgrade, remove):
+            spawn("FF", [[11, 10], [12, 10]])
+            upgrade([[11, 10], [12, 10], [13, 9]])
+            remove([13, 10])
+            remove([[13, 10], [11, 10]])
+            spawn("PI", [13, 0], 100)
+
+        expected = GameState(json.loads(CONFIG), TURN_WITH_UNITS)
+        expected.suppress_warnings(True)
+        stage(expected, expected.attempt_spawn, expected.attempt_upgrade, expected.attempt_remove)
+
+        game = GameState(json.loads(CONFIG), TURN_WITH_UNITS)
+        game.suppress_warnings(True)
+        with game.plan() as plan:
+            stage(game, plan.spawn, plan.upgrade, plan.remove)
+            self.assertEqual([], game._build_stack, "Nothing should reach the state before commit")
+            self.assertEqual(expected.get_resources(), [plan.SP, plan.MP], "The plan should pay like the attempt functions")
+        self.assertEqual([entry for index, entry in enumerate(expected._build_stack) if entry not in expected._build_stack[:index]], game._build_stack, "Duplicate removals should be dropped")
+        self.assertEqual(expected._deploy_stack, game._deploy_stack)
+        self.assertEqual(expected.get_resources(), game.get_resources())
+        self.assertTrue(game.contains_stationary_unit([11, 10]).upgraded, "Committed units should be on the map")
+
+        game = GameState(json.loads(CONFIG), TURN_WITH_UNITS)
+        with game.plan() as plan:
+            plan.spawn("FF", [11, 10])
+            self.assertFalse(plan.can_spawn("FF", [11, 10]), "Staged structures should block")
+            plan.abort()
+        self.assertEqual(([], [9.0, 6.0]), (game._build_stack, game.get_resources()), "An aborted plan should leave the state alone")
+        self.assertFalse(game.contains_stationary_unit([11, 10]))
+
+    def test_logging(self):
+        class Unformattable:
+            def __format__(self, spec):
+                raise AssertionError("Disabled messages should never be formatted")
+
+        stream = io.StringIO()
+        logger = log.Logger(level=log.INFO, max_repeats=2, stream=stream)
+        logger.debug("Hidden {}", Unformattable())
+        logger.debug(lambda: "Hidden {}".format(Unformattable()))
+        logger.info("Turn {}", 3)
+        for location in ([1, 2], [3, 4], [1, 2], [1, 2], [1, 2]):
+            logger.warning("Blocked at {}", location)
+        def scored(turn):
+            return lambda: "Scored on turn {}".format(turn)
+
+        for turn in (1, 1, 1, 2):
+            logger.info(scored(turn))
+        self.assertEqual("", stream.getvalue(), "Nothing should be written before a flush")
+        logger.flush()
+        self.assertEqual("Turn 3\nBlocked at [1, 2]\nBlocked at [3, 4]\nBlocked at [1, 2]\n(last message repeated 2 more times)\n"
+                         "Scored on turn 1\nScored on turn 1\n(last message repeated 1 more times)\nScored on turn 2\n", stream.getvalue(),
+                         "Only messages with the same text should count as a repeat")
+        logger.warning("Blocked at {}", [1, 2])
+        logger.flush()
+        self.assertTrue(stream.getvalue().endswith("Blocked at [1, 2]\n"), "Repeats should be counted per flush")
+
+    def test_get_attackers(self):
         game = self.make_turn_0_map()
         
         self.assertEqual([], game.get_attackers([13,13], 0), "Are we being attacked by a ghost?")
@@ -1,3 +1,8 @@
+from operator import attrgetter
+
+from .catalog import UnitCatalog
+
+
 def is_stationary(unit_type, structure_types):
     """
         Args:
@@ -9,9 +14,23 @@ def is_stationary(unit_type, structure_types):
     return unit_type in structure_types
 
 
+def _shared_stat(name):
+    """A GameUnit attribute backed by the unit's shared UnitStats record. Setting it moves the unit onto
+    a private copy of the record, so the other units of its type keep the catalog's value"""
+    def set_stat(unit, value):
+        unit.stats = unit.stats._replace(**{name: value})
+    return property(attrgetter("stats." + name), set_stat)
+
+
 class GameUnit:
     """Holds information about a Unit. 
 
+    A unit only stores its own position, owner, health and removal flag. Everything that is the same
+    for every unit of its type and upgrade level lives in a UnitStats record shared through the UnitCatalog,
+    and is exposed through the attributes below. Setting one of them, for example unit.max_health, gives
+    the unit its own copy of the record, which upgrade() replaces with the catalog's upgraded record.
+    config is read only.
+
     Attributes :
         * unit_type (string): This unit's type
         * config (JSON): Contains information about the game
@@ -26,55 +45,64 @@ class GameUnit:
         * shieldRange (float): The effective range of this unit for shielding
         * max_health (float): The starting health of this unit. Note than 'health' can be increased beyond this value by shielding in some game configurations.
         * health (float): The current health of this unit
-        * cost ([int, int]): The resource costs of this unit first is SP second is MP
+        * cost ([int, int]): The resource costs of this unit first is SP second is MP. A new list is returned each time, so assign the whole list to change it
         * shieldPerUnit (float): how much shield is given per unit
         * pending_removal (boolean): If this unit is marked for removal by its owner
         * upgraded (boolean): If this unit is upgraded
+        * stats (:obj: UnitStats): The shared stats record for this unit's type and upgrade level
 
     """
-    def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1):
+    __slots__ = ("stats", "player_index", "x", "y", "health", "pending_removal")
+
+    def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1, catalog=None):
         """ Initialize unit variables using args passed
 
         """
-        self.unit_type = unit_type
-        self.config = config
+        if catalog is None:
+            catalog = UnitCatalog.for_config(config)
+        self.stats = catalog.unit_stats(unit_type)
         self.player_index = player_index
         self.pending_removal = False
-        self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.health = self.max_health if not health else health
-
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+        self.health = self.stats.max_health if not health else health
+
+    unit_type = _shared_stat("unit_type")
+    upgraded = _shared_stat("upgraded")
+    stationary = _shared_stat("stationary")
+    speed = _shared_stat("speed")
+    damage_f = _shared_stat("damage_f")
+    damage_i = _shared_stat("damage_i")
+    attackRange = _shared_stat("attackRange")
+    shieldRange = _shared_stat("shieldRange")
+    max_health = _shared_stat("max_health")
+    shieldPerUnit = _shared_stat("shieldPerUnit")
+    shieldBonusPerY = _shared_stat("shieldBonusPerY")
+    config = property(attrgetter("stats.catalog.config"))
+
+    @property
+    def cost(self):
+        return list(self.stats.cost)
 
+    @cost.setter
+    def cost(self, cost):
+        self.stats = self.stats._replace(cost=tuple(cost))
 
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", self.shieldBonusPerY)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
-        self.upgraded = True
+        self.stats = self.stats.catalog.unit_stats(self.stats.unit_type, True)
 
+    def copy(self):
+        """Gets a new unit with the same stats record, owner, position, health and removal flag"""
+        unit = GameUnit.__new__(GameUnit)
+        unit.stats = self.stats
+        unit.player_index = self.player_index
+        unit.x = self.x
+        unit.y = self.y
+        unit.health = self.health
+        unit.pending_removal = self.pending_removal
+        return unit
+
+    __copy__ = copy
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
@@ -86,4 +114,3 @@ class GameUnit:
 
     def __repr__(self):
         return self.__toString()
-
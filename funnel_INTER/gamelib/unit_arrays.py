@@ -0,0 +1,409 @@
+import struct
+import sys
+import zlib
+from array import array
+
+from .game_map import CELL_ID, CELL_LOCATIONS, NUM_CELLS
+from .unit import GameUnit
+
+
+UPGRADED = 1
+PENDING_REMOVAL = 2
+
+_EMPTY_STRUCTURE_TYPES = array('b', [-1]) * NUM_CELLS
+_EMPTY_STRUCTURE_OWNERS = array('b', [-1]) * NUM_CELLS
+_EMPTY_STRUCTURE_HEALTH = array('d', [0.0]) * NUM_CELLS
+_EMPTY_STRUCTURE_FLAGS = array('B', [0]) * NUM_CELLS
+_EMPTY_STRUCTURE_IDS = array('i', [-1]) * NUM_CELLS
+
+_COUNT = struct.Struct("<I")
+_MASK_BYTES = (NUM_CELLS + 7) // 8
+_SWAP_BYTES = sys.byteorder != "little"
+
+
+def _little_endian(values):
+    """Gets the bytes of an array in little endian order, whatever the machine uses"""
+    if _SWAP_BYTES and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_array(typecode, data, offset, size):
+    """Reads an array of little endian values from size bytes of data"""
+    values = array(typecode, data[offset:offset + size])
+    if _SWAP_BYTES and values.itemsize > 1:
+        values.byteswap()
+    return values
+
+
+class UnitArrays:
+    """The units of a serialized game state, kept in compact arrays instead of GameUnit objects.
+
+    Structures are indexed by packed cell id (see game_map.CELL_ID). Mobile units, which can stack,
+    are kept in parallel arrays in the order the engine sent them. Unit types are stored as their
+    index in the config's unitInformation, and owners as 0 for you and 1 for your opponent.
+
+    Attributes :
+        * structure_type (array): Unit type index of the structure on each cell, -1 if there is none
+        * structure_owner (array): Owner of the structure on each cell, -1 if there is none
+        * structure_health (array): Health of the structure on each cell
+        * structure_flags (array): UPGRADED and PENDING_REMOVAL bits of the structure on each cell
+        * structure_id (array): Engine id of the structure on each cell, -1 if there is none or it is not known
+        * mobile_type (array): Unit type index of each mobile unit
+        * mobile_owner (array): Owner of each mobile unit
+        * mobile_cell (array): Packed cell id of each mobile unit
+        * mobile_health (array): Health of each mobile unit
+
+    """
+    __slots__ = ("structure_type", "structure_owner", "structure_health", "structure_flags", "structure_id",
+                 "mobile_type", "mobile_owner", "mobile_cell", "mobile_health", "_mobiles_by_cell", "_blocked_mask")
+
+    def __init__(self):
+        self.structure_type = array('b', _EMPTY_STRUCTURE_TYPES)
+        self.structure_owner = array('b', _EMPTY_STRUCTURE_OWNERS)
+        self.structure_health = array('d', _EMPTY_STRUCTURE_HEALTH)
+        self.structure_flags = array('B', _EMPTY_STRUCTURE_FLAGS)
+        self.structure_id = array('i', _EMPTY_STRUCTURE_IDS)
+        self.mobile_type = array('b')
+        self.mobile_owner = array('b')
+        self.mobile_cell = array('h')
+        self.mobile_health = array('d')
+        self._mobiles_by_cell = None
+        self._blocked_mask = None
+
+    @classmethod
+    def from_state(cls, state, catalog):
+        """Reads the p1Units and p2Units lists of a decoded game state
+
+        Args:
+            state: The game state as a decoded json object
+            catalog: The UnitCatalog for the game's config
+
+        Returns:
+            A new UnitArrays
+
+        """
+        arrays = cls()
+        structure_type = arrays.structure_type
+        structure_owner = arrays.structure_owner
+        structure_health = arrays.structure_health
+        structure_flags = arrays.structure_flags
+        structure_id = arrays.structure_id
+        stats_by_index = catalog.stats_by_index
+        remove_index = catalog.UNIT_TYPE_TO_INDEX[catalog.REMOVE]
+        upgrade_index = catalog.UNIT_TYPE_TO_INDEX[catalog.UPGRADE]
+        for player_index, key in ((0, "p1Units"), (1, "p2Units")):
+            for index, units in enumerate(state[key]):
+                if not units:
+                    continue
+                if index == remove_index or index == upgrade_index:
+                    flag = PENDING_REMOVAL if index == remove_index else UPGRADED
+                    for uinfo in units:
+                        cell = CELL_ID[int(uinfo[0])][int(uinfo[1])]
+                        if structure_type[cell] >= 0:
+                            structure_flags[cell] |= flag
+                elif stats_by_index[index].stationary:
+                    for uinfo in units:
+                        cell = CELL_ID[int(uinfo[0])][int(uinfo[1])]
+                        structure_type[cell] = index
+                        structure_owner[cell] = player_index
+                        structure_health[cell] = float(uinfo[2])
+                        if len(uinfo) > 3:
+                            structure_id[cell] = int(uinfo[3])
+                else:
+                    arrays.mobile_type.extend([index] * len(units))
+                    arrays.mobile_owner.extend([player_index] * len(units))
+                    arrays.mobile_cell.extend([CELL_ID[int(uinfo[0])][int(uinfo[1])] for uinfo in units])
+                    arrays.mobile_health.extend([float(uinfo[2]) for uinfo in units])
+        return arrays
+
+    def to_bytes(self):
+        """Encodes the arrays in a fixed layout: the five structure arrays of NUM_CELLS entries, the
+        blocked mask, the number of mobile units, then the four mobile arrays. Every value is little endian.
+        The layout is mostly empty cells, so it is compressed with zlib and prefixed with its compressed length.
+
+        Returns:
+            The encoding as bytes
+        """
+        layout = b"".join((
+            _little_endian(self.structure_type), _little_endian(self.structure_owner), _little_endian(self.structure_flags),
+            _little_endian(self.structure_health), _little_endian(self.structure_id), self.blocked_mask().to_bytes(_MASK_BYTES, "little"), _COUNT.pack(len(self.mobile_type)),
+            _little_endian(self.mobile_type), _little_endian(self.mobile_owner), _little_endian(self.mobile_cell),
+            _little_endian(self.mobile_health)))
+        packed = zlib.compress(layout, 1)
+        return _COUNT.pack(len(packed)) + packed
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """Decodes arrays encoded by to_bytes
+
+        Args:
+            data: A bytes like object
+            offset: Where the encoding starts in data
+
+        Returns:
+            (the new UnitArrays, the offset just past the encoding)
+
+        """
+        size, = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        end = offset + size
+        data = zlib.decompress(data[offset:end])
+        arrays = cls.__new__(cls)
+        arrays._mobiles_by_cell = None
+        arrays.structure_type = _read_array('b', data, 0, NUM_CELLS)
+        arrays.structure_owner = _read_array('b', data, NUM_CELLS, NUM_CELLS)
+        arrays.structure_flags = _read_array('B', data, 2 * NUM_CELLS, NUM_CELLS)
+        arrays.structure_health = _read_array('d', data, 3 * NUM_CELLS, 8 * NUM_CELLS)
+        arrays.structure_id = _read_array('i', data, 11 * NUM_CELLS, 4 * NUM_CELLS)
+        offset = 15 * NUM_CELLS
+        arrays._blocked_mask = int.from_bytes(data[offset:offset + _MASK_BYTES], "little")
+        offset += _MASK_BYTES
+        count, = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        if count:
+            arrays.mobile_type = _read_array('b', data, offset, count)
+            arrays.mobile_owner = _read_array('b', data, offset + count, count)
+            arrays.mobile_cell = _read_array('h', data, offset + 2 * count, 2 * count)
+            arrays.mobile_health = _read_array('d', data, offset + 4 * count, 8 * count)
+        else:
+            arrays.mobile_type, arrays.mobile_owner, arrays.mobile_cell, arrays.mobile_health = array('b'), array('b'), array('h'), array('d')
+        return arrays, end
+
+    def mobiles_in_cell(self, cell):
+        """Gets the indices into the mobile arrays of the mobile units on a cell
+
+        Args:
+            cell: A packed cell id
+
+        Returns:
+            A list of indices, in the order the engine sent the units
+
+        """
+        if self._mobiles_by_cell is None:
+            by_cell = {}
+            for index, mobile_cell in enumerate(self.mobile_cell):
+                by_cell.setdefault(mobile_cell, []).append(index)
+            self._mobiles_by_cell = by_cell
+        return self._mobiles_by_cell.get(cell, ())
+
+    def create_units(self, cell, catalog):
+        """Creates the GameUnits standing on a cell
+
+        Args:
+            cell: A packed cell id
+            catalog: The UnitCatalog the unit type indices refer to
+
+        Returns:
+            A new list with the structure first, followed by the mobile units in the order the engine sent them
+
+        """
+        x, y = CELL_LOCATIONS[cell]
+        shorthands = catalog.shorthands
+        config = catalog.config
+        units = []
+        type_index = self.structure_type[cell]
+        if type_index >= 0:
+            unit = GameUnit(shorthands[type_index], config, self.structure_owner[cell], self.structure_health[cell], x, y, catalog)
+            flags = self.structure_flags[cell]
+            if flags & PENDING_REMOVAL:
+                unit.pending_removal = True
+            if flags & UPGRADED:
+                unit.upgrade()
+            units.append(unit)
+        for index in self.mobiles_in_cell(cell):
+            units.append(GameUnit(shorthands[self.mobile_type[index]], config, self.mobile_owner[index], self.mobile_health[index], x, y, catalog))
+        return units
+
+    def blocked_mask(self):
+        """Gets the cells holding a structure as a bitmask, where bit n is set if packed cell n is blocked"""
+        if self._blocked_mask is None:
+            mask = 0
+            for cell in self.structure_cells():
+                mask |= 1 << cell
+            self._blocked_mask = mask
+        return self._blocked_mask
+
+    def occupied_mask(self):
+        """Gets the cells holding any unit as a bitmask, where bit n is set if packed cell n has a structure or a mobile unit"""
+        mask = self.blocked_mask()
+        for cell in self.mobile_cell:
+            if cell >= 0:
+                mask |= 1 << cell
+        return mask
+
+    def diff(self, previous):
+        """Compares the structures of this turn with the structures of an earlier turn
+
+        The blocked mask of this turn is patched from the previous one instead of being rebuilt.
+
+        Args:
+            previous: The UnitArrays of the earlier turn
+
+        Returns:
+            A StructureDiff
+
+        """
+        changes = StructureDiff()
+        if (self.structure_type == previous.structure_type and self.structure_health == previous.structure_health
+                and self.structure_flags == previous.structure_flags and self.structure_owner == previous.structure_owner
+                and self.structure_id == previous.structure_id):
+            self._blocked_mask = previous.blocked_mask()
+            return changes
+
+        new_type, old_type = self.structure_type, previous.structure_type
+        new_owner, old_owner = self.structure_owner, previous.structure_owner
+        new_health, old_health = self.structure_health, previous.structure_health
+        new_flags, old_flags = self.structure_flags, previous.structure_flags
+        new_id, old_id = self.structure_id, previous.structure_id
+        for cell in range(NUM_CELLS):
+            if (new_type[cell] == old_type[cell] and new_health[cell] == old_health[cell] and new_flags[cell] == old_flags[cell]
+                    and new_id[cell] == old_id[cell]):
+                continue
+            upgraded = new_flags[cell] & UPGRADED and not old_flags[cell] & UPGRADED
+            if new_id[cell] >= 0 and old_id[cell] >= 0:
+                rebuilt = new_id[cell] != old_id[cell]
+            else:
+                # Without ids, only a structure that gained health without being upgraded was rebuilt
+                rebuilt = new_health[cell] > old_health[cell] and not upgraded
+            if new_type[cell] != old_type[cell] or new_owner[cell] != old_owner[cell] or rebuilt:
+                # A different or a rebuilt structure
+                if old_type[cell] >= 0:
+                    changes._record("removed", cell, old_owner[cell])
+                if new_type[cell] >= 0:
+                    changes._record("added", cell, new_owner[cell])
+                continue
+            if new_health[cell] < old_health[cell]:
+                changes._record("damaged", cell, new_owner[cell])
+            if upgraded:
+                changes._record("upgraded", cell, new_owner[cell])
+
+        mask = previous.blocked_mask()
+        for cell in changes.cells("removed"):
+            mask &= ~(1 << cell)
+        for cell in changes.cells("added"):
+            mask |= 1 << cell
+        self._blocked_mask = mask
+        return changes
+
+    def structure_cells(self, type_index=None, player_index=None):
+        """Gets the packed ids of the cells holding a structure
+
+        Args:
+            type_index: Only include structures with this unitInformation index
+            player_index: Only include structures owned by this player, 0 for you 1 for the enemy
+
+        Returns:
+            A list of packed cell ids
+
+        """
+        structure_type = self.structure_type
+        structure_owner = self.structure_owner
+        return [cell for cell in range(NUM_CELLS) if structure_type[cell] >= 0 and
+                (type_index is None or structure_type[cell] == type_index) and
+                (player_index is None or structure_owner[cell] == player_index)]
+
+    def count(self, type_index=None, player_index=None):
+        """Counts structures and mobile units
+
+        Args:
+            type_index: Only count units with this unitInformation index
+            player_index: Only count units owned by this player, 0 for you 1 for the enemy
+
+        Returns:
+            The number of matching units
+
+        """
+        total = len(self.structure_cells(type_index, player_index))
+        for mobile_type, mobile_owner in zip(self.mobile_type, self.mobile_owner):
+            if (type_index is None or mobile_type == type_index) and (player_index is None or mobile_owner == player_index):
+                total += 1
+        return total
+
+    def structure_health_total(self, player_index, type_index=None):
+        """Sums the health of one player's structures
+
+        Args:
+            player_index: The owner of the structures, 0 for you 1 for the enemy
+            type_index: Only include structures with this unitInformation index
+
+        Returns:
+            The total health
+
+        """
+        health = self.structure_health
+        return sum(health[cell] for cell in self.structure_cells(type_index, player_index))
+
+    @staticmethod
+    def location(cell):
+        """Converts a packed cell id to an [x, y] location"""
+        return list(CELL_LOCATIONS[cell])
+
+
+class StructureDiff:
+    """The structures that changed between the start of two turns.
+
+    A structure that was destroyed and rebuilt, or replaced by a different structure,
+    is listed as both removed and added.
+
+    Attributes :
+        * added (list): Locations of structures that were not there last turn
+        * removed (list): Locations of structures that are gone
+        * damaged (list): Locations of structures that lost health
+        * upgraded (list): Locations of structures that were upgraded
+
+    """
+    KINDS = ("added", "removed", "damaged", "upgraded")
+
+    def __init__(self):
+        self._changes = {kind: [] for kind in self.KINDS}
+
+    def _record(self, kind, cell, player_index):
+        self._changes[kind].append((cell, player_index))
+
+    def cells(self, kind):
+        """Gets the packed cell ids of one kind of change, "added", "removed", "damaged" or "upgraded" """
+        return [cell for cell, _ in self._changes[kind]]
+
+    @property
+    def added(self):
+        return [list(CELL_LOCATIONS[cell]) for cell in self.cells("added")]
+
+    @property
+    def removed(self):
+        return [list(CELL_LOCATIONS[cell]) for cell in self.cells("removed")]
+
+    @property
+    def damaged(self):
+        return [list(CELL_LOCATIONS[cell]) for cell in self.cells("damaged")]
+
+    @property
+    def upgraded(self):
+        return [list(CELL_LOCATIONS[cell]) for cell in self.cells("upgraded")]
+
+    def blocking_changed(self):
+        """True if a location became blocked or unblocked, which can change the path of mobile units"""
+        return bool(self._changes["added"] or self._changes["removed"])
+
+    def is_empty(self):
+        """True if no structure changed"""
+        return not any(self._changes.values())
+
+    def for_player(self, player_index):
+        """Gets the changes to one player's structures
+
+        Args:
+            player_index: 0 for you, 1 for your opponent
+
+        Returns:
+            A new StructureDiff
+
+        """
+        changes = StructureDiff()
+        for kind, entries in self._changes.items():
+            changes._changes[kind] = [(cell, owner) for cell, owner in entries if owner == player_index]
+        return changes
+
+    def __repr__(self):
+        return "StructureDiff(added={}, removed={}, damaged={}, upgraded={})".format(self.added, self.removed, self.damaged, self.upgraded)
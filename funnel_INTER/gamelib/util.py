@@ -1,9 +1,94 @@
+import json
 import sys
 
+from . import log
+
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
 
 
+class EngineMessage(str):
+    """A game state line received from the engine, together with its decoded json object.
+
+    It is still the raw string, so handlers written for strings keep working, while
+    decode_state can read the already decoded object instead of parsing the line again.
+
+    Attributes :
+        * state (dict): The decoded json object
+
+    """
+    def __new__(cls, line, state):
+        message = super().__new__(cls, line)
+        message.state = state
+        return message
+
+
+def decode_state(message):
+    """Gets the json object of a game state, decoding it only if nobody has yet
+
+    Args:
+        message: An EngineMessage, an already decoded dict, or a raw json string
+
+    Returns:
+        The decoded game state
+
+    """
+    if isinstance(message, dict):
+        return message
+    if isinstance(message, EngineMessage):
+        return message.state
+    return json.loads(message)
+
+
+_decoder = json.JSONDecoder()
+
+
+def read_turn_info(line):
+    """Reads the turnInfo of a game state line without decoding the rest of it
+
+    Args:
+        line: A raw game state line from the engine
+
+    Returns:
+        The [type, turn, frame] list, or None if the line has no turnInfo
+
+    """
+    index = line.find('"turnInfo"')
+    if index < 0:
+        return None
+    index = line.find("[", index)
+    if index < 0:
+        return None
+    try:
+        turn_info, _ = _decoder.raw_decode(line, index)
+    except ValueError:
+        return None
+    return turn_info
+
+
+def has_events(line, event_kind):
+    """Checks if a game state line has any events of one kind, without decoding it
+
+    Args:
+        line: A raw game state line from the engine
+        event_kind: An event list name, "breach", "damage", "death", etc.
+
+    Returns:
+        True if the event list is present and not empty
+
+    """
+    index = line.find('"' + event_kind + '"')
+    if index < 0:
+        return False
+    index = line.find("[", index)
+    if index < 0:
+        return False
+    index += 1
+    while index < len(line) and line[index] in " \t\r\n":
+        index += 1
+    return index < len(line) and line[index] != "]"
+
+
 def get_command():
     """Gets input from stdin
 
@@ -21,6 +106,19 @@ def get_command():
         exit()
     return ret
 
+_command_listeners = []
+
+
+def add_command_listener(listener):
+    """Calls listener with every command sent to the engine, after it is written"""
+    _command_listeners.append(listener)
+
+
+def remove_command_listener(listener):
+    if listener in _command_listeners:
+        _command_listeners.remove(listener)
+
+
 def send_command(cmd):
     """Sends your turn to standard output.
     Should usually only be called by 'GameState.submit_turn()'
@@ -28,14 +126,18 @@ def send_command(cmd):
     """
     sys.stdout.write(cmd.strip() + "\n")
     sys.stdout.flush()
+    for listener in _command_listeners:
+        listener(cmd)
 
 def debug_write(*msg):
-    """Prints a message to the games debug output
+    """Prints a message to the games debug output right away, after anything queued in gamelib.log. 
+    In loops or frequent handlers prefer the gamelib.log functions, which only format and write when flushed.
 
     Args:
         msg: The message to output
 
     """
+    log.flush()
     #Printing to STDERR is okay and printed out by the game but doesn't effect turns.
     sys.stderr.write(", ".join(map(str, msg)).strip() + "\n")
     sys.stderr.flush()
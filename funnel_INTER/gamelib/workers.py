@@ -0,0 +1,186 @@
+"""
+A pool of worker processes that lives for the whole game.
+
+Starting processes costs far more than a turn can spare, so the pool is started once from
+on_game_start, with the config and the unit catalog loaded into every worker before the first
+turn. Each turn the state is published once to a SharedBoard, and jobs are sent as the name of a
+module level function plus a small task. A worker runs job(game_state, task) on its own fork of
+the published state, so jobs may change the state they are given.
+
+    def on_game_start(self, config):
+        super().on_game_start(config)
+        self.start_workers()
+
+    def on_turn(self, turn_state):
+        game_state = self.create_game_state(turn_state)
+        self.workers.publish(game_state)
+        paths = self.workers.map(workers.find_path, spawn_locations)
+
+"""
+import multiprocessing
+import timeit
+
+from .catalog import UnitCatalog
+from .economy import Economy
+from .shared_board import SharedBoard, board_state
+from .simulator import Simulator
+from . import log
+
+
+_config = None
+_catalog = None
+
+
+def _initialize(config):
+    """Runs once in every worker when the pool starts"""
+    global _config, _catalog
+    _config = config
+    _catalog = UnitCatalog.for_config(config)
+    Economy.for_config(config)
+
+
+def _run(job, handle, task):
+    game_state = board_state(_config, handle, _catalog) if handle is not None else None
+    return job(game_state, task)
+
+
+def _run_packed(packed):
+    return _run(*packed)
+
+
+def _no_op(game_state, task):
+    return task
+
+
+def find_path(game_state, location):
+    """Job: the path a unit spawned at location would take, see GameState.find_path_to_edge"""
+    game_state.suppress_warnings(True)
+    return game_state.find_path_to_edge(location)
+
+
+def path_damage(game_state, location):
+    """Job: the turret damage a unit spawned by you at location would take along its path, one hit per turret per step
+
+    Returns:
+        (damage, location), with damage None if the location is blocked
+    """
+    game_state.suppress_warnings(True)
+    path = game_state.find_path_to_edge(location)
+    if path is None:
+        return None, location
+    damage_per_hit = game_state.catalog.unit_stats(game_state.catalog.TURRET).damage_i
+    damage = 0
+    for path_location in path:
+        damage += len(game_state.get_attackers(path_location, 0)) * damage_per_hit
+    return damage, location
+
+
+def simulate(game_state, deploys):
+    """Job: simulates the action phase for a pair of (my_deploys, enemy_deploys), see Simulator.run
+
+    Returns:
+        The SimulationResult, without its frames
+    """
+    return Simulator(game_state).run(deploys[0], deploys[1], record=False)
+
+
+class WorkerPool:
+    """Worker processes started once per game, evaluating jobs against the published state of the turn
+
+    Attributes :
+        * processes (int): The number of workers
+        * board (:obj: SharedBoard): Where the state of the turn is published
+        * handle (tuple): The handle of the last published state, None before the first
+        * overhead (float): The round trip of an empty job measured when the pool started, in microseconds
+
+    """
+    def __init__(self, config, processes=None, measure=True):
+        """Starts the workers and waits until they are ready
+
+        Args:
+            config (JSON): The config of the game, loaded into every worker
+            processes: The number of workers, one per CPU if None
+            measure: If True, measure the dispatch overhead and log it
+
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.board = SharedBoard()
+        self.handle = None
+        self.overhead = None
+        self._pool = multiprocessing.Pool(self.processes, initializer=_initialize, initargs=(config,))
+        self._closed = False
+        if measure:
+            self.measure_overhead()
+            log.info("Started {} workers, {:.0f} us per job round trip", self.processes, self.overhead)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def publish(self, game_state):
+        """Shares a state with the workers. Jobs sent afterwards run against it.
+
+        Args:
+            game_state: The GameState of the turn
+
+        Returns:
+            The handle of the published state
+
+        """
+        self.handle = self.board.publish(game_state)
+        return self.handle
+
+    def map(self, job, tasks, chunksize=None):
+        """Runs a job for every task, spread over the workers, and waits for the results
+
+        Args:
+            job: A module level function taking (game_state, task). game_state is the worker's own fork of the published state
+            tasks: The tasks, each a small picklable value such as a location
+            chunksize: How many tasks to send to a worker at once. Spread evenly over the workers if None
+
+        Returns:
+            The results, in the order of tasks
+
+        """
+        tasks = list(tasks)
+        if not tasks:
+            return []
+        if chunksize is None:
+            chunksize = max(1, len(tasks) // (4 * self.processes))
+        return self._pool.map(_run_packed, [(job, self.handle, task) for task in tasks], chunksize)
+
+    def submit(self, job, task):
+        """Runs one job without waiting for it
+
+        Returns:
+            A multiprocessing AsyncResult. get(timeout) returns the job's result
+
+        """
+        return self._pool.apply_async(_run, (job, self.handle, task))
+
+    def measure_overhead(self, samples=50):
+        """Times the round trip of a job that does nothing, without a published state
+
+        Args:
+            samples: How many jobs to time
+
+        Returns:
+            The best time per job, in microseconds
+
+        """
+        for _ in range(self.processes):
+            self._pool.apply(_run, (_no_op, None, None))
+        self.overhead = min(timeit.repeat(lambda: self._pool.apply(_run, (_no_op, None, None)), number=samples, repeat=3)) / samples * 1e6
+        return self.overhead
+
+    def close(self):
+        """Stops the workers and frees the shared board. Safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool.terminate()
+        self._pool.join()
+        self.board.close()